@@ -1,64 +1,211 @@
 import os
-import re
-import pandas as pd
+import numpy as np
 import time
 import json
-import joblib
-import subprocess
 from datetime import datetime
 from pathlib import Path
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.exceptions import NotFittedError
 import signal
 import sys
+import argparse
+import gzip
+import warnings
+import zlib
+import multiprocessing
+import queue
+import uuid
+from collections import deque
+# pandas, sklearn and joblib are imported only where training needs them, so scoring
+# starts without them
+from anomaly_sink import AnomalySink
+from artifacts import StandardScaling, load_model_artifact
+from blocking import FileBackend, IPBlocker, IpsetBackend, MultiBackend, NginxDenyMapBackend, RedisBackend
+from encoders import CategoricalEncoder
+from features import FEATURE_COLUMNS, TIME_COLUMNS, FeatureBuffer
+from forest import CompiledForest
+from incidents import IncidentAggregator
+from metrics import Registry
+from registry import ModelRegistry, ModelWatcher
+from reviews import ReviewCompactor, ReviewLog, anomaly_id
+from windows import WINDOW_COLUMNS, IPWindows
+from log_parser import ParseFailures, load_log_parser
+from tailer import LogTailer
 
-# Load paths from environment variables for flexibility
+# Load paths from environment variables for flexibility. MODEL_PATH, SCALER_PATH and
+# ENCODER_PATH are pickles imported into an empty registry as its first version.
 MODEL_PATH = os.getenv("MODEL_PATH", "iso_forest_model.pkl")
 SCALER_PATH = os.getenv("SCALER_PATH", "scaler.pkl")
+ENCODER_PATH = os.getenv("ENCODER_PATH", os.path.join(os.path.dirname(SCALER_PATH), "encoder.pkl"))
+# Versioned model bundles and the CURRENT pointer to the active one (see registry.py),
+# and how often running detectors check the pointer for a new or rolled-back version
+MODEL_REGISTRY_PATH = os.getenv("MODEL_REGISTRY_PATH", os.path.join(os.path.dirname(MODEL_PATH), "model_registry"))
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "5"))
 LOG_FILE_PATH = os.getenv("LOG_FILE_PATH", "/var/log/nginx/access.log")
 ANOMALY_LOG_PATH = os.getenv("ANOMALY_LOG_PATH", "anomaly_feedback.json")
+TAIL_CHECKPOINT_PATH = os.getenv("TAIL_CHECKPOINT_PATH", "tail_checkpoint.json")
+TAIL_CHUNK_SIZE = int(os.getenv("TAIL_CHUNK_SIZE", str(1 << 20)))
+TAIL_CHECKPOINT_INTERVAL = float(os.getenv("TAIL_CHECKPOINT_INTERVAL", "5"))
 HISTORICAL_DATA_PATH = os.getenv("HISTORICAL_DATA_PATH", "access_logs.csv")
 
+# The parser is generated from the log_format directive nginx writes the access log with
+NGINX_CONF_PATH = os.getenv("NGINX_CONF_PATH", "/etc/nginx/conf.d/nginx.conf")
+LOG_FORMAT_NAME = os.getenv("LOG_FORMAT_NAME", "custom_sanitized")
+PARSE_FAILURE_INTERVAL = float(os.getenv("PARSE_FAILURE_INTERVAL", "60"))
+
+# Micro-batching: lines are scored together until BATCH_SIZE lines are collected or the
+# oldest pending line has waited BATCH_MAX_LATENCY_MS. BATCH_SIZE=1 keeps per-line scoring.
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1"))
+BATCH_MAX_LATENCY_MS = float(os.getenv("BATCH_MAX_LATENCY_MS", "50"))
+BATCH_STATS_INTERVAL = float(os.getenv("BATCH_STATS_INTERVAL", "60"))
+
+# Sharded mode: WORKERS > 1 scoring processes, each owning the clients whose IP hashes to it
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORKER_QUEUE_DEPTH = int(os.getenv("WORKER_QUEUE_DEPTH", "8"))
+
+# Replay (`anomaly_detector.py replay <logs>`): bytes read per chunk, lines per worker batch,
+# scoring processes, and seconds between progress reports; each can be overridden per run
+REPLAY_CHUNK_SIZE = int(os.getenv("REPLAY_CHUNK_SIZE", str(8 << 20)))
+REPLAY_BATCH_SIZE = int(os.getenv("REPLAY_BATCH_SIZE", "4096"))
+REPLAY_WORKERS = int(os.getenv("REPLAY_WORKERS", str(os.cpu_count() or 1)))
+REPLAY_PROGRESS_INTERVAL = float(os.getenv("REPLAY_PROGRESS_INTERVAL", "5"))
+
+# Per-IP sliding-window features: requests per window, idle seconds before an IP is
+# forgotten, and the memory the tracked IPs may use before the least recent are evicted
+WINDOW_SIZE = int(os.getenv("WINDOW_SIZE", "32"))
+WINDOW_TTL = float(os.getenv("WINDOW_TTL", "300"))
+WINDOW_MEMORY_MB = float(os.getenv("WINDOW_MEMORY_MB", "64"))
+
+# Background retraining: seconds between runs (0 disables), how many recent log lines
+# to train on, the fewest lines worth training on, and how many model versions to keep
+# (the active version is always kept)
+RETRAIN_INTERVAL = float(os.getenv("RETRAIN_INTERVAL", "3600"))
+RETRAIN_SAMPLE_SIZE = int(os.getenv("RETRAIN_SAMPLE_SIZE", "100000"))
+RETRAIN_MIN_LINES = int(os.getenv("RETRAIN_MIN_LINES", "10000"))
+MODEL_VERSIONS_KEPT = int(os.getenv("MODEL_VERSIONS_KEPT", "5"))
+
+# Anomaly log writer: records per write, seconds before a partial group is written,
+# fsync policy (always, interval, never), rotation size and backups, and queue bound
+ANOMALY_FLUSH_COUNT = int(os.getenv("ANOMALY_FLUSH_COUNT", "1000"))
+ANOMALY_FLUSH_INTERVAL = float(os.getenv("ANOMALY_FLUSH_INTERVAL", "0.5"))
+ANOMALY_FSYNC = os.getenv("ANOMALY_FSYNC", "interval")
+ANOMALY_FSYNC_INTERVAL = float(os.getenv("ANOMALY_FSYNC_INTERVAL", "5"))
+ANOMALY_LOG_MAX_BYTES = int(os.getenv("ANOMALY_LOG_MAX_BYTES", str(100 << 20)))
+ANOMALY_LOG_BACKUPS = int(os.getenv("ANOMALY_LOG_BACKUPS", "5"))
+ANOMALY_QUEUE_SIZE = int(os.getenv("ANOMALY_QUEUE_SIZE", "100000"))
+# Review verdicts, appended by the review page as events keyed by anomaly ID (see reviews.py),
+# and seconds between compactions of that log
+REVIEW_LOG_PATH = os.getenv("REVIEW_LOG_PATH", f"{ANOMALY_LOG_PATH}.reviews")
+REVIEW_COMPACT_INTERVAL = float(os.getenv("REVIEW_COMPACT_INTERVAL", "600"))
+
+# Incident aggregation: seconds an IP's anomalies are collapsed into one incident (0 logs
+# every anomaly), whether to also split by resource, examples kept, and open incident cap
+INCIDENT_WINDOW = float(os.getenv("INCIDENT_WINDOW", "60"))
+INCIDENT_BY_RESOURCE = os.getenv("INCIDENT_BY_RESOURCE", "false").lower() in ("1", "true", "yes")
+INCIDENT_EXAMPLES = int(os.getenv("INCIDENT_EXAMPLES", "3"))
+INCIDENT_MAX_OPEN = int(os.getenv("INCIDENT_MAX_OPEN", "100000"))
+
+# IP blocking: backends (none, or a comma-separated list of file, ipset, nginx and redis),
+# anomalies in one incident before an IP is blocked, how long blocks last, and how often
+# queued blocks are applied
+BLOCK_BACKEND = os.getenv("BLOCK_BACKEND", "none")
+BLOCK_MIN_ANOMALIES = int(os.getenv("BLOCK_MIN_ANOMALIES", "20"))
+BLOCK_TTL = float(os.getenv("BLOCK_TTL", "3600"))
+BLOCK_BATCH_INTERVAL = float(os.getenv("BLOCK_BATCH_INTERVAL", "1"))
+BLOCKLIST_PATH = os.getenv("BLOCKLIST_PATH", "blocklist.txt")
+IPSET_NAME = os.getenv("IPSET_NAME", "anomaly_blocklist")
+BLOCK_USE_SUDO = os.getenv("BLOCK_USE_SUDO", "true").lower() in ("1", "true", "yes")
+NGINX_DENY_MAP_PATH = os.getenv("NGINX_DENY_MAP_PATH", "/etc/nginx/blocklist/blocked_ips.map")
+# Empty: SIGHUP the nginx master through the shared pid namespace; set to e.g.
+# "nginx -s reload" when nginx runs alongside the detector
+NGINX_RELOAD_COMMAND = os.getenv("NGINX_RELOAD_COMMAND", "")
+NGINX_RELOAD_INTERVAL = float(os.getenv("NGINX_RELOAD_INTERVAL", "10"))
+# Redis the Django blocklist middleware reads from (BLOCKLIST_REDIS_URL/PREFIX in settings.py)
+BLOCK_REDIS_URL = os.getenv("BLOCK_REDIS_URL", "redis://redis:6379/1")
+BLOCK_REDIS_PREFIX = os.getenv("BLOCK_REDIS_PREFIX", "blocklist")
+BLOCK_REDIS_CHANGES_KEPT = int(os.getenv("BLOCK_REDIS_CHANGES_KEPT", "10000"))
+# Blocked IPs are merged into a covering CIDR once this share of it is blocked,
+# for prefixes of at least BLOCK_AGGREGATE_MIN_PREFIX bits (1.0: only full ranges)
+BLOCK_AGGREGATE_DENSITY = float(os.getenv("BLOCK_AGGREGATE_DENSITY", "0.5"))
+BLOCK_AGGREGATE_MIN_PREFIX = int(os.getenv("BLOCK_AGGREGATE_MIN_PREFIX", "24"))
+BLOCK_AGGREGATE_MIN_PREFIX_V6 = int(os.getenv("BLOCK_AGGREGATE_MIN_PREFIX_V6", "64"))
+
+# Prometheus metrics endpoint (http://<host>:METRICS_PORT/metrics); 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+METRICS_ADDRESS = os.getenv("METRICS_ADDRESS", "0.0.0.0")
+
 # Initialize model and scaler
 iso_forest = None
+forest = None  # iso_forest compiled to arrays, used for scoring
 scaler = None
+encoder = CategoricalEncoder()
+windows = IPWindows(WINDOW_SIZE, WINDOW_TTL, WINDOW_MEMORY_MB)
+feature_buffer = None
+model_registry = None
+model_watcher = None  # Reloads the model when the registry's active version changes
+
+# Anomaly log writer thread, started on first use, and the incidents not yet written to it
+anomaly_sink = None
+incidents = IncidentAggregator(INCIDENT_WINDOW, INCIDENT_BY_RESOURCE, INCIDENT_EXAMPLES, INCIDENT_MAX_OPEN)
+
+# IP blocking thread, started on first use
+ip_blocker = None
 
-# Log pattern to parse the NGINX logs
-log_pattern = re.compile(
-    r'(?P<IP_Address>\S+) - \[(?P<Timestamp>[^\]]+)\] "(?P<Method>\S+) (?P<Resource>\S+) (?P<Protocol>[^\"]+)" '
-    r'(?P<Status_Code>\d+) (?P<Bytes_Sent>\d+) "(?P<Referrer>[^\"]*)" "(?P<User_Agent>[^\"]*)" '
-    r'(?P<Source_Port>\d+) (?P<Destination_Port>\d+) - "(?P<Origin_Server>[^\"]*)" "(?P<Destination>[^\"]*)" '
-    r'"(?P<Response_Code>[^\"]*)" "(?P<Response_Time>[\d.,]*)" (?P<Backend_Time>[\d.,]*)'
-)
+# Log line parser and unparseable line accounting
+line_parser = None
+parse_failures = ParseFailures(PARSE_FAILURE_INTERVAL)
+
+# Prometheus metrics, aggregated across the scoring workers; gauges read from other
+# components are wired up in start_metrics()
+metrics = Registry()
+lines_read = metrics.counter('anomaly_detector_lines_read_total', "Log lines read")
+lines_parsed = metrics.counter('anomaly_detector_lines_parsed_total', "Log lines parsed")
+lines_failed = metrics.counter('anomaly_detector_lines_failed_total', "Log lines not matching the log format")
+anomalies_found = metrics.counter('anomaly_detector_anomalies_total', "Lines scored as anomalous")
+incidents_logged = metrics.counter('anomaly_detector_incidents_total', "Incidents written to the anomaly log")
+stage_seconds = metrics.histogram('anomaly_detector_stage_seconds',
+                                  "Time per call of each scoring stage (per line or per batch)", ('stage',))
+batch_lag_seconds = metrics.histogram('anomaly_detector_batch_lag_seconds',
+                                      "Time from a batch's first line being read to its anomalies being reported")
+tail_lag_bytes = metrics.function_gauge('anomaly_detector_tail_lag_bytes', "Bytes between the last processed line and the end of the log")
+tail_lag_seconds = metrics.gauge('anomaly_detector_tail_lag_seconds', "Age of the last processed log line when it was scored")
+queue_depth = metrics.function_gauge('anomaly_detector_queue_depth', "Items waiting in each internal queue", ('queue',))
+model_version = metrics.gauge('anomaly_detector_model_version', "Version of the live model (0: unversioned)")
+model_load_seconds = metrics.gauge('anomaly_detector_model_load_seconds', "Time taken to load the live model")
+model_loaded_at = metrics.gauge('anomaly_detector_model_loaded_timestamp_seconds', "When the live model was loaded")
+blocked_addresses = metrics.function_gauge('anomaly_detector_blocked_addresses', "IP addresses currently blocked")
+block_rules = metrics.function_gauge('anomaly_detector_block_rules', "CIDR rules the blocked addresses are aggregated into")
+
+# Live scoring passes plain arrays in the scaler's column order
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
 
 # Function to preprocess log data
 def preprocess_data(data):
-    label_encoders = {}
-    categorical_columns = ['IP_Address', 'Method', 'Resource', 'User Agent']
-    for col in categorical_columns:
-        if col in data.columns:
-            le = LabelEncoder()
-            data[col] = data[col].fillna('Missing')
-            data[col] = le.fit_transform(data[col])
-            label_encoders[col] = le
-        else:
-            print(f"Warning: Column '{col}' not found in the dataset.")
+    import pandas as pd
+    from sklearn.exceptions import NotFittedError
 
-    # Convert timestamp to datetime and extract hour, day, weekday
+    # Replay the rows through the live per-IP window engine so training sees the same features
+    if 'Timestamp' in data.columns and 'IP_Address' in data.columns:
+        data = add_window_features(data)
+
+    # Encode categorical columns with the persistent vocabulary, fitting it if there is none yet
+    if not encoder.fitted:
+        encoder.fit(data)
+    data = encoder.transform(data)
+
+    # Convert timestamp to datetime and extract hour, day, weekday. Rows without a timestamp
+    # (reviewed false positives) keep the time features they already carry
     if 'Timestamp' in data.columns:
-        data['Timestamp'] = pd.to_datetime(data['Timestamp'], errors='coerce', format='%d/%b/%Y:%H:%M:%S %z')
-        data['Hour'] = data['Timestamp'].dt.hour
-        data['Day'] = data['Timestamp'].dt.day
-        data['Weekday'] = data['Timestamp'].dt.weekday
+        timestamps = pd.to_datetime(data['Timestamp'], errors='coerce', format='%d/%b/%Y:%H:%M:%S %z')
+        time_features = pd.DataFrame({'Hour': timestamps.dt.hour, 'Day': timestamps.dt.day,
+                                      'Weekday': timestamps.dt.weekday}, index=data.index)
+        data[TIME_COLUMNS] = time_features.fillna(data.reindex(columns=TIME_COLUMNS))
         data = data.drop(columns=['Timestamp'], errors='ignore')
 
     # Drop unnecessary columns
     data = data.drop(columns=['Referrer', 'Origin Server', 'Protocol'], errors='ignore')
 
     # Convert numeric columns to numeric types and handle missing values
-    numerical_columns = ['Bytes Sent', 'Source Port', 'Destination Port', 'Response Time (seconds)', 
-                         'Backend Time (seconds)', 'Hour', 'Day', 'Weekday']
+    window_columns = [col for col in WINDOW_COLUMNS if col in data.columns]
+    numerical_columns = list(getattr(scaler, 'feature_names_in_', FEATURE_COLUMNS + window_columns))
     data[numerical_columns] = data[numerical_columns].apply(pd.to_numeric, errors='coerce')
     data[numerical_columns] = data[numerical_columns].fillna(data[numerical_columns].median())
 
@@ -74,94 +221,684 @@ def preprocess_data(data):
 
     return data[numerical_columns]
 
-# Load or initialize model and scaler
+# Compute the per-IP window features of historical rows, in timestamp order
+def add_window_features(data):
+    import pandas as pd
+
+    timestamps = pd.to_datetime(data['Timestamp'], errors='coerce', format='%d/%b/%Y:%H:%M:%S %z', utc=True)
+    seconds = (timestamps - pd.Timestamp(0, tz='UTC')).dt.total_seconds().to_numpy()
+    values = data.reindex(columns=['Bytes Sent', 'Response Time (seconds)', 'Backend Time (seconds)'])
+    values = values.apply(pd.to_numeric, errors='coerce').fillna(0.0).to_numpy()
+    ips = data['IP_Address'].fillna('-').astype(str).to_numpy()
+
+    engine = IPWindows(WINDOW_SIZE, WINDOW_TTL, WINDOW_MEMORY_MB)
+    features = np.full((len(data), len(WINDOW_COLUMNS)), np.nan)
+    for i in np.argsort(seconds, kind='stable'):
+        if not np.isnan(seconds[i]):
+            features[i] = engine.update(ips[i], seconds[i], *values[i])
+
+    data = data.copy()
+    # Rows without a timestamp keep any window features they already carry
+    windowed = pd.DataFrame(features, index=data.index, columns=WINDOW_COLUMNS)
+    data[WINDOW_COLUMNS] = windowed.fillna(data.reindex(columns=WINDOW_COLUMNS))
+    return data
+
+# Load the registry's active model version. With none active, activate the newest version,
+# or publish the pickled model and scaler as the first, or train it from the historical data.
 def load_or_initialize_model():
-    global iso_forest, scaler
-    if Path(MODEL_PATH).exists() and Path(SCALER_PATH).exists():
-        iso_forest = joblib.load(MODEL_PATH)
-        scaler = joblib.load(SCALER_PATH)
-        print("Loaded existing model and scaler.")
-    else:
-        iso_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
-        scaler = StandardScaler()
-        print("Initializing new model and scaler.")
-        if Path(HISTORICAL_DATA_PATH).exists():
-            historical_data = pd.read_csv(HISTORICAL_DATA_PATH)
-            train_model(historical_data)
-
-# Function to train the model and save it
+    global iso_forest, scaler, encoder, model_watcher
+    registry = get_model_registry()
+    if registry.current() is None:
+        versions = registry.versions()
+        if versions:
+            registry.activate(versions[-1])
+        elif Path(MODEL_PATH).exists() and Path(SCALER_PATH).exists():
+            import joblib
+            iso_forest = joblib.load(MODEL_PATH)
+            scaler = joblib.load(SCALER_PATH)
+            if Path(ENCODER_PATH).exists():
+                encoder = joblib.load(ENCODER_PATH)
+            print("Loaded existing model and scaler; publishing them as model version 1.")
+            registry.activate(save_model_version(1, None))
+        else:
+            from sklearn.ensemble import IsolationForest
+            from sklearn.preprocessing import StandardScaler
+            iso_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
+            scaler = StandardScaler()
+            encoder = CategoricalEncoder()
+            print("Initializing new model and scaler.")
+            if Path(HISTORICAL_DATA_PATH).exists():
+                import pandas as pd
+                train_model(pd.read_csv(HISTORICAL_DATA_PATH))
+
+    model_watcher = ModelWatcher(registry, MODEL_RELOAD_INTERVAL)
+    path = model_watcher.poll()
+    if path:
+        install_model_version(path)
+
+# Function to train the model and publish it as the active version
 def train_model(data):
+    started = time.monotonic()
+    fit_model(data)
+    version = save_model_version(get_model_registry().next_version(), len(data), time.monotonic() - started)
+    get_model_registry().activate(version)
+    print(f"Model trained and saved as version {version}.")
+
+# Fit the encoder, scaler and model on a DataFrame of feature records
+def fit_model(data):
+    encoder.fit(data)
     X = preprocess_data(data)
     iso_forest.fit(X)
-    joblib.dump(iso_forest, MODEL_PATH)
-    joblib.dump(scaler, SCALER_PATH)
-    print("Model trained and saved.")
+
+# Registry of versioned model bundles, created on first use
+def get_model_registry():
+    global model_registry
+    if model_registry is None:
+        model_registry = ModelRegistry(MODEL_REGISTRY_PATH, MODEL_VERSIONS_KEPT)
+    return model_registry
+
+# Write the compiled model, scaler and encoder as a registry version with its training
+# metadata, without activating it; returns the version
+def save_model_version(version, rows, training_seconds=None):
+    get_model_registry().save(version, CompiledForest.from_model(iso_forest), StandardScaling.from_scaler(scaler),
+                              encoder, trained_at=datetime.now().isoformat(), rows=rows,
+                              contamination=iso_forest.contamination,
+                              training_seconds=round(training_seconds, 2) if training_seconds is not None else None)
+    return version
+
+# Memory-map a versioned artifact and swap it in as the live model in one step
+def install_model_version(path):
+    global forest, scaler, encoder, feature_buffer
+    started = time.monotonic()
+    artifact = load_model_artifact(path)
+    new_buffer = FeatureBuffer(artifact['scaler'], BATCH_SIZE, artifact['encoder'], windows)
+    forest, scaler, encoder, feature_buffer = artifact['forest'], artifact['scaler'], artifact['encoder'], new_buffer
+    record_model_load(artifact['version'], started)
+    rows = f" on {artifact['rows']} rows" if artifact['rows'] is not None else ""
+    print(f"Loaded model version {artifact['version']} (trained {artifact['trained_at']}{rows}).")
+
+def record_model_load(version, started):
+    model_version.set(version)
+    model_load_seconds.set(time.monotonic() - started)
+    model_loaded_at.set(time.time())
+
+# Reviewed anomalies: feature records confirmed as false positives (normal traffic),
+# and the IPs confirmed as true positives. Verdicts in the review log override those
+# recorded in the anomaly log itself.
+def load_review_feedback():
+    false_positives = []
+    malicious_ips = set()
+    verdicts = ReviewLog(REVIEW_LOG_PATH).read()
+    try:
+        with open(ANOMALY_LOG_PATH) as f:
+            for line in f:
+                try:
+                    anomaly = json.loads(line)
+                except ValueError:
+                    continue
+                feedback = verdicts.get(anomaly_id(anomaly))
+                if feedback is None and anomaly.get('reviewed'):
+                    feedback = anomaly.get('feedback')
+                if feedback == 'false_positive':
+                    false_positives.append(anomaly['anomaly_data'])
+                elif feedback == 'true_positive':
+                    malicious_ips.add(anomaly['ip_address'])
+    except FileNotFoundError:
+        pass
+    return false_positives, malicious_ips
+
+# Training set for a retraining run: recent traffic without the IPs confirmed malicious
+# in review, plus the reviewed false positives so the model learns they are normal
+def build_training_data(lines):
+    import pandas as pd
+
+    false_positives, malicious_ips = load_review_feedback()
+    parsed_entries = [parsed for parsed in map(line_parser.parse, lines)
+                      if parsed is not None and parsed['IP_Address'] not in malicious_ips]
+    data = pd.DataFrame([build_feature_record(parsed) for parsed in parsed_entries])
+    data['Timestamp'] = [parsed['Timestamp'].strftime('%d/%b/%Y:%H:%M:%S %z') for parsed in parsed_entries]
+    if false_positives:
+        data = pd.concat([data, pd.DataFrame(false_positives)], ignore_index=True)
+    return data
+
+# Retraining process body: fit a fresh model and write it as a new version
+def retrain_model(version, lines):
+    global iso_forest, scaler, encoder
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    os.nice(10)
+    started = time.monotonic()
+    data = build_training_data(lines)
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+    iso_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
+    scaler = StandardScaler()
+    encoder = CategoricalEncoder()
+    fit_model(data)
+    save_model_version(version, len(data), time.monotonic() - started)
+
+# Keeps the most recent log lines and periodically retrains on them in a forked process,
+# so scoring never waits on training. poll() activates each finished version in the registry,
+# where the model watcher picks it up.
+class Retrainer:
+    def __init__(self, interval, sample_size, min_lines):
+        self.interval = interval
+        self.min_lines = min_lines
+        self.recent_lines = deque(maxlen=sample_size)
+        self.next_run = time.monotonic() + interval
+        self.process = None
+        self.version = None
+
+    def observe(self, lines):
+        self.recent_lines.extend(lines)
+
+    def poll(self):
+        if self.process is not None:
+            if self.process.is_alive():
+                return
+            self.process.join()
+            process, self.process = self.process, None
+            if process.exitcode != 0:
+                print(f"Retraining model version {self.version} failed (exit code {process.exitcode}).")
+                return
+            get_model_registry().activate(self.version)
+            print(f"Activated model version {self.version}.")
+            return
+
+        if self.interval <= 0 or time.monotonic() < self.next_run:
+            return
+        self.next_run = time.monotonic() + self.interval
+        if len(self.recent_lines) < self.min_lines:
+            print(f"Skipping retraining: {len(self.recent_lines)} recent lines, need {self.min_lines}.")
+            return
+
+        self.version = get_model_registry().next_version()
+        # Forked, so the child gets the recent lines and parser without pickling them
+        context = multiprocessing.get_context('fork')
+        self.process = context.Process(target=retrain_model, args=(self.version, self.recent_lines), daemon=True)
+        self.process.start()
+        print(f"Retraining model version {self.version} on {len(self.recent_lines)} recent lines.")
+
+# Start a new Retrainer with the configured schedule
+def start_retrainer():
+    return Retrainer(RETRAIN_INTERVAL, RETRAIN_SAMPLE_SIZE, RETRAIN_MIN_LINES)
+
+# Follow the NGINX access log, resuming from the last checkpoint
+def open_log_tailer():
+    tailer = LogTailer(LOG_FILE_PATH, TAIL_CHECKPOINT_PATH, chunk_size=TAIL_CHUNK_SIZE,
+                       checkpoint_interval=TAIL_CHECKPOINT_INTERVAL).open()
+    tail_lag_bytes.set_function(tailer.lag_bytes)
+    return tailer
 
 # Real-time monitoring of NGINX logs
 def monitor_nginx_logs():
-    with open(LOG_FILE_PATH, 'r') as f:
-        f.seek(0, 2)  # Move to the end of the file
+    retrainer = start_retrainer()
+    tailer = open_log_tailer()
+    try:
         while True:
-            line = f.readline()
-            if line:
-                process_log_entry(line)
+            lines = tailer.read_lines()
+            lines_read.inc(len(lines))
+            retrainer.observe(lines)
+            retrainer.poll()
+            new_model = model_watcher.poll()
+            if new_model:
+                install_model_version(new_model)
+            flush_incidents()
+            if lines:
+                for line in lines:
+                    process_log_entry(line)
+                tailer.commit()
             else:
-                time.sleep(1)
+                tailer.wait(1)
+    finally:
+        tailer.close()
 
-# Process individual log entries and detect anomalies
-def process_log_entry(log_entry):
-    match = log_pattern.match(log_entry)
-    if not match:
-        print(f"Failed to parse log entry: {log_entry}")
-        return
+# Real-time monitoring of NGINX logs, scoring lines in micro-batches
+def monitor_nginx_logs_batched():
+    max_latency = BATCH_MAX_LATENCY_MS / 1000.0
+    stats = BatchStats(BATCH_STATS_INTERVAL)
+    retrainer = start_retrainer()
+    tailer = open_log_tailer()
+    batch = []
+    batch_started = 0.0
+    try:
+        while True:
+            lines = tailer.read_lines()
+            lines_read.inc(len(lines))
+            retrainer.observe(lines)
+            retrainer.poll()
+            new_model = model_watcher.poll()
+            if new_model:
+                install_model_version(new_model)
+            flush_incidents()
+            if lines:
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.extend(lines)
+            while len(batch) >= BATCH_SIZE:
+                process_log_batch(batch[:BATCH_SIZE], batch_started, stats)
+                del batch[:BATCH_SIZE]
+            # Deadline reached, or the log is drained: score what we have
+            if batch and (not lines or time.monotonic() - batch_started >= max_latency):
+                process_log_batch(batch, batch_started, stats)
+                batch = []
+            if not batch:
+                tailer.commit()
+            if not lines:
+                tailer.wait(1)
+    finally:
+        tailer.close()
+
+# Real-time monitoring of NGINX logs, fanned out to WORKERS scoring processes by client IP.
+# Workers are forked after the model is loaded, so they share it read-only (copy-on-write).
+# Anomalies are merged back in log order before they are logged.
+def monitor_nginx_logs_sharded():
+    inboxes, results = start_shard_workers()
+    stats = BatchStats(BATCH_STATS_INTERVAL)
+    merger = ShardMerger()
+    queue_depth.labels('worker_batches').set_function(lambda: len(merger.pending))
+    retrainer = start_retrainer()
+    tailer = open_log_tailer()
+    try:
+        while True:
+            lines = tailer.read_lines()
+            lines_read.inc(len(lines))
+            retrainer.observe(lines)
+            retrainer.poll()
+            new_model = model_watcher.poll()
+            if new_model:
+                # Queued behind the batches already dispatched, so each worker swaps between batches
+                for inbox in inboxes:
+                    inbox.put(new_model)
+            flush_incidents()
+            dispatch_shards(lines, inboxes, merger, BATCH_SIZE, tailer.position())
+
+            # Collect finished shards; batches are released strictly in dispatch order
+            while True:
+                try:
+                    merger.collect(*results.get(timeout=0 if lines or not merger.pending else 0.05))
+                except queue.Empty:
+                    break
+            for size, dispatched_at, position, anomalies, log_lag in merger.completed():
+                for anomaly in anomalies:
+                    report_anomaly(*anomaly)
+                stats.record(size, time.monotonic() - dispatched_at, log_lag)
+                tailer.commit(position=position)
+
+            if not lines and not merger.pending:
+                tailer.wait(1)
+    finally:
+        for inbox in inboxes:
+            inbox.put(None)
+        tailer.close()
+
+# Fork WORKERS scoring processes; returns their inboxes and the shared results queue
+def start_shard_workers():
+    context = multiprocessing.get_context('fork')
+    inboxes = [context.Queue(WORKER_QUEUE_DEPTH) for _ in range(WORKERS)]
+    results = context.Queue()
+    workers = [context.Process(target=shard_worker, args=(inbox, results), daemon=True) for inbox in inboxes]
+    for worker in workers:
+        worker.start()
+    print(f"Started {WORKERS} scoring workers.")
+    return inboxes, results
+
+# Split lines into batches that give every worker about `batch_size` lines, and queue them
+def dispatch_shards(lines, inboxes, merger, batch_size, position):
+    step = max(batch_size, 1) * WORKERS
+    for start in range(0, len(lines), step):
+        batch = lines[start:start + step]
+        shards = [([], []) for _ in range(WORKERS)]
+        for index, line in enumerate(batch):
+            indexes, shard_lines = shards[shard_for(line)]
+            indexes.append(index)
+            shard_lines.append(line)
+        batch_id = merger.dispatch(sum(1 for _, shard_lines in shards if shard_lines), len(batch), position)
+        for inbox, (indexes, shard_lines) in zip(inboxes, shards):
+            if shard_lines:
+                inbox.put((batch_id, indexes, shard_lines))
+
+# Worker index for a raw line: custom_sanitized starts with $remote_addr, so the client
+# IP is the first space-delimited field and all of one client's lines go to one worker
+def shard_for(line):
+    return zlib.crc32(line[:line.find(' ')].encode()) % WORKERS
+
+# Scoring worker: scores its share of each batch and returns the anomalies by line index.
+# Its metrics go to its own file in the metrics directory, which the main process serves.
+def shard_worker(inbox, results):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        if isinstance(item, str):
+            install_model_version(item)
+            continue
+        batch_id, indexes, lines = item
+        parsed_entries, anomalies = score_log_batch(lines)
+        anomalies = [(indexes[line], parsed['IP_Address'], build_feature_record(parsed), score, parsed['Timestamp'])
+                     for line, parsed, score in anomalies]
+        first_timestamp = parsed_entries[0]['Timestamp'].timestamp() if parsed_entries else None
+        results.put((batch_id, anomalies, first_timestamp))
+
+# Reassembles per-worker results into one stream ordered by batch and line
+class ShardMerger:
+    def __init__(self):
+        self.next_id = 0
+        self.released = 0
+        self.pending = {}
+
+    def dispatch(self, shard_count, size, position):
+        batch_id = self.next_id
+        self.next_id += 1
+        self.pending[batch_id] = {'remaining': shard_count, 'size': size, 'position': position,
+                                  'dispatched_at': time.monotonic(), 'anomalies': [], 'first_timestamp': None}
+        return batch_id
 
-    parsed_data = match.groupdict()
-    parsed_data['Timestamp'] = datetime.strptime(parsed_data['Timestamp'], "%d/%b/%Y:%H:%M:%S %z")
+    def collect(self, batch_id, anomalies, first_timestamp):
+        batch = self.pending[batch_id]
+        batch['remaining'] -= 1
+        batch['anomalies'].extend(anomalies)
+        if first_timestamp is not None:
+            batch['first_timestamp'] = min(first_timestamp, batch['first_timestamp'] or first_timestamp)
 
-    df = pd.DataFrame([{
+    def completed(self):
+        while self.released in self.pending and self.pending[self.released]['remaining'] == 0:
+            batch = self.pending.pop(self.released)
+            self.released += 1
+            batch['anomalies'].sort(key=lambda anomaly: anomaly[0])
+            log_lag = time.time() - batch['first_timestamp'] if batch['first_timestamp'] is not None else None
+            yield (batch['size'], batch['dispatched_at'], batch['position'],
+                   [anomaly[1:] for anomaly in batch['anomalies']], log_lag)
+
+# Generate the log line parser from the nginx log_format definition
+def load_log_format():
+    global line_parser
+    line_parser = load_log_parser(NGINX_CONF_PATH, LOG_FORMAT_NAME)
+
+# Parse a raw log line into its typed fields, or None if it does not match
+def parse_log_entry(log_entry):
+    parsed_data = line_parser.parse(log_entry)
+    if parsed_data is None:
+        parse_failures.record(log_entry)
+        lines_failed.inc()
+    else:
+        lines_parsed.inc()
+    return parsed_data
+
+# Build the feature record logged for review from the parsed log fields
+def build_feature_record(parsed_data):
+    return {
         'IP_Address': parsed_data['IP_Address'],
         'Method': parsed_data['Method'],
         'Resource': parsed_data['Resource'],
         'Bytes Sent': float(parsed_data['Bytes_Sent']),
-        'Source Port': int(parsed_data['Source_Port']),
-        'Destination Port': int(parsed_data['Destination_Port']),
-        'Response Time (seconds)': float(parsed_data['Response_Time']) if parsed_data['Response_Time'] else 0.0,
-        'Backend Time (seconds)': float(parsed_data['Backend_Time']) if parsed_data['Backend_Time'] else 0.0,
+        'Source Port': parsed_data['Source_Port'],
+        'Destination Port': parsed_data['Destination_Port'],
+        'Response Time (seconds)': parsed_data['Response_Time'] or 0.0,
+        'Backend Time (seconds)': parsed_data['Backend_Time'] or 0.0,
         'User Agent': parsed_data['User_Agent'],
         'Hour': parsed_data['Timestamp'].hour,
         'Day': parsed_data['Timestamp'].day,
-        'Weekday': parsed_data['Timestamp'].weekday()
-    }])
+        'Weekday': parsed_data['Timestamp'].weekday(),
+        **{col: parsed_data[col] for col in WINDOW_COLUMNS if col in parsed_data}
+    }
+
+# Process individual log entries and detect anomalies
+def process_log_entry(log_entry):
+    started = time.perf_counter()
+    parsed_data = parse_log_entry(log_entry)
+    parsed = time.perf_counter()
+    stage_seconds.labels('parse').observe(parsed - started)
+    if parsed_data is None:
+        return
+
+    features = get_feature_buffer().transform([parsed_data])
+    transformed = time.perf_counter()
+    score = forest.decision_function(features)[0]
+    stage_seconds.labels('features').observe(transformed - parsed)
+    stage_seconds.labels('predict').observe(time.perf_counter() - transformed)
+    tail_lag_seconds.set(time.time() - parsed_data['Timestamp'].timestamp())
+
+    if score < 0:
+        report_anomaly(parsed_data['IP_Address'], build_feature_record(parsed_data), float(score),
+                       parsed_data['Timestamp'])
 
-    processed_df = preprocess_data(df)
-    prediction = iso_forest.predict(processed_df)
+# Parse and score a batch of log entries with a single feature transform and scoring call.
+# Returns the parsed entries and, for those that are anomalous, (index in log_entries,
+# parsed entry, decision score): lines that fail to parse are skipped but keep their place.
+def score_log_batch(log_entries):
+    started = time.perf_counter()
+    parsed_lines = [(line, parsed) for line, parsed in enumerate(map(parse_log_entry, log_entries))
+                    if parsed is not None]
+    parsed_entries = [parsed for _, parsed in parsed_lines]
+    parsed = time.perf_counter()
+    stage_seconds.labels('parse').observe(parsed - started)
+    if not parsed_entries:
+        return parsed_entries, []
+    features = get_feature_buffer().transform(parsed_entries)
+    transformed = time.perf_counter()
+    scores = forest.decision_function(features)
+    stage_seconds.labels('features').observe(transformed - parsed)
+    stage_seconds.labels('predict').observe(time.perf_counter() - transformed)
+    return parsed_entries, [(parsed_lines[i][0], parsed_entries[i], float(scores[i]))
+                            for i in np.flatnonzero(scores < 0)]
 
-    if prediction[0] == -1:
-        print(f"Anomaly detected for IP: {parsed_data['IP_Address']}")
-        log_anomaly_for_review(parsed_data['IP_Address'], df)
+# Process a batch of log entries and report its anomalies
+def process_log_batch(log_entries, batch_started, stats):
+    parsed_entries, anomalies = score_log_batch(log_entries)
+    for _, parsed, score in anomalies:
+        report_anomaly(parsed['IP_Address'], build_feature_record(parsed), score, parsed['Timestamp'])
+
+    # End-to-end lag: how long the oldest line waited, and how far behind the log we are
+    lag = time.monotonic() - batch_started
+    log_lag = time.time() - parsed_entries[0]['Timestamp'].timestamp() if parsed_entries else None
+    stats.record(len(log_entries), lag, log_lag)
+
+# Feature buffer for live scoring; requires a fitted scaler
+def get_feature_buffer():
+    if feature_buffer is None:
+        from sklearn.exceptions import NotFittedError
+        raise NotFittedError("No trained model and scaler available for scoring.")
+    return feature_buffer
+
+# Batch size and lag statistics, printed every `interval` seconds
+class BatchStats:
+    def __init__(self, interval):
+        self.interval = interval
+        self.reset(time.monotonic())
+
+    def reset(self, now):
+        self.window_start = now
+        self.batches = 0
+        self.lines = 0
+        self.max_size = 0
+        self.lags = []
+        self.max_log_lag = None
+
+    def record(self, size, lag, log_lag):
+        batch_lag_seconds.observe(lag)
+        if log_lag is not None:
+            tail_lag_seconds.set(log_lag)
+        self.batches += 1
+        self.lines += size
+        self.max_size = max(self.max_size, size)
+        self.lags.append(lag)
+        if log_lag is not None:
+            self.max_log_lag = log_lag if self.max_log_lag is None else max(self.max_log_lag, log_lag)
+
+        now = time.monotonic()
+        if now - self.window_start >= self.interval:
+            self.report(now)
+            self.reset(now)
+
+    def report(self, now):
+        lags = sorted(self.lags)
+        elapsed = now - self.window_start
+        log_lag = f"{self.max_log_lag:.1f}s" if self.max_log_lag is not None else "n/a"
+        print(f"Batches: {self.batches}, lines: {self.lines} ({self.lines / elapsed:.1f}/s), "
+              f"avg size: {self.lines / self.batches:.1f}, max size: {self.max_size}, "
+              f"lag p50: {lags[len(lags) // 2] * 1000:.1f}ms, max: {lags[-1] * 1000:.1f}ms, "
+              f"behind log: {log_lag}")
 
 # Log anomalies for review
 def log_anomaly_for_review(ip_address, anomaly_data):
     feedback_entry = {
+        "id": uuid.uuid4().hex,
         "ip_address": ip_address,
         "timestamp": datetime.now().isoformat(),
-        "anomaly_data": anomaly_data.to_dict(orient="records")[0],
+        "anomaly_data": anomaly_data,
         "reviewed": False,
         "feedback": None
     }
-    with open(ANOMALY_LOG_PATH, "a") as feedback_file:
-        json.dump(feedback_entry, feedback_file)
-        feedback_file.write("\n")
+    get_anomaly_sink().write(feedback_entry)
     print(f"Anomaly for IP {ip_address} logged.")
 
-# IP Blocking (optional)
+# Hand an anomaly to the incident aggregator, or log it on its own when aggregation is off
+def report_anomaly(ip_address, anomaly_data, score, seen_at):
+    print(f"Anomaly detected for IP: {ip_address}")
+    anomalies_found.inc()
+    if INCIDENT_WINDOW > 0:
+        incident = incidents.add(ip_address, anomaly_data, score, seen_at)
+        # Block once per incident, when it reaches the threshold
+        if BLOCK_BACKEND != "none" and incident.count == BLOCK_MIN_ANOMALIES:
+            block_ip(ip_address)
+    else:
+        log_anomaly_for_review(ip_address, anomaly_data)
+
+# Log the incidents whose window has closed, or all of them on shutdown
+def flush_incidents(final=False, now=None):
+    for incident in incidents.drain() if final else incidents.expired(now):
+        get_anomaly_sink().write(incident.to_record())
+        incidents_logged.inc()
+        print(f"Incident for IP {incident.ip_address} logged ({incident.count} anomalies).")
+
+# Writer for the anomaly log, started on first use
+def get_anomaly_sink():
+    global anomaly_sink
+    if anomaly_sink is None:
+        anomaly_sink = AnomalySink(ANOMALY_LOG_PATH, max_group=ANOMALY_FLUSH_COUNT,
+                                   flush_interval=ANOMALY_FLUSH_INTERVAL, fsync_policy=ANOMALY_FSYNC,
+                                   fsync_interval=ANOMALY_FSYNC_INTERVAL, max_bytes=ANOMALY_LOG_MAX_BYTES,
+                                   backup_count=ANOMALY_LOG_BACKUPS, queue_size=ANOMALY_QUEUE_SIZE,
+                                   stats_interval=BATCH_STATS_INTERVAL).start()
+    return anomaly_sink
+
+# IP Blocking (optional): queued and applied in batches by the blocker thread
 def block_ip(ip_address):
+    blocker = get_ip_blocker()
+    if blocker is None:
+        print(f"IP blocking is disabled; not blocking {ip_address}.")
+        return
+    blocker.block(ip_address)
+
+# Blocker for the configured backend, started on first use; None when blocking is disabled
+def get_ip_blocker():
+    global ip_blocker
+    if ip_blocker is None and BLOCK_BACKEND != "none":
+        backends = [make_block_backend(name.strip()) for name in BLOCK_BACKEND.split(",")]
+        backend = backends[0] if len(backends) == 1 else MultiBackend(backends)
+        ip_blocker = IPBlocker(backend, BLOCK_TTL, BLOCK_BATCH_INTERVAL, BLOCK_AGGREGATE_DENSITY,
+                               BLOCK_AGGREGATE_MIN_PREFIX, BLOCK_AGGREGATE_MIN_PREFIX_V6).start()
+    return ip_blocker
+
+def make_block_backend(name):
+    if name == "file":
+        return FileBackend(BLOCKLIST_PATH)
+    if name == "ipset":
+        return IpsetBackend(IPSET_NAME, use_sudo=BLOCK_USE_SUDO, ttl=BLOCK_TTL)
+    if name == "nginx":
+        return NginxDenyMapBackend(NGINX_DENY_MAP_PATH, NGINX_RELOAD_COMMAND, NGINX_RELOAD_INTERVAL)
+    if name == "redis":
+        return RedisBackend(BLOCK_REDIS_URL, BLOCK_REDIS_PREFIX, BLOCK_REDIS_CHANGES_KEPT)
+    raise ValueError(f"Unknown BLOCK_BACKEND {name!r}; use none or any of file, ipset, nginx, redis")
+
+# Read log files (plain or gzip) in large chunks, yielding (path, complete lines) per chunk
+def read_log_chunks(paths, chunk_size):
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            rest = b''
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                buffer = rest + chunk
+                end = buffer.rfind(b'\n') + 1
+                rest = buffer[end:]
+                if end:
+                    yield path, buffer[:end].decode('utf-8', 'replace').split('\n')[:-1]
+            if rest:
+                yield path, [rest.decode('utf-8', 'replace')]
+
+# Score historical logs with the sharded workers, as fast as they go. Anomalies and
+# incidents are written to the anomaly log as in live mode, with incident windows
+# following log time; nothing is blocked.
+def replay_logs(paths):
+    inboxes, results = start_shard_workers()
+    merger = ShardMerger()
+    started = last_report = time.monotonic()
+    replayed = lines_done = anomaly_count = 0
+    log_time = None
+
+    def release(timeout):
+        nonlocal lines_done, anomaly_count, log_time
+        while True:
+            try:
+                merger.collect(*results.get(timeout=timeout))
+            except queue.Empty:
+                break
+            timeout = 0
+        for size, _, _, anomalies, _ in merger.completed():
+            lines_done += size
+            anomaly_count += len(anomalies)
+            for ip_address, anomaly_data, score, seen_at in anomalies:
+                log_time = seen_at.timestamp()
+                if INCIDENT_WINDOW > 0:
+                    incidents.add(ip_address, anomaly_data, score, seen_at, now=log_time)
+                else:
+                    log_anomaly_for_review(ip_address, anomaly_data)
+            if log_time is not None:
+                flush_incidents(now=log_time)
+
     try:
-        subprocess.run(["sudo", "iptables", "-A", "INPUT", "-s", ip_address, "-j", "DROP"], check=True)
-        subprocess.run(["sudo", "systemctl", "reload", "nginx"], check=True)
-        print(f"Blocked IP: {ip_address}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error blocking IP {ip_address}: {e}")
+        for path, lines in read_log_chunks(paths, REPLAY_CHUNK_SIZE):
+            replayed += len(lines)
+            dispatch_shards(lines, inboxes, merger, REPLAY_BATCH_SIZE, None)
+            release(0)
+            now = time.monotonic()
+            if now - last_report >= REPLAY_PROGRESS_INTERVAL:
+                print(f"Replayed {lines_done} of {replayed} lines read ({lines_done / (now - started):.0f} lines/s), "
+                      f"{anomaly_count} anomalies; reading {path}")
+                last_report = now
+        while merger.pending:
+            release(0.1)
+    finally:
+        for inbox in inboxes:
+            inbox.put(None)
+    elapsed = time.monotonic() - started
+    print(f"Replay finished: {lines_done} lines in {elapsed:.1f}s ({lines_done / max(elapsed, 1e-9):.0f} lines/s), "
+          f"{anomaly_count} anomalies.")
+
+def parse_replay_args(argv):
+    parser = argparse.ArgumentParser(prog="anomaly_detector.py replay",
+                                     description="Score historical access logs (plain or .gz), oldest first")
+    parser.add_argument('paths', nargs='+', help="Log files, in the order to replay them")
+    parser.add_argument('--workers', type=int, default=REPLAY_WORKERS)
+    parser.add_argument('--batch-size', type=int, default=REPLAY_BATCH_SIZE)
+    parser.add_argument('--chunk-size', type=int, default=REPLAY_CHUNK_SIZE)
+    parser.add_argument('--output', default=ANOMALY_LOG_PATH, help="Anomaly log to write (default: ANOMALY_LOG_PATH)")
+    return parser.parse_args(argv)
+
+# Serve the metrics endpoint, reading queue depths and block counts at scrape time
+def start_metrics():
+    queue_depth.labels('anomaly_sink').set_function(lambda: anomaly_sink.queue.qsize() if anomaly_sink else 0)
+    queue_depth.labels('ip_blocker').set_function(lambda: ip_blocker.queue.qsize() if ip_blocker else 0)
+    queue_depth.labels('open_incidents').set_function(lambda: len(incidents.open))
+    blocked_addresses.set_function(lambda: ip_blocker.metrics['addresses'] if ip_blocker else 0)
+    block_rules.set_function(lambda: ip_blocker.metrics['rules'] if ip_blocker else 0)
+    metrics.serve(METRICS_PORT, METRICS_ADDRESS)
 
 # Handle graceful shutdown
 def handle_shutdown_signal(signal, frame):
@@ -171,6 +908,33 @@ def handle_shutdown_signal(signal, frame):
 # Main execution
 if __name__ == "__main__":
     signal.signal(signal.SIGINT, handle_shutdown_signal)
+    signal.signal(signal.SIGTERM, handle_shutdown_signal)
+    replay_args = parse_replay_args(sys.argv[2:]) if sys.argv[1:2] == ["replay"] else None
+    if replay_args:
+        WORKERS = max(replay_args.workers, 1)
+        REPLAY_BATCH_SIZE = replay_args.batch_size
+        REPLAY_CHUNK_SIZE = replay_args.chunk_size
+        ANOMALY_LOG_PATH = replay_args.output
     print("Starting anomaly detection system...")
+    if METRICS_PORT and not replay_args:
+        start_metrics()
+    if REVIEW_COMPACT_INTERVAL > 0 and not replay_args:
+        ReviewCompactor(ReviewLog(REVIEW_LOG_PATH), REVIEW_COMPACT_INTERVAL).start()
+    load_log_format()
     load_or_initialize_model()
-    monitor_nginx_logs()
+    try:
+        if replay_args:
+            replay_logs(replay_args.paths)
+        elif WORKERS > 1:
+            monitor_nginx_logs_sharded()
+        elif BATCH_SIZE > 1:
+            monitor_nginx_logs_batched()
+        else:
+            monitor_nginx_logs()
+    finally:
+        # Write out open incidents and anomalies still queued
+        flush_incidents(final=True)
+        if anomaly_sink is not None:
+            anomaly_sink.close()
+        if ip_blocker is not None:
+            ip_blocker.close()
@@ -0,0 +1,134 @@
+import json
+import os
+import queue
+import threading
+import time
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+class AnomalySink:
+    """
+    Buffered JSON-lines writer for anomaly records, running on its own thread.
+    write() only enqueues; the thread serializes records and appends them in
+    groups of up to `max_group` records or `flush_interval` seconds, with one
+    write() per group. fsync follows `fsync_policy`: after every group ('always'),
+    at most every `fsync_interval` seconds ('interval'), or never. The file is
+    rotated to .1, .2, ... once it exceeds `max_bytes`. If the disk falls behind
+    and the queue fills, records are dropped and counted rather than blocking
+    detection; queue depth, lag and drops are reported every `stats_interval`.
+    """
+
+    def __init__(self, path, max_group=1000, flush_interval=0.5, fsync_policy='interval', fsync_interval=5.0,
+                 max_bytes=100 << 20, backup_count=5, queue_size=100000, stats_interval=60.0):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"fsync policy must be one of {', '.join(FSYNC_POLICIES)}, not {fsync_policy!r}")
+        self.path = path
+        self.max_group = max_group
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.stats_interval = stats_interval
+        self.queue = queue.Queue(queue_size)
+        self.thread = threading.Thread(target=self.run, name='anomaly-sink', daemon=True)
+        self.file = None
+        self.last_fsync = time.monotonic()
+        self.dropped = 0
+        self.reset_stats(time.monotonic())
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def write(self, record):
+        """Queue a record for writing; never blocks."""
+        try:
+            self.queue.put_nowait((time.monotonic(), record))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Write everything queued so far, then stop the thread."""
+        if self.thread.is_alive():
+            self.queue.put((time.monotonic(), None))
+            self.thread.join()
+
+    def run(self):
+        self.file = open(self.path, 'a')
+        try:
+            while True:
+                group = self.next_group()
+                stopping = bool(group) and group[-1][1] is None
+                if stopping:
+                    group.pop()
+                if group:
+                    self.write_group(group)
+                self.maybe_report()
+                if stopping:
+                    break
+        finally:
+            self.file.flush()
+            if self.fsync_policy != 'never':
+                os.fsync(self.file.fileno())
+            self.file.close()
+
+    # Block for the first record, then take more until the group is full or the flush interval passes
+    def next_group(self):
+        try:
+            group = [self.queue.get(timeout=self.stats_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(group) < self.max_group and group[-1][1] is not None:
+            timeout = deadline - time.monotonic()
+            try:
+                group.append(self.queue.get_nowait() if timeout <= 0 else self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return group
+
+    def write_group(self, group):
+        self.file.write(''.join(json.dumps(record) + '\n' for _, record in group))
+        self.file.flush()
+        now = time.monotonic()
+        if self.fsync_policy == 'always' or (self.fsync_policy == 'interval'
+                                             and now - self.last_fsync >= self.fsync_interval):
+            os.fsync(self.file.fileno())
+            self.last_fsync = now
+
+        self.records += len(group)
+        self.groups += 1
+        self.max_lag = max(self.max_lag, now - group[0][0])
+        if self.max_bytes and self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    # Shift path.1 -> path.2, ..., then path -> path.1, and start a new file
+    def rotate(self):
+        self.file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+            self.file = open(self.path, 'a')
+        else:
+            self.file = open(self.path, 'w')
+        print(f"Rotated anomaly log {self.path}.")
+
+    def reset_stats(self, now):
+        self.window_start = now
+        self.records = 0
+        self.groups = 0
+        self.max_lag = 0.0
+
+    def maybe_report(self):
+        now = time.monotonic()
+        if now - self.window_start < self.stats_interval:
+            return
+        if self.records or self.dropped:
+            print(f"Anomaly sink: {self.records} records in {self.groups} writes, "
+                  f"{self.queue.qsize()} queued, max lag: {self.max_lag * 1000:.0f}ms, "
+                  f"dropped: {self.dropped} total")
+        self.reset_stats(now)
@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from encoders import CategoricalEncoder
+from features import FEATURE_COLUMNS
+from forest import CompiledForest
+
+
+class StandardScaling:
+    """
+    The fitted parameters of a StandardScaler: column names, mean and scale. It is
+    all live scoring needs, loads without sklearn, and transforms like the scaler.
+    """
+
+    def __init__(self, feature_names_in_, mean_, scale_):
+        self.feature_names_in_ = np.asarray(feature_names_in_, dtype=object)
+        self.mean_ = mean_
+        self.scale_ = scale_
+
+    @classmethod
+    def from_scaler(cls, scaler):
+        names = getattr(scaler, 'feature_names_in_', FEATURE_COLUMNS)
+        columns = len(names)
+        return cls(names,
+                   scaler.mean_ if scaler.mean_ is not None else np.zeros(columns),
+                   scaler.scale_ if scaler.scale_ is not None else np.ones(columns))
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+def save_model_artifact(path, forest, scaler, encoder, **metadata):
+    """
+    Write a model as a directory of raw arrays: the compiled forest's .npy files,
+    the scaler's mean and scale, and model.json with the scaler columns, encoder
+    vocabularies and `metadata`. It is written under a temporary name and renamed
+    into place, so readers never see a partial artifact.
+    """
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    forest.save(tmp_path)
+    np.save(os.path.join(tmp_path, 'scaler_mean.npy'), np.asarray(scaler.mean_, dtype=np.float64))
+    np.save(os.path.join(tmp_path, 'scaler_scale.npy'), np.asarray(scaler.scale_, dtype=np.float64))
+    with open(os.path.join(tmp_path, 'model.json'), 'w') as f:
+        json.dump({**metadata, 'columns': list(scaler.feature_names_in_), 'encoder': encoder.to_dict()}, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_model_artifact(path, mmap_mode='r'):
+    """Load an artifact written by save_model_artifact, memory-mapping its arrays."""
+    with open(os.path.join(path, 'model.json')) as f:
+        metadata = json.load(f)
+    scaler = StandardScaling(metadata.pop('columns'),
+                             np.load(os.path.join(path, 'scaler_mean.npy'), mmap_mode=mmap_mode),
+                             np.load(os.path.join(path, 'scaler_scale.npy'), mmap_mode=mmap_mode))
+    encoder = CategoricalEncoder.from_dict(metadata.pop('encoder'))
+    return {**metadata, 'forest': CompiledForest.load(path, mmap_mode), 'scaler': scaler, 'encoder': encoder}
@@ -0,0 +1,175 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from benchmarks.loggen import generate_lines
+
+# Measures the detector stage by stage (parse, features, predict, write) and end to end,
+# reporting lines/s and p50/p99 per-line latency, and fails when a stage falls behind
+# the stored baseline. Runs headless on synthetic traffic with injected bursts.
+# Run from the Anomaly_Detector directory: python -m benchmarks.detector_bench
+# After an intended performance change: python -m benchmarks.detector_bench --update-baseline
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'detector_baseline.json')
+NGINX_CONF_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'nginx', 'nginx.conf')
+
+warnings.filterwarnings("ignore")
+
+
+# Point the detector at a scratch directory before importing it: it reads its config at import
+def import_detector(workdir, batch_size):
+    os.environ.update({
+        'MODEL_PATH': os.path.join(workdir, 'iso_forest_model.pkl'),
+        'SCALER_PATH': os.path.join(workdir, 'scaler.pkl'),
+        'ANOMALY_LOG_PATH': os.path.join(workdir, 'anomaly_feedback.json'),
+        'HISTORICAL_DATA_PATH': os.path.join(workdir, 'access_logs.csv'),
+        'NGINX_CONF_PATH': NGINX_CONF_PATH,
+        'BATCH_SIZE': str(batch_size),
+        'BLOCK_BACKEND': 'none',
+    })
+    import anomaly_detector
+    return anomaly_detector
+
+
+# Fit a model on synthetic traffic and load it the way the detector does at startup
+def train_detector(detector, lines):
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+    from encoders import CategoricalEncoder
+
+    detector.load_log_format()
+    detector.iso_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
+    detector.scaler = StandardScaler()
+    detector.encoder = CategoricalEncoder()
+    data = detector.build_training_data(lines)
+    detector.fit_model(data)
+    detector.save_model_version(1, len(data))
+    detector.load_or_initialize_model()
+
+
+# Time `call` once per item, keeping the fastest of `repeat` rounds to damp machine noise;
+# `sizes` gives the lines each item stands for (default 1)
+def measure(call, items, sizes=None, repeat=3):
+    sizes = sizes or [1] * len(items)
+    timings = None
+    for _ in range(repeat):
+        round_timings = np.empty(len(items))
+        for i, item in enumerate(items):
+            start = time.perf_counter()
+            call(item)
+            round_timings[i] = time.perf_counter() - start
+        if timings is None or round_timings.sum() < timings.sum():
+            timings = round_timings
+    # A line waits for its whole call, so batched stages report the call time per line
+    per_line = np.repeat(timings, sizes)
+    return {
+        'lines_per_second': round(sum(sizes) / timings.sum(), 1),
+        'p50_us': round(float(np.percentile(per_line, 50)) * 1e6, 2),
+        'p99_us': round(float(np.percentile(per_line, 99)) * 1e6, 2),
+    }
+
+
+def run_stages(detector, lines, batch_size):
+    results = {}
+    parser = detector.line_parser
+    parsed_entries = [parsed for parsed in map(parser.parse, lines) if parsed is not None]
+    buffer = detector.get_feature_buffer()
+    results['parse'] = measure(parser.parse, lines)
+    results['features'] = measure(lambda parsed: buffer.transform([parsed]), parsed_entries)
+    rows = [buffer.transform([parsed]).copy() for parsed in parsed_entries]
+    results['predict'] = measure(detector.forest.decision_function, rows)
+    matrices = [np.vstack(rows[start:start + batch_size]) for start in range(0, len(rows), batch_size)]
+    results['predict_batch'] = measure(detector.forest.decision_function, matrices, [len(X) for X in matrices])
+
+    # preprocess_data on the training path, in frames of batch_size rows
+    data = detector.build_training_data(lines)
+    frames = [data.iloc[start:start + batch_size].reset_index(drop=True) for start in range(0, len(data), batch_size)]
+    results['preprocess_data'] = measure(detector.preprocess_data, frames, [len(frame) for frame in frames])
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        records = [(parsed['IP_Address'], detector.build_feature_record(parsed)) for parsed in parsed_entries]
+        write_started = time.perf_counter()
+        results['log_anomaly_for_review'] = measure(lambda record: detector.log_anomaly_for_review(*record), records,
+                                                    repeat=1)
+        # Sink throughput includes draining the queue to disk
+        detector.anomaly_sink.close()
+        results['write'] = {**results['log_anomaly_for_review'],
+                            'lines_per_second': round(len(records) / (time.perf_counter() - write_started), 1)}
+        detector.anomaly_sink = None
+
+        results['process_log_entry'] = measure(detector.process_log_entry, lines)
+        batches = [lines[start:start + batch_size] for start in range(0, len(lines), batch_size)]
+        stats = detector.BatchStats(float('inf'))
+        results['process_log_batch'] = measure(lambda batch: detector.process_log_batch(batch, time.monotonic(), stats),
+                                               batches, [len(batch) for batch in batches])
+        detector.incidents.drain()
+    return results
+
+
+# Stages slower than the baseline by more than the tolerances; p99 is noisier, so it gets its own
+def regressions(results, baseline, tolerance, p99_tolerance):
+    failures = []
+    for stage, expected in baseline.items():
+        measured = results.get(stage)
+        if measured is None:
+            failures.append(f"{stage}: not measured")
+            continue
+        if measured['lines_per_second'] < expected['lines_per_second'] * (1 - tolerance):
+            failures.append(f"{stage}: {measured['lines_per_second']:,.0f} lines/s, "
+                            f"baseline {expected['lines_per_second']:,.0f}")
+        if measured['p50_us'] > expected['p50_us'] * (1 + tolerance):
+            failures.append(f"{stage}: p50 {measured['p50_us']:.1f}us, baseline {expected['p50_us']:.1f}us")
+        if measured['p99_us'] > expected['p99_us'] * (1 + p99_tolerance):
+            failures.append(f"{stage}: p99 {measured['p99_us']:.1f}us, baseline {expected['p99_us']:.1f}us")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector stage and end-to-end benchmarks with a regression gate")
+    parser.add_argument('--lines', type=int, default=20000)
+    parser.add_argument('--training-lines', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=512)
+    parser.add_argument('--burst-rate', type=float, default=0.0005)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.3, help="Allowed lines/s and p50 regression")
+    parser.add_argument('--p99-tolerance', type=float, default=1.0, help="Allowed p99 regression")
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    training_lines = [line.rstrip('\n') for line in generate_lines(args.training_lines, seed=1)]
+    lines = [line.rstrip('\n') for line in generate_lines(args.lines, seed=2, ips=200, burst_rate=args.burst_rate)]
+    with tempfile.TemporaryDirectory() as workdir:
+        detector = import_detector(workdir, args.batch_size)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            train_detector(detector, training_lines)
+        results = run_stages(detector, lines, args.batch_size)
+
+    print(f"{'stage':<24} {'lines/s':>12} {'p50 us':>10} {'p99 us':>10}")
+    for stage, result in results.items():
+        print(f"{stage:<24} {result['lines_per_second']:>12,.0f} {result['p50_us']:>10.1f} {result['p99_us']:>10.1f}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}.")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+    with open(args.baseline) as f:
+        failures = regressions(results, json.load(f), args.tolerance, args.p99_tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
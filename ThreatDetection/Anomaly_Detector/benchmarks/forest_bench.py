@@ -0,0 +1,83 @@
+import argparse
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from forest import CompiledForest
+
+# Checks the array-compiled forest against sklearn's IsolationForest and compares
+# their latency per call across batch sizes.
+# Run from the Anomaly_Detector directory: python -m benchmarks.forest_bench
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+# Rows to compare on: random points around the training data, plus rows sitting
+# exactly on split thresholds, where a float rounding difference would flip a branch
+def parity_rows(model, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(scale=2.0, size=(rows, model.n_features_in_))
+    ties = X[:rows // 10]
+    tree = model.estimators_[0].tree_
+    splits = np.flatnonzero(tree.children_left != -1)
+    for row, node in zip(ties, rng.choice(splits, len(ties))):
+        row[tree.feature[node]] = np.float32(tree.threshold[node])
+    return X
+
+
+def check_parity(model, compiled, X):
+    expected_scores = model.decision_function(X)
+    scores = compiled.decision_function(X)
+    mismatches = int((model.predict(X) != compiled.predict(X)).sum())
+    return float(np.abs(expected_scores - scores).max()), mismatches
+
+
+# Best time of one predict call on `batch_size` rows
+def seconds_per_call(predict, X, batch_size, budget=0.5):
+    batch = X[:batch_size]
+    best = float('inf')
+    deadline = time.perf_counter() + budget
+    while True:
+        start = time.perf_counter()
+        predict(batch)
+        best = min(best, time.perf_counter() - start)
+        if time.perf_counter() > deadline:
+            return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiled IsolationForest parity check and latency comparison")
+    parser.add_argument('--model', help="Fitted IsolationForest .pkl (default: fit one on random data)")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    args = parser.parse_args()
+
+    if args.model:
+        model = joblib.load(args.model)
+    else:
+        model = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
+        model.fit(np.random.default_rng(1).normal(size=(5000, 8)))
+    compiled = CompiledForest.from_model(model)
+
+    X = parity_rows(model, max(args.rows, max(BATCH_SIZES)))
+    max_difference, mismatches = check_parity(model, compiled, X)
+    print(f"Parity on {len(X)} rows: max decision_function difference {max_difference:.2e}, "
+          f"{mismatches} predict mismatches")
+
+    print(f"{'batch':>6} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8}")
+    for batch_size in BATCH_SIZES:
+        sklearn_seconds = seconds_per_call(model.predict, X, batch_size)
+        compiled_seconds = seconds_per_call(compiled.predict, X, batch_size)
+        print(f"{batch_size:>6} {sklearn_seconds * 1e3:>11.3f} {compiled_seconds * 1e3:>12.3f} "
+              f"{sklearn_seconds / compiled_seconds:>7.1f}x")
+    return 1 if mismatches or max_difference > args.tolerance else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Synthetic custom_sanitized NGINX access log lines for benchmarks and parser checks.
+# Run from the Anomaly_Detector directory to write a log, optionally paced in real time:
+# python -m benchmarks.loggen --lines 100000 --rate 500 --burst-rate 0.001 --realtime >> access.log
+
+METHODS = ['GET', 'GET', 'GET', 'POST', 'PATCH', 'DELETE']
+RESOURCES = ['/login/', '/logout/', '/register/', '/user/', '/users/pk/', '/token/refresh/',
+             '/admin/jsi18n/', '/api/access-logs/', '/api/review-anomalies/', '/static/css/base.css']
+USER_AGENTS = ['python-requests/2.32.3', 'PostmanRuntime/7.42.0',
+               'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+               'Chrome/130.0.0.0 Safari/537.36']
+STATUS_CODES = ['200', '200', '200', '201', '204', '302', '400', '401', '500']
+UPSTREAMS = ['172.18.0.5:8000', '172.18.0.6:8000', '172.18.0.7:8000']
+QUERY_STRINGS = ['-', '-', '-', 'page=2', 'next=/admin/&lang=en']
+
+# Variants that stress the delimiters the parsers rely on
+EDGE_CASES = [
+    lambda line: line.replace('"-" "', '"https://example.com/?q=a b" "', 1),
+    lambda line: line.replace('HTTP/1.1', 'HTTP/1.1 extra', 1),
+    lambda line: line.replace(' /', ' /pa"th', 1),
+    lambda line: line.replace('GET', 'GE\tT', 1),
+    lambda line: line.rstrip('\n') + ' trailing\n',
+    lambda line: line.rstrip('\n') + '\r\n',
+    lambda line: line.replace('" 80 ', '" 80 x', 1),
+    lambda line: line.replace('"200" "', '"200" "0.1, 0.2', 1),
+    lambda line: line[:len(line) // 2],
+    lambda line: '',
+    lambda line: ' ' + line,
+    lambda line: line.replace(' +0000]', ' +0300]', 1),
+    lambda line: line.replace('/Nov/', '/Nev/', 1),
+]
+
+
+def generate_lines(count, seed=0, start=None, lines_per_second=200, ips=50, edge_case_rate=0.0,
+                   burst_rate=0.0, burst_length=100):
+    """
+    Yield `count` access log lines, `lines_per_second` per [time_local] second.
+    With `burst_rate`, each line may start a burst: `burst_length` consecutive
+    lines from one new client hammering /login/ (credential stuffing).
+    """
+    rng = random.Random(seed)
+    start = start or datetime(2024, 11, 8, 10, 0, 0, tzinfo=timezone.utc)
+    addresses = [f"172.{18 + i // 250}.{i % 250}.{rng.randint(1, 254)}" for i in range(ips)]
+    burst_ip, burst_remaining = None, 0
+    for i in range(count):
+        timestamp = (start + timedelta(seconds=i // lines_per_second)).strftime("%d/%b/%Y:%H:%M:%S %z")
+        if burst_rate and not burst_remaining and rng.random() < burst_rate:
+            burst_ip, burst_remaining = f"203.0.113.{rng.randint(1, 254)}", burst_length
+        if burst_remaining:
+            burst_remaining -= 1
+            response_time = rng.expovariate(500)
+            yield (
+                f'{burst_ip} - [{timestamp}] "POST /login/ HTTP/1.1" 401 {rng.randint(40, 60)} "-" "curl/8.5.0" '
+                f'80 {rng.randint(32768, 60999)} - "localhost" "{rng.choice(UPSTREAMS)}" "401" '
+                f'"{response_time:.3f}" {response_time:.3f}\n'
+            )
+            continue
+        response_time = rng.expovariate(20)
+        query_string = rng.choice(QUERY_STRINGS)
+        resource = rng.choice(RESOURCES) + ('' if query_string == '-' else '?' + query_string)
+        line = (
+            f'{rng.choice(addresses)} - [{timestamp}] "{rng.choice(METHODS)} {resource} HTTP/1.1" '
+            f'{rng.choice(STATUS_CODES)} {rng.randint(0, 5000)} "-" "{rng.choice(USER_AGENTS)}" '
+            f'80 {rng.randint(32768, 60999)} {query_string} "localhost" "{rng.choice(UPSTREAMS)}" "200" '
+            f'"{response_time:.3f}" {response_time + rng.random() / 1000:.3f}\n'
+        )
+        if edge_case_rate and rng.random() < edge_case_rate:
+            line = rng.choice(EDGE_CASES)(line)
+        yield line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic custom_sanitized access log lines to stdout")
+    parser.add_argument('--lines', type=int, default=100000)
+    parser.add_argument('--rate', type=int, default=200, help="Lines per second of log time")
+    parser.add_argument('--ips', type=int, default=50)
+    parser.add_argument('--burst-rate', type=float, default=0.0, help="Chance per line of starting a burst")
+    parser.add_argument('--burst-length', type=int, default=100)
+    parser.add_argument('--edge-case-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--realtime', action='store_true', help="Pace output at --rate lines per wall-clock second")
+    args = parser.parse_args()
+
+    start = datetime.now(timezone.utc).replace(microsecond=0) if args.realtime else None
+    lines = generate_lines(args.lines, seed=args.seed, start=start, lines_per_second=args.rate, ips=args.ips,
+                           edge_case_rate=args.edge_case_rate, burst_rate=args.burst_rate,
+                           burst_length=args.burst_length)
+    started = time.monotonic()
+    for i, line in enumerate(lines):
+        sys.stdout.write(line)
+        if args.realtime and (i + 1) % args.rate == 0:
+            sys.stdout.flush()
+            time.sleep(max(started + (i + 1) / args.rate - time.monotonic(), 0))
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
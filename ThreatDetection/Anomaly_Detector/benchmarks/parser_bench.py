@@ -0,0 +1,97 @@
+import argparse
+import re
+import sys
+import time
+from datetime import datetime
+
+from log_parser import DEFAULT_LOG_FORMAT, LogParser, parse_seconds
+from benchmarks.loggen import generate_lines
+
+# Checks the parser generated from the custom_sanitized log_format against the
+# hand-written regex it replaced, and compares their throughput.
+# Run from the Anomaly_Detector directory: python -m benchmarks.parser_bench
+
+# The hand-written pattern; it only matches lines whose $query_string is "-"
+LEGACY_PATTERN = re.compile(
+    r'(?P<IP_Address>\S+) - \[(?P<Timestamp>[^\]]+)\] "(?P<Method>\S+) (?P<Resource>\S+) (?P<Protocol>[^\"]+)" '
+    r'(?P<Status_Code>\d+) (?P<Bytes_Sent>\d+) "(?P<Referrer>[^\"]*)" "(?P<User_Agent>[^\"]*)" '
+    r'(?P<Source_Port>\d+) (?P<Destination_Port>\d+) - "(?P<Origin_Server>[^\"]*)" "(?P<Destination>[^\"]*)" '
+    r'"(?P<Response_Code>[^\"]*)" "(?P<Response_Time>[\d.,]*)" (?P<Backend_Time>[\d.,]*)'
+)
+
+
+# The per-line parsing process_log_entry did with the hand-written pattern
+def parse_legacy(line):
+    match = LEGACY_PATTERN.match(line)
+    if not match:
+        return None
+    parsed_data = match.groupdict()
+    parsed_data['Timestamp'] = datetime.strptime(parsed_data['Timestamp'], "%d/%b/%Y:%H:%M:%S %z")
+    return parsed_data
+
+
+# Legacy fields converted to the generated parser's types, for comparison
+def typed_legacy(line):
+    try:
+        parsed_data = parse_legacy(line)
+        if parsed_data is None:
+            return None
+        for field in ('Status_Code', 'Bytes_Sent', 'Source_Port', 'Destination_Port'):
+            parsed_data[field] = int(parsed_data[field])
+        for field in ('Response_Time', 'Backend_Time'):
+            parsed_data[field] = parse_seconds(parsed_data[field])
+        return parsed_data
+    except ValueError:
+        return None
+
+
+def check_parity(parse, lines):
+    mismatches = recovered = 0
+    for line in lines:
+        expected = typed_legacy(line)
+        parsed = parse(line)
+        if expected is None and parsed is not None:
+            # Lines the hand-written pattern could not read, e.g. a non-empty $query_string
+            recovered += 1
+            continue
+        if parsed is not None:
+            parsed = {field: value for field, value in parsed.items() if field != 'Query_String'}
+        if parsed != expected:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"Mismatch: {line!r}")
+    return mismatches, recovered
+
+
+def lines_per_second(parser, lines, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            parser(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser parity check and throughput comparison")
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--edge-case-rate', type=float, default=0.05)
+    args = parser.parse_args()
+
+    log_parser = LogParser(DEFAULT_LOG_FORMAT)
+    corpus = list(generate_lines(args.lines, edge_case_rate=args.edge_case_rate))
+    mismatches, recovered = check_parity(log_parser.parse, corpus)
+    print(f"Parity: {len(corpus) - mismatches}/{len(corpus)} lines agree, "
+          f"{recovered} lines only the generated parser can read")
+
+    legacy_lines = [line for line in generate_lines(args.lines * 2) if LEGACY_PATTERN.match(line)][:args.lines]
+    legacy_rate = lines_per_second(parse_legacy, legacy_lines)
+    rate = lines_per_second(log_parser.parse, legacy_lines)
+    print(f"hand-written regex + strptime: {legacy_rate:12,.0f} lines/s")
+    print(f"generated typed parser:        {rate:12,.0f} lines/s ({rate / legacy_rate:.2f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.detector_bench import import_detector, train_detector
+from benchmarks.loggen import generate_lines
+
+# Measures cold start: the time from spawning a fresh interpreter to the first scored line,
+# loading the model from the memory-mapped artifact directory versus the previous pickled
+# artifact, and which heavy modules each path imports. With --processes, starts that many
+# detectors on one artifact and reports how much of its mapped memory they share.
+# Run from the Anomaly_Detector directory: python -m benchmarks.startup_bench --processes 4
+
+DETECTOR_DIR = os.path.join(os.path.dirname(__file__), '..')
+HEAVY_MODULES = ['pandas', 'sklearn', 'joblib']
+
+# Runs in the spawned interpreter: load the model, score one line, report, and with
+# --hold stay alive until stdin closes, so several copies are measured side by side
+CHILD = '''
+import contextlib, json, sys, time
+started = time.perf_counter()
+mode, path, line, hold = sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4] == '1'
+with contextlib.redirect_stdout(sys.stderr):
+    import anomaly_detector as detector
+    if mode == 'pickle':
+        # The previous startup: pandas and sklearn imported up front, one pickled artifact
+        import joblib, pandas, sklearn.ensemble
+        artifact = joblib.load(path)
+        detector.forest = artifact['forest']
+        detector.feature_buffer = detector.FeatureBuffer(artifact['scaler'], detector.BATCH_SIZE,
+                                                         artifact['encoder'], detector.windows)
+    else:
+        detector.install_model_version(path)
+    detector.load_log_format()
+    detector.score_log_batch([line])
+seconds = time.perf_counter() - started
+
+rss = pss = 0
+mapped = False
+with open('/proc/self/smaps') as f:
+    for row in f:
+        fields = row.split()
+        if '-' in fields[0]:
+            mapped = len(fields) > 5 and fields[5].startswith(path)
+        elif mapped and fields[0] in ('Rss:', 'Pss:'):
+            rss, pss = (rss + int(fields[1]), pss) if fields[0] == 'Rss:' else (rss, pss + int(fields[1]))
+print(json.dumps({'seconds': seconds, 'artifact_rss_kb': rss, 'artifact_pss_kb': pss,
+                  'heavy_modules': [name for name in %r if name in sys.modules]}), flush=True)
+if hold:
+    sys.stdin.read()
+''' % HEAVY_MODULES
+
+
+def spawn(mode, path, line, hold=False):
+    return subprocess.Popen([sys.executable, '-W', 'ignore', '-c', CHILD, mode, path, line, '1' if hold else '0'],
+                            cwd=DETECTOR_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True)
+
+
+# Wall time from spawn to the first scored line, and the child's own report
+def cold_start(mode, path, line):
+    started = time.perf_counter()
+    child = spawn(mode, path, line)
+    report = json.loads(child.stdout.readline())
+    report['wall_seconds'] = time.perf_counter() - started
+    child.communicate()
+    return report
+
+
+def shared_memory(path, line, processes):
+    children = [spawn('artifact', path, line, hold=True) for _ in range(processes)]
+    reports = [json.loads(child.stdout.readline()) for child in children]
+    for child in children:
+        child.communicate()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector cold start: memory-mapped versus pickled model artifacts")
+    parser.add_argument('--training-lines', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--processes', type=int, default=0, help="Detectors to start on one artifact")
+    args = parser.parse_args()
+
+    import joblib
+    from forest import CompiledForest
+
+    training_lines = [line.rstrip('\n') for line in generate_lines(args.training_lines, seed=1)]
+    line = training_lines[-1]
+    with tempfile.TemporaryDirectory() as workdir:
+        detector = import_detector(workdir, 512)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            train_detector(detector, training_lines)
+        artifact_path = detector.get_model_registry().path(1)
+        pickle_path = os.path.join(workdir, 'model.v0001.pkl')
+        joblib.dump({'model': detector.iso_forest, 'forest': CompiledForest.from_model(detector.iso_forest),
+                     'scaler': detector.scaler, 'encoder': detector.encoder}, pickle_path)
+
+        print(f"{'artifact':<10} {'median s':>10} {'min s':>8}  heavy modules")
+        for mode, path in (('pickle', pickle_path), ('artifact', artifact_path)):
+            reports = [cold_start(mode, path, line) for _ in range(args.runs)]
+            wall = [report['wall_seconds'] for report in reports]
+            print(f"{mode:<10} {statistics.median(wall):>10.3f} {min(wall):>8.3f}  "
+                  f"{', '.join(reports[0]['heavy_modules']) or '-'}")
+
+        if args.processes:
+            reports = shared_memory(artifact_path, line, args.processes)
+            rss = sum(report['artifact_rss_kb'] for report in reports)
+            pss = sum(report['artifact_pss_kb'] for report in reports)
+            print(f"{args.processes} detectors map the artifact with {rss:,} KiB resident in total but "
+                  f"{pss:,} KiB proportional, sharing its pages through the page cache.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+import heapq
+import os
+import queue
+import shlex
+import signal
+import subprocess
+import threading
+import time
+
+from prefix_tree import PrefixTree
+
+
+# Write `content` to `path` atomically, so readers never see a partial file
+def write_atomically(path, content):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class FileBackend:
+    """
+    Dry-run backend: writes the current rules, one CIDR per line, and touches
+    nothing else. Needs no privileges.
+    """
+
+    pending = False
+
+    def __init__(self, path):
+        self.path = path
+
+    def apply(self, tree, added, removed, refreshed=()):
+        if added or removed:
+            write_atomically(self.path, ''.join(f"{rule}\n" for rule in tree.rules()))
+        return True
+
+
+class IpsetBackend:
+    """
+    Blocks through one hash:net ipset referenced by a single iptables DROP rule.
+    Each batch of rule changes is applied with one `ipset restore` call; entries
+    carry the block TTL as their ipset timeout, so the kernel expires them even
+    if the detector stops.
+    """
+
+    pending = False
+
+    def __init__(self, set_name='anomaly_blocklist', use_sudo=True, ttl=3600.0):
+        self.set_name = set_name
+        self.ttl = ttl
+        self.prefix = ['sudo'] if use_sudo else []
+        self.run(['ipset', 'create', set_name, 'hash:net', 'timeout', '0', '-exist'])
+        rule = ['INPUT', '-m', 'set', '--match-set', set_name, 'src', '-j', 'DROP']
+        if subprocess.run(self.prefix + ['iptables', '-C'] + rule, capture_output=True).returncode != 0:
+            self.run(['iptables', '-I'] + rule)
+
+    def run(self, command, script=None):
+        subprocess.run(self.prefix + command, input=script, text=True, check=True, capture_output=True)
+
+    def apply(self, tree, added, removed, refreshed=()):
+        # Re-adding an existing entry with -exist resets its timeout
+        lines = [f"add {self.set_name} {rule} timeout {int(self.ttl)} -exist" for rule in list(added) + list(refreshed)]
+        lines += [f"del {self.set_name} {rule} -exist" for rule in removed]
+        try:
+            self.run(['ipset', 'restore'], '\n'.join(lines) + '\n')
+        except subprocess.CalledProcessError as e:
+            print(f"Error updating ipset {self.set_name}: {e.stderr.strip() if e.stderr else e}")
+            return False
+        return True
+
+
+class NginxDenyMapBackend:
+    """
+    Writes the blocklist as `geo $blocked_ip` entries, one `<cidr> 1;` per rule,
+    and reloads nginx at most once every `reload_interval` seconds; changes in
+    between are coalesced into the next reload. nginx/nginx.conf includes the
+    file in its `geo $blocked_ip` block and returns 403 when it matches.
+
+    nginx runs in its own container, so by default the reload is a SIGHUP to the
+    nginx master found in /proc, which needs the detector to share the nginx
+    container's pid namespace (`pid: "service:nginx"`). A `reload_command` runs
+    instead when given, for nginx on the same host.
+    """
+
+    def __init__(self, path, reload_command=None, reload_interval=10.0):
+        self.path = path
+        self.reload_command = shlex.split(reload_command) if reload_command else None
+        self.reload_interval = reload_interval
+        self.last_reload = 0.0
+        self.dirty = False
+
+    def apply(self, tree, added, removed, refreshed=()):
+        self.dirty = self.dirty or bool(added or removed)
+        if not self.dirty or time.monotonic() - self.last_reload < self.reload_interval:
+            return True
+        entries = ''.join(f"{rule} 1;\n" for rule in tree.rules())
+        write_atomically(self.path, f"# Generated by the anomaly detector\n{entries}")
+        self.last_reload = time.monotonic()
+        try:
+            self.reload()
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Error reloading nginx: {e}")
+            return False
+        self.dirty = False
+        return True
+
+    def reload(self):
+        if self.reload_command:
+            subprocess.run(self.reload_command, check=True, capture_output=True)
+            return
+        pid = find_nginx_master()
+        if pid is None:
+            raise OSError("no nginx master process visible; share the nginx container's pid namespace")
+        os.kill(pid, signal.SIGHUP)
+
+    # Changes held back until the reload interval passes
+    @property
+    def pending(self):
+        return self.dirty
+
+
+# Pid of the nginx master process, which names itself "nginx: master process ..."
+def find_nginx_master(proc='/proc'):
+    for entry in os.listdir(proc):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc, entry, 'cmdline'), 'rb') as f:
+                if f.read().startswith(b'nginx: master process'):
+                    return int(entry)
+        except OSError:
+            continue
+    return None
+
+
+class RedisBackend:
+    """
+    Publishes the rules to Redis for the Django blocklist middleware: the rule set
+    under `<prefix>:rules`, the version of each rule's last change in the sorted
+    set `<prefix>:changes`, and `<prefix>:version`, bumped once per batch. Readers
+    poll the version and fetch only the rules changed since the version they
+    hold. Changes more than `changes_kept` versions old are trimmed, and readers
+    older than `<prefix>:floor` reload the whole set instead. Assumes a single
+    detector writes under `prefix`.
+    """
+
+    pending = False
+
+    def __init__(self, url, prefix='blocklist', changes_kept=10000):
+        import redis
+
+        self.redis_error = redis.RedisError
+        self.client = redis.Redis.from_url(url)
+        self.rules_key, self.changes_key = f"{prefix}:rules", f"{prefix}:changes"
+        self.version_key, self.floor_key = f"{prefix}:version", f"{prefix}:floor"
+        self.changes_kept = changes_kept
+        # The detector starts with nothing blocked: drop what a previous run left
+        # behind and make every reader reload
+        self.version = self.floor = int(self.client.get(self.version_key) or 0) + 1
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.delete(self.rules_key, self.changes_key)
+        pipeline.set(self.floor_key, self.floor)
+        pipeline.set(self.version_key, self.version)
+        pipeline.execute()
+
+    def apply(self, tree, added, removed, refreshed=()):
+        if not (added or removed):
+            return True
+        version = self.version + 1
+        floor = max(self.floor, version - self.changes_kept)
+        pipeline = self.client.pipeline(transaction=True)
+        if added:
+            pipeline.sadd(self.rules_key, *added)
+        if removed:
+            pipeline.srem(self.rules_key, *removed)
+        pipeline.zadd(self.changes_key, {rule: version for rule in list(added) + list(removed)})
+        if floor > self.floor:
+            pipeline.zremrangebyscore(self.changes_key, '-inf', floor)
+            pipeline.set(self.floor_key, floor)
+        pipeline.set(self.version_key, version)
+        try:
+            pipeline.execute()
+        except self.redis_error as e:
+            print(f"Error publishing blocklist to Redis: {e}")
+            return False
+        self.version, self.floor = version, floor
+        return True
+
+
+class MultiBackend:
+    """Applies every batch to several backends, e.g. ipset on the host and Redis for Django."""
+
+    def __init__(self, backends):
+        self.backends = backends
+
+    def apply(self, tree, added, removed, refreshed=()):
+        # Every backend is applied; a failure in one retries the batch on all, which they tolerate
+        return all([backend.apply(tree, added, removed, refreshed) for backend in self.backends])
+
+    @property
+    def pending(self):
+        return any(backend.pending for backend in self.backends)
+
+
+class IPBlocker:
+    """
+    Queues block decisions and applies them in batches from a background thread,
+    so detection never waits on iptables or nginx. Each IP is blocked once and
+    stays blocked for `ttl` seconds; blocking it again only extends the expiry.
+    Expired IPs are removed in the same batches. Blocked IPs are kept in a
+    PrefixTree, so backends receive aggregated CIDR rules rather than one rule
+    per IP. Changes that fail to apply are retried with the next batch.
+    """
+
+    def __init__(self, backend, ttl=3600.0, batch_interval=1.0, density=0.5, min_prefix=24, min_prefix_v6=64):
+        self.backend = backend
+        self.ttl = ttl
+        self.batch_interval = batch_interval
+        self.queue = queue.Queue()
+        # State below is owned by the blocker thread
+        self.tree = PrefixTree(density, min_prefix, min_prefix_v6)
+        self.blocked = {}  # IP -> expiry (epoch seconds)
+        self.expiries = []  # Heap of (expiry, IP); stale entries are skipped
+        self.refreshed = set()  # IPs blocked again since the last batch
+        self.added = set()  # Rule changes not yet applied
+        self.removed = set()
+        self.metrics = self.tree.metrics()
+        self.thread = threading.Thread(target=self.run, name='ip-blocker', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def block(self, ip_address):
+        """Queue an IP to be blocked; never blocks the caller."""
+        self.queue.put(ip_address)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            deadline = time.monotonic() + self.batch_interval
+            requested = set()
+            while True:
+                try:
+                    ip_address = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if ip_address is None:
+                    stopping = True
+                    break
+                requested.add(ip_address)
+            self.apply_batch(requested, time.time())
+
+    def apply_batch(self, requested, now):
+        expiry = now + self.ttl
+        for ip_address in requested:
+            if ip_address in self.blocked:
+                self.refreshed.add(ip_address)
+            else:
+                try:
+                    self.change_rules(*self.tree.add(ip_address))
+                except ValueError:
+                    print(f"Not blocking invalid address {ip_address!r}.")
+                    continue
+            self.blocked[ip_address] = expiry
+            heapq.heappush(self.expiries, (expiry, ip_address))
+        while self.expiries and self.expiries[0][0] <= now:
+            ip_expiry, ip_address = heapq.heappop(self.expiries)
+            if self.blocked.get(ip_address) == ip_expiry:
+                del self.blocked[ip_address]
+                self.refreshed.discard(ip_address)
+                self.change_rules(*self.tree.remove(ip_address))
+
+        if not (self.added or self.refreshed or self.removed or self.backend.pending):
+            return
+        added, removed = sorted(self.added), sorted(self.removed)
+        refreshed = sorted({self.tree.rule_for(ip_address) for ip_address in self.refreshed} - self.added)
+        if self.backend.apply(self.tree, added, removed, refreshed):
+            if added or removed:
+                self.metrics = self.tree.metrics()
+                print(f"Blocking rules: +{len(added)} -{len(removed)}; {self.metrics['addresses']} IPs in "
+                      f"{self.metrics['rules']} rules, lookup cost {self.metrics['linear_lookup_cost']} "
+                      f"(linear) / {self.metrics['set_lookup_cost']} (hash:net).")
+            self.added.clear()
+            self.refreshed.clear()
+            self.removed.clear()
+
+    # Fold the tree's rule changes into those not yet applied
+    def change_rules(self, added, removed):
+        for rule in removed:
+            if rule in self.added:
+                self.added.discard(rule)
+            else:
+                self.removed.add(rule)
+        for rule in added:
+            if rule in self.removed:
+                self.removed.discard(rule)
+            else:
+                self.added.add(rule)
@@ -0,0 +1,79 @@
+import zlib
+
+# Categorical columns of the training data, and the parsed log field each one is read from
+CATEGORICAL_COLUMNS = {
+    'IP_Address': 'IP_Address',
+    'Method': 'Method',
+    'Resource': 'Resource',
+    'User Agent': 'User_Agent',
+}
+
+MISSING = 'Missing'
+
+
+class CategoricalEncoder:
+    """
+    Persistent categorical encoding. Each column's vocabulary (its `max_vocabulary`
+    most frequent values) is fitted once in train_model and saved next to the scaler.
+    Lookups are a dict access; values not seen in training hash into `hash_buckets`
+    codes after the vocabulary, so the code space stays bounded.
+    """
+
+    def __init__(self, columns=tuple(CATEGORICAL_COLUMNS), max_vocabulary=10000, hash_buckets=1024):
+        self.columns = list(columns)
+        self.max_vocabulary = max_vocabulary
+        self.hash_buckets = hash_buckets
+        self.vocabularies = None
+
+    @property
+    def fitted(self):
+        return self.vocabularies is not None
+
+    def to_dict(self):
+        """JSON-serializable state, for model artifacts."""
+        return {'columns': self.columns, 'max_vocabulary': self.max_vocabulary,
+                'hash_buckets': self.hash_buckets, 'vocabularies': self.vocabularies}
+
+    @classmethod
+    def from_dict(cls, state):
+        encoder = cls(state['columns'], state['max_vocabulary'], state['hash_buckets'])
+        encoder.vocabularies = state['vocabularies']
+        return encoder
+
+    def fit(self, data):
+        self.vocabularies = {}
+        for col in self.columns:
+            if col in data.columns:
+                counts = data[col].fillna(MISSING).astype(str).value_counts()
+                values = counts.index[:self.max_vocabulary]
+            else:
+                values = []
+            self.vocabularies[col] = {value: code for code, value in enumerate(values)}
+        return self
+
+    def hash_code(self, col, value):
+        return len(self.vocabularies[col]) + zlib.crc32(value.encode()) % self.hash_buckets
+
+    def encode(self, col, value):
+        """Code for a single value, in constant time."""
+        if value is None:
+            value = MISSING
+        code = self.vocabularies[col].get(value)
+        return code if code is not None else self.hash_code(col, value)
+
+    def transform(self, data):
+        """Encode the categorical columns of a DataFrame in place, vectorized per column."""
+        for col in self.columns:
+            if col not in data.columns:
+                print(f"Warning: Column '{col}' not found in the dataset.")
+                continue
+            values = data[col].fillna(MISSING).astype(str)
+            codes = values.map(self.vocabularies[col])
+            unseen = codes.isna()
+            if unseen.any():
+                # Hash each distinct unseen value once rather than once per row
+                unseen_values = values[unseen]
+                hashed = {value: self.hash_code(col, value) for value in unseen_values.unique()}
+                codes[unseen] = unseen_values.map(hashed)
+            data[col] = codes.astype('int64')
+        return data
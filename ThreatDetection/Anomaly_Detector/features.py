@@ -0,0 +1,68 @@
+import numpy as np
+
+from encoders import CATEGORICAL_COLUMNS
+from windows import WINDOW_COLUMNS
+
+# Numeric features the model is trained on, in the order preprocess_data produces them
+FEATURE_COLUMNS = ['Bytes Sent', 'Source Port', 'Destination Port', 'Response Time (seconds)',
+                   'Backend Time (seconds)', 'Hour', 'Day', 'Weekday']
+# The ones derived from the request timestamp
+TIME_COLUMNS = ['Hour', 'Day', 'Weekday']
+
+# How each feature column is read from a parsed (typed) log line
+FEATURE_EXTRACTORS = {
+    'Bytes Sent': lambda parsed: parsed['Bytes_Sent'],
+    'Source Port': lambda parsed: parsed['Source_Port'],
+    'Destination Port': lambda parsed: parsed['Destination_Port'],
+    'Response Time (seconds)': lambda parsed: parsed['Response_Time'] or 0.0,
+    'Backend Time (seconds)': lambda parsed: parsed['Backend_Time'] or 0.0,
+    'Hour': lambda parsed: parsed['Timestamp'].hour,
+    'Day': lambda parsed: parsed['Timestamp'].day,
+    'Weekday': lambda parsed: parsed['Timestamp'].weekday(),
+}
+
+# Per-IP window features are stored on the parsed line by IPWindows.observe
+for _column in WINDOW_COLUMNS:
+    FEATURE_EXTRACTORS[_column] = lambda parsed, column=_column: parsed[column]
+
+
+class FeatureBuffer:
+    """
+    Writes the numeric features of parsed log lines straight into a preallocated
+    NumPy buffer, in the column order the fitted scaler expects, and standardizes
+    them with the scaler's mean/scale as plain array math. Categorical columns, if
+    the scaler was fitted with any, are looked up in the persistent encoder, and
+    window features update the per-IP windows line by line, in log order.
+    """
+
+    def __init__(self, scaler, capacity=1, encoder=None, windows=None):
+        self.columns = list(getattr(scaler, 'feature_names_in_', FEATURE_COLUMNS))
+        self.extractors = [self.categorical_extractor(encoder, col) if col in CATEGORICAL_COLUMNS
+                           else FEATURE_EXTRACTORS[col] for col in self.columns]
+        self.windows = windows if any(col in WINDOW_COLUMNS for col in self.columns) else None
+        self.buffer = np.empty((max(capacity, 1), len(self.columns)))
+        self.mean = scaler.mean_ if scaler.mean_ is not None else 0.0
+        self.scale = scaler.scale_ if scaler.scale_ is not None else 1.0
+
+    @staticmethod
+    def categorical_extractor(encoder, col):
+        field = CATEGORICAL_COLUMNS[col]
+        return lambda parsed: encoder.encode(col, parsed[field])
+
+    def transform(self, parsed_entries):
+        """Return the scaled feature rows for `parsed_entries` as a view into the buffer."""
+        n = len(parsed_entries)
+        if n > len(self.buffer):
+            self.buffer = np.empty((n, len(self.columns)))
+
+        rows = self.buffer[:n]
+        extractors = self.extractors
+        observe = self.windows.observe if self.windows is not None else None
+        for i, parsed in enumerate(parsed_entries):
+            if observe is not None:
+                observe(parsed)
+            rows[i] = [extract(parsed) for extract in extractors]
+
+        rows -= self.mean
+        rows /= self.scale
+        return rows
@@ -0,0 +1,159 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+# Rows scored per pass; keeps the (rows x trees) index arrays cache-sized
+SCORE_CHUNK_SIZE = 1024
+
+
+# Average path length of an unsuccessful BST search in a tree grown from n samples,
+# the normalization IsolationForest uses (equal to sklearn's _average_path_length)
+def average_path_length(n_samples):
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    lengths = np.zeros_like(n_samples)
+    lengths[n_samples == 2] = 1.0
+    large = n_samples > 2
+    lengths[large] = (2.0 * (np.log(n_samples[large] - 1.0) + np.euler_gamma)
+                      - 2.0 * (n_samples[large] - 1.0) / n_samples[large])
+    return lengths
+
+
+# Largest float32 not above each float64 threshold: for float32 inputs x, x > t exactly
+# when x > float32_floor(t), so comparisons can stay in float32 without changing results
+def float32_floor(values):
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+class CompiledForest:
+    """
+    A fitted IsolationForest flattened into contiguous NumPy arrays. Each tree is
+    laid out as a complete binary tree of the forest's maximum depth, so a node's
+    children are at 2i+1 and 2i+2 and need no lookup; leaves above the bottom level
+    are padded down to it. `features` and `thresholds` hold the split of every
+    node, `path_lengths` the path length of every bottom-level slot (leaf depth
+    plus the average path length of the samples in the leaf). Scoring walks all
+    trees for a whole batch at once, one array step per level, and returns the
+    same decision_function and predict results as the model.
+    """
+
+    ARRAYS = ('features', 'thresholds', 'path_lengths')
+
+    def __init__(self, features, thresholds, path_lengths, max_depth, normalizer, offset):
+        self.features = features
+        self.thresholds = thresholds
+        self.path_lengths = path_lengths
+        self.max_depth = int(max_depth)
+        self.normalizer = float(normalizer)
+        self.offset = float(offset)
+        tree_count, width = features.shape
+        self.tree_offsets = np.arange(tree_count, dtype=np.int32) * width
+        self.leaf_offsets = np.arange(tree_count, dtype=np.int32) * path_lengths.shape[1] - (width >> 1)
+
+    @classmethod
+    def from_model(cls, model):
+        """Flatten a fitted sklearn IsolationForest."""
+        max_samples = getattr(model, '_max_samples', None) or model.max_samples_
+        subsample_features = model._max_features != model.n_features_in_
+        max_depth = max(estimator.tree_.max_depth for estimator in model.estimators_)
+        leaf_count = 1 << max_depth
+        tree_count = len(model.estimators_)
+
+        # Nodes below a padded leaf never branch (threshold inf), they all lead to its slots
+        features = np.zeros((tree_count, 2 * leaf_count - 1), dtype=np.int32)
+        thresholds = np.full((tree_count, 2 * leaf_count - 1), np.inf)
+        path_lengths = np.zeros((tree_count, leaf_count))
+        for t, (estimator, estimator_features) in enumerate(zip(model.estimators_, model.estimators_features_)):
+            tree = estimator.tree_
+            stack = [(0, 0, 0)]  # (sklearn node, complete-tree index, depth)
+            while stack:
+                node, index, depth = stack.pop()
+                left, right = tree.children_left[node], tree.children_right[node]
+                if left == -1:
+                    span = 1 << (max_depth - depth)
+                    first = (index + 1) * span - leaf_count
+                    path_lengths[t, first:first + span] = depth + average_path_length(tree.n_node_samples[node])
+                    continue
+                feature = tree.feature[node]
+                features[t, index] = estimator_features[feature] if subsample_features else feature
+                thresholds[t, index] = tree.threshold[node]
+                stack.append((left, 2 * index + 1, depth + 1))
+                stack.append((right, 2 * index + 2, depth + 1))
+
+        return cls(
+            features=features,
+            thresholds=float32_floor(thresholds),
+            path_lengths=path_lengths,
+            max_depth=max_depth,
+            normalizer=len(model.estimators_) * average_path_length([max_samples])[0],
+            offset=model.offset_,
+        )
+
+    def path_length_sums(self, X):
+        """Sum over trees of each row's path length."""
+        # Trees compare float32 features, as sklearn's tree code does
+        X = np.asarray(X, dtype=np.float32)
+        rows, columns = X.shape
+        features = self.features.ravel()
+        thresholds = self.thresholds.ravel()
+        path_lengths = self.path_lengths.ravel()
+        sums = np.empty(rows)
+        for start in range(0, rows, SCORE_CHUNK_SIZE):
+            chunk = X[start:start + SCORE_CHUNK_SIZE]
+            values = chunk.ravel()
+            row_offsets = (np.arange(len(chunk), dtype=np.int32) * columns)[:, None]
+            nodes = np.zeros((len(chunk), len(self.tree_offsets)), dtype=np.int32)
+            for _ in range(self.max_depth):
+                index = nodes + self.tree_offsets
+                go_right = np.take(values, row_offsets + np.take(features, index)) > np.take(thresholds, index)
+                nodes *= 2
+                nodes += 1
+                nodes += go_right
+            sums[start:start + len(chunk)] = np.take(path_lengths, nodes + self.leaf_offsets).sum(axis=1)
+        return sums
+
+    def score_samples(self, X):
+        if self.normalizer == 0:
+            return -np.ones(len(X))
+        return -(2 ** (-self.path_length_sums(X) / self.normalizer))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def save(self, directory):
+        """Write each array as a .npy file and the scalars as forest.json into `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(directory, 'forest.json'), 'w') as f:
+            json.dump({'max_depth': self.max_depth, 'normalizer': self.normalizer, 'offset': self.offset}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load a saved forest. With the default mmap_mode the arrays are memory-mapped
+        read-only: loading costs no copying, and every process scoring with the same
+        files shares one copy in the page cache.
+        """
+        with open(os.path.join(directory, 'forest.json')) as f:
+            scalars = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        return cls(**arrays, **scalars)
+
+
+# Export step: python forest.py iso_forest_model.pkl iso_forest_model.forest/
+if __name__ == "__main__":
+    import joblib
+
+    if len(sys.argv) != 3:
+        sys.exit("usage: forest.py MODEL_PKL OUTPUT_DIRECTORY")
+    compiled = CompiledForest.from_model(joblib.load(sys.argv[1]))
+    compiled.save(sys.argv[2])
+    print(f"Exported {compiled.features.shape[0]} trees of depth {compiled.max_depth} to {sys.argv[2]}.")
@@ -0,0 +1,99 @@
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+
+class Incident:
+    """Anomalies from one IP (and resource) within one aggregation window."""
+
+    __slots__ = ('ip_address', 'resource', 'opened', 'count', 'first_seen', 'last_seen',
+                 'min_score', 'max_score', 'examples')
+
+    def __init__(self, ip_address, resource, opened):
+        self.ip_address = ip_address
+        self.resource = resource
+        self.opened = opened
+        self.count = 0
+        self.first_seen = self.last_seen = None
+        self.min_score = self.max_score = None
+        self.examples = []
+
+    def to_record(self):
+        """The anomaly log entry for this incident; anomaly_data is the first example."""
+        record = {
+            "id": uuid.uuid4().hex,
+            "ip_address": self.ip_address,
+            "timestamp": datetime.now().isoformat(),
+            "anomaly_data": self.examples[0],
+            "reviewed": False,
+            "feedback": None,
+            "count": self.count,
+            "first_seen": self.first_seen.isoformat() if self.first_seen else None,
+            "last_seen": self.last_seen.isoformat() if self.last_seen else None,
+            "min_score": self.min_score,
+            "max_score": self.max_score,
+            "examples": self.examples,
+        }
+        if self.resource is not None:
+            record["resource"] = self.resource
+        return record
+
+
+class IncidentAggregator:
+    """
+    Collapses the anomalies of one IP, or of one IP and resource when
+    `by_resource` is set, into a single incident per `window` seconds. An
+    incident keeps the anomaly count, first/last seen log times, the range of
+    decision scores and the first `max_examples` feature records, and is closed
+    `window` seconds after it opened. At most `max_open` incidents are held; the
+    oldest is closed early to make room. Windows run on the monotonic clock unless
+    add() and expired() are given `now`, e.g. log times when replaying old logs.
+    """
+
+    def __init__(self, window=60.0, by_resource=False, max_examples=3, max_open=100000):
+        self.window = window
+        self.by_resource = by_resource
+        self.max_examples = max_examples
+        self.max_open = max_open
+        self.open = OrderedDict()  # Oldest incident first
+        self.closed = []
+
+    def add(self, ip_address, anomaly_data, score, seen_at, now=None):
+        resource = anomaly_data.get('Resource') if self.by_resource else None
+        key = (ip_address, resource)
+        incident = self.open.get(key)
+        if incident is None:
+            if len(self.open) >= self.max_open:
+                self.closed.append(self.open.popitem(last=False)[1])
+            incident = self.open[key] = Incident(ip_address, resource, time.monotonic() if now is None else now)
+            incident.first_seen = seen_at
+
+        incident.count += 1
+        incident.last_seen = seen_at
+        if incident.min_score is None or score < incident.min_score:
+            incident.min_score = score
+        if incident.max_score is None or score > incident.max_score:
+            incident.max_score = score
+        if len(incident.examples) < self.max_examples:
+            incident.examples.append(anomaly_data)
+        return incident
+
+    def expired(self, now=None):
+        """Remove and return the incidents whose window has passed."""
+        now = time.monotonic() if now is None else now
+        closed, self.closed = self.closed, []
+        cutoff = now - self.window
+        while self.open:
+            incident = next(iter(self.open.values()))
+            if incident.opened > cutoff:
+                break
+            closed.append(self.open.popitem(last=False)[1])
+        return closed
+
+    def drain(self):
+        """Remove and return every incident, open or closed."""
+        closed = self.closed + list(self.open.values())
+        self.closed = []
+        self.open.clear()
+        return closed
@@ -0,0 +1,207 @@
+import random
+import re
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+# The custom_sanitized format from nginx/nginx.conf, used when the config cannot be read
+DEFAULT_LOG_FORMAT = (
+    '$remote_addr - [$time_local] '
+    '"$request" $status $body_bytes_sent '
+    '"$http_referer" "$http_user_agent" '
+    '$server_port $remote_port $query_string '
+    '"$host" "$upstream_addr" "$upstream_status" "$upstream_response_time" '
+    '$request_time'
+)
+
+TIMESTAMP_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+
+# Parsed [time_local] values; under load thousands of lines share the same second
+TIMESTAMP_CACHE_SIZE = 4096
+_timestamp_cache = {}
+
+
+# Decode a [time_local] value, reusing the result for repeated seconds
+def parse_timestamp(value):
+    timestamp = _timestamp_cache.get(value)
+    if timestamp is None:
+        timestamp = datetime.strptime(value, TIMESTAMP_FORMAT)
+        if len(_timestamp_cache) >= TIMESTAMP_CACHE_SIZE:
+            _timestamp_cache.clear()
+        _timestamp_cache[value] = timestamp
+    return timestamp
+
+
+# Decode an nginx timing value. Upstream times list one value per attempted upstream
+# ("0.004, 0.120" or "0.004 : 0.120"); those are summed. "-" means no upstream was used.
+def parse_seconds(value):
+    try:
+        return float(value)
+    except ValueError:
+        times = [float(part) for part in re.split(r'[,:]', value) if part.strip() not in ('', '-')]
+        return sum(times) if times else None
+
+
+# How each nginx variable is captured and typed. `fields` are the names the detector
+# uses; a pattern of None means "[^"]*" inside quotes and "\S+" otherwise.
+LogVariable = namedtuple('LogVariable', ['fields', 'pattern', 'converter'])
+
+LOG_VARIABLES = {
+    'remote_addr': LogVariable(('IP_Address',), r'\S+', None),
+    'time_local': LogVariable(('Timestamp',), r'[^\]]+', 'parse_timestamp'),
+    'request': LogVariable(('Method', 'Resource', 'Protocol'), r'(\S+) (\S+) ([^"]+)', None),
+    'status': LogVariable(('Status_Code',), r'\d+', 'int'),
+    'body_bytes_sent': LogVariable(('Bytes_Sent',), r'\d+', 'int'),
+    'http_referer': LogVariable(('Referrer',), None, None),
+    'http_user_agent': LogVariable(('User_Agent',), None, None),
+    'server_port': LogVariable(('Source_Port',), r'\d+', 'int'),
+    'remote_port': LogVariable(('Destination_Port',), r'\d+', 'int'),
+    'host': LogVariable(('Origin_Server',), None, None),
+    'upstream_addr': LogVariable(('Destination',), None, None),
+    'upstream_status': LogVariable(('Response_Code',), None, None),
+    'upstream_response_time': LogVariable(('Response_Time',), None, 'parse_seconds'),
+    'request_time': LogVariable(('Backend_Time',), r'[\d.]+', 'parse_seconds'),
+}
+
+_CONVERTERS = {'int': int, 'parse_timestamp': parse_timestamp, 'parse_seconds': parse_seconds}
+_FIELD_TYPES = {'int': int, 'parse_timestamp': datetime, 'parse_seconds': float}
+
+_variable_pattern = re.compile(r'\$(?:\{(\w+)\}|(\w+))')
+
+
+# Read the format string of `log_format <name> ...;` from an nginx config file
+def read_log_format(conf_path, name):
+    config = Path(conf_path).read_text()
+    directive = re.search(r'\blog_format\s+' + re.escape(name) + r'(?:\s+escape=\w+)?\s+(.*?);', config, re.S)
+    if not directive:
+        raise ValueError(f"log_format '{name}' not found in {conf_path}")
+    strings = re.findall(r"'([^']*)'|\"([^\"]*)\"", directive.group(1))
+    return ''.join(single or double for single, double in strings)
+
+
+# Split a log_format string into ('literal', text) and ('variable', name) tokens
+def tokenize_log_format(log_format):
+    tokens = []
+    position = 0
+    for match in _variable_pattern.finditer(log_format):
+        if match.start() > position:
+            tokens.append(('literal', log_format[position:match.start()]))
+        tokens.append(('variable', match.group(1) or match.group(2)))
+        position = match.end()
+    if position < len(log_format):
+        tokens.append(('literal', log_format[position:]))
+    return tokens
+
+
+class LogParser:
+    """
+    Parser generated from an nginx log_format definition. The format is compiled
+    into one regex and a specialized parse function that converts each field to
+    its type (ints, seconds, cached timestamps) in a single dict literal. Lines
+    that do not match, or whose fields do not convert, parse to None.
+    """
+
+    def __init__(self, log_format):
+        self.log_format = log_format
+        self.fields = []
+        regex_parts = []
+        values = []
+
+        tokens = tokenize_log_format(log_format)
+        for i, (kind, value) in enumerate(tokens):
+            if kind == 'literal':
+                regex_parts.append(re.escape(value))
+                continue
+            if i > 0 and tokens[i - 1][0] == 'variable':
+                raise ValueError(f"Cannot split adjacent variables ${tokens[i - 1][1]} and ${value}")
+
+            before = tokens[i - 1][1] if i > 0 else ''
+            after = tokens[i + 1][1] if i + 1 < len(tokens) else ''
+            quoted = before.endswith('"') and after.startswith('"')
+            variable = LOG_VARIABLES.get(value, LogVariable((value.title(),), None, None))
+            pattern = variable.pattern or (r'[^"]*' if quoted else r'\S+')
+            if len(variable.fields) == 1:
+                pattern = f'({pattern})'
+            regex_parts.append(pattern)
+
+            for field in variable.fields:
+                group = f'g[{len(self.fields)}]'
+                values.append(f"{field!r}: {variable.converter}({group})" if variable.converter
+                              else f"{field!r}: {group}")
+                self.fields.append((field, _FIELD_TYPES.get(variable.converter, str)))
+
+        self.pattern = re.compile(''.join(regex_parts))
+        self.source = (
+            "def parse(line):\n"
+            "    match = pattern_match(line)\n"
+            "    if match is None:\n"
+            "        return None\n"
+            "    g = match.groups()\n"
+            "    try:\n"
+            f"        return {{{', '.join(values)}}}\n"
+            "    except ValueError:\n"
+            "        return None\n"
+        )
+        namespace = dict(_CONVERTERS, pattern_match=self.pattern.match)
+        exec(compile(self.source, '<log_format>', 'exec'), namespace)
+        self.parse = namespace['parse']
+
+    @classmethod
+    def from_nginx_conf(cls, conf_path, name):
+        return cls(read_log_format(conf_path, name))
+
+    @property
+    def field_names(self):
+        return [name for name, _ in self.fields]
+
+
+# Build the parser for the configured log format, falling back to the built-in default
+def load_log_parser(conf_path, name):
+    try:
+        parser = LogParser.from_nginx_conf(conf_path, name)
+        print(f"Loaded log_format '{name}' from {conf_path}.")
+    except (OSError, ValueError) as e:
+        print(f"Using built-in log format ({e}).")
+        parser = LogParser(DEFAULT_LOG_FORMAT)
+    return parser
+
+
+class ParseFailures:
+    """
+    Counts lines that fail to parse and keeps a small random sample of them,
+    reported every `interval` seconds instead of printing each line.
+    """
+
+    def __init__(self, interval=60.0, sample_size=5):
+        self.interval = interval
+        self.sample_size = sample_size
+        self.total = 0
+        self.reset(time.monotonic())
+
+    def reset(self, now):
+        self.window_start = now
+        self.count = 0
+        self.samples = []
+
+    def record(self, line):
+        self.total += 1
+        self.count += 1
+        # Reservoir sampling keeps every failed line in the window equally likely to be shown
+        if len(self.samples) < self.sample_size:
+            self.samples.append(line)
+        else:
+            slot = random.randrange(self.count)
+            if slot < self.sample_size:
+                self.samples[slot] = line
+
+        now = time.monotonic()
+        if now - self.window_start >= self.interval:
+            self.report(now)
+            self.reset(now)
+
+    def report(self, now):
+        print(f"Failed to parse {self.count} log lines in the last {now - self.window_start:.0f}s "
+              f"({self.total} total). Samples:")
+        for line in self.samples:
+            print(f"  {line.rstrip()}")
@@ -0,0 +1,99 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# prometheus_client keeps metric values in per-process files instead of memory when
+# PROMETHEUS_MULTIPROC_DIR is set as it is imported. The scoring workers are forked, so
+# the detector always runs that way: a configured directory must belong to the detector
+# and is cleared at startup; without one, a private directory is used for the run.
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    for name in os.listdir(os.environ['PROMETHEUS_MULTIPROC_DIR']):
+        if name.endswith('.db'):
+            os.remove(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], name))
+else:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='anomaly_detector_metrics_')
+    atexit.register(shutil.rmtree, os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server  # noqa: E402
+from prometheus_client.core import GaugeMetricFamily  # noqa: E402
+from prometheus_client.multiprocess import MultiProcessCollector  # noqa: E402
+
+# Seconds; spans a parsed line (microseconds) up to a slow batch or model load
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class FunctionGauge:
+    """
+    A gauge read from `function` at scrape time, one function per label values;
+    None leaves the sample out. prometheus_client's set_function does not work
+    across processes, so these are collected from the main process directly.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.functions = {}
+
+    def labels(self, *values):
+        return FunctionGaugeChild(self, values)
+
+    def set_function(self, function):
+        self.functions[()] = function
+
+    def collect(self):
+        family = GaugeMetricFamily(self.name, self.documentation, labels=self.labelnames)
+        for values, function in list(self.functions.items()):
+            try:
+                value = function()
+            except Exception as e:
+                print(f"Error reading metric {self.name}: {e}")
+                continue
+            if value is not None:
+                family.add_metric(values, value)
+        yield family
+
+
+class FunctionGaugeChild:
+    def __init__(self, gauge, values):
+        self.gauge = gauge
+        self.values = values
+
+    def set_function(self, function):
+        self.gauge.functions[self.values] = function
+
+
+class Registry:
+    """
+    The detector's metrics, as prometheus_client metrics in multiprocess mode:
+    each process, the main one and every forked scoring worker, writes its own
+    file, and `registry` aggregates them at scrape time. Gauges report the value
+    set most recently in any process.
+    """
+
+    def __init__(self):
+        self.registry = CollectorRegistry()
+        MultiProcessCollector(self.registry)
+
+    # Metrics are left out of prometheus_client's default registry: they are read
+    # back from the files, and the module may be imported more than once in tests
+    def counter(self, name, documentation, labelnames=()):
+        return Counter(name, documentation, labelnames, registry=None)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return Gauge(name, documentation, labelnames, registry=None, multiprocess_mode='mostrecent')
+
+    def function_gauge(self, name, documentation, labelnames=()):
+        gauge = FunctionGauge(name, documentation, labelnames)
+        self.registry.register(gauge)
+        return gauge
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return Histogram(name, documentation, labelnames, registry=None, buckets=buckets)
+
+    def serve(self, port, address='0.0.0.0'):
+        """Serve /metrics from a daemon thread."""
+        server, _ = start_http_server(port, address, registry=self.registry)
+        print(f"Serving metrics on {address}:{port}/metrics.")
+        return server
@@ -0,0 +1,159 @@
+import ipaddress
+from bisect import bisect_left, bisect_right, insort
+
+# Node layout: [address count, child for bit 0, child for bit 1]
+_COUNT = 0
+
+
+class PrefixTree:
+    """
+    Blocked addresses kept as a binary prefix tree (one per address family), with
+    the address count of every prefix. The tree maintains the minimal set of CIDR
+    rules covering the blocked addresses: a prefix becomes one rule when all its
+    addresses are blocked, or, at `min_prefix` bits or longer, when more than one
+    and at least `density` of them are. Only the topmost such prefix is emitted;
+    everything else stays a single-address rule. add() and remove() update the
+    rules incrementally and return the rules added and removed.
+    """
+
+    def __init__(self, density=0.5, min_prefix=24, min_prefix_v6=64):
+        self.density = density
+        self.min_prefix = {4: min_prefix, 6: min_prefix_v6}
+        self.bits = {4: 32, 6: 128}
+        self.roots = {4: [0, None, None], 6: [0, None, None]}
+        # Rules per family: sorted network starts and start -> prefix length
+        self.rule_starts = {4: [], 6: []}
+        self.rule_prefixes = {4: {}, 6: {}}
+
+    def __len__(self):
+        return self.roots[4][_COUNT] + self.roots[6][_COUNT]
+
+    def qualifies(self, version, count, depth):
+        size = 1 << (self.bits[version] - depth)
+        return count == size or (depth >= self.min_prefix[version] and count > 1 and count >= self.density * size)
+
+    # The tree nodes from the root down to `value`, as far as they exist
+    def path(self, version, value):
+        bits = self.bits[version]
+        nodes = [self.roots[version]]
+        for depth in range(bits):
+            child = nodes[-1][1 + ((value >> (bits - 1 - depth)) & 1)]
+            if child is None:
+                break
+            nodes.append(child)
+        return nodes
+
+    def add(self, ip_address):
+        version, value = parse_address(ip_address)
+        bits = self.bits[version]
+        if len(self.path(version, value)) == bits + 1:
+            return [], []
+
+        node = self.roots[version]
+        node[_COUNT] += 1
+        nodes = [node]
+        for depth in range(bits):
+            slot = 1 + ((value >> (bits - 1 - depth)) & 1)
+            if node[slot] is None:
+                node[slot] = [0, None, None]
+            node = node[slot]
+            node[_COUNT] += 1
+            nodes.append(node)
+
+        # Counts only grew, so the topmost qualifying prefix covers every rule it overlaps
+        for depth, node in enumerate(nodes):
+            if self.qualifies(version, node[_COUNT], depth):
+                start = value >> (bits - depth) << (bits - depth)
+                if self.rule_prefixes[version].get(start) == depth:
+                    return [], []
+                removed = self.remove_rules(version, start, start + (1 << (bits - depth)) - 1)
+                self.add_rule(version, start, depth)
+                return [format_rule(version, start, depth)], removed
+
+    def remove(self, ip_address):
+        version, value = parse_address(ip_address)
+        bits = self.bits[version]
+        nodes = self.path(version, value)
+        if len(nodes) != bits + 1:
+            return [], []
+
+        for node in nodes:
+            node[_COUNT] -= 1
+        for depth in range(1, bits + 1):
+            if nodes[depth][_COUNT] == 0:
+                # Prune the emptied branch
+                nodes[depth - 1][1 + ((value >> (bits - depth)) & 1)] = None
+                break
+
+        start, depth = self.covering_rule(version, value)
+        node = nodes[depth]
+        if node[_COUNT] and self.qualifies(version, node[_COUNT], depth):
+            return [], []
+        removed = self.remove_rules(version, start, start)
+        added = []
+        if node[_COUNT]:
+            # The prefix fell below the threshold: re-aggregate the addresses under it
+            for child_start, child_depth in self.topmost_rules(version, node, start, depth):
+                self.add_rule(version, child_start, child_depth)
+                added.append(format_rule(version, child_start, child_depth))
+        return added, removed
+
+    def topmost_rules(self, version, node, start, depth):
+        bits = self.bits[version]
+        for bit in (0, 1):
+            child = node[1 + bit]
+            if child is None:
+                continue
+            child_start = start | (bit << (bits - depth - 1))
+            if self.qualifies(version, child[_COUNT], depth + 1):
+                yield child_start, depth + 1
+            else:
+                yield from self.topmost_rules(version, child, child_start, depth + 1)
+
+    def covering_rule(self, version, value):
+        starts = self.rule_starts[version]
+        start = starts[bisect_right(starts, value) - 1]
+        return start, self.rule_prefixes[version][start]
+
+    def rule_for(self, ip_address):
+        """The rule covering a blocked address."""
+        version, value = parse_address(ip_address)
+        return format_rule(version, *self.covering_rule(version, value))
+
+    def add_rule(self, version, start, depth):
+        insort(self.rule_starts[version], start)
+        self.rule_prefixes[version][start] = depth
+
+    # Remove the rules starting within [first, last]
+    def remove_rules(self, version, first, last):
+        starts = self.rule_starts[version]
+        i, j = bisect_left(starts, first), bisect_right(starts, last)
+        removed = [format_rule(version, start, self.rule_prefixes[version].pop(start)) for start in starts[i:j]]
+        del starts[i:j]
+        return removed
+
+    def rules(self):
+        return [format_rule(version, start, self.rule_prefixes[version][start])
+                for version in (4, 6) for start in self.rule_starts[version]]
+
+    def metrics(self):
+        """Rule counts and per-packet lookup cost: one comparison per rule for a linear
+        iptables chain, one hash probe per distinct prefix length for an ipset hash:net."""
+        rule_count = len(self.rule_starts[4]) + len(self.rule_starts[6])
+        prefix_lengths = {(version, depth) for version in (4, 6) for depth in self.rule_prefixes[version].values()}
+        return {
+            'addresses': len(self),
+            'rules': rule_count,
+            'linear_lookup_cost': rule_count,
+            'set_lookup_cost': len(prefix_lengths),
+        }
+
+
+def parse_address(ip_address):
+    address = ipaddress.ip_address(ip_address)
+    return address.version, int(address)
+
+
+def format_rule(version, start, depth):
+    network = ipaddress.IPv4Network((start, depth)) if version == 4 else ipaddress.IPv6Network((start, depth))
+    return str(network)
@@ -0,0 +1,135 @@
+import json
+import os
+import re
+import shutil
+import sys
+import time
+
+from artifacts import save_model_artifact
+
+VERSION_PATTERN = re.compile(r'v(\d+)$')
+
+
+class ModelRegistry:
+    """
+    A directory of versioned model bundles, v0001/, v0002/, ..., each a complete
+    artifact (see artifacts.py) with its training metadata. The file CURRENT names
+    the active version; it is replaced atomically, so switching or rolling back
+    is one rename and detectors never see a half-written model. Assumes a single
+    writer publishes versions.
+    """
+
+    def __init__(self, directory, versions_kept=5):
+        self.directory = directory
+        self.versions_kept = versions_kept
+        self.pointer_path = os.path.join(directory, 'CURRENT')
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, version):
+        return os.path.join(self.directory, f"v{version:04d}")
+
+    def versions(self):
+        matches = (VERSION_PATTERN.match(name) for name in os.listdir(self.directory))
+        return sorted(int(match.group(1)) for match in matches
+                      if match and os.path.isdir(os.path.join(self.directory, match.group(0))))
+
+    def next_version(self):
+        versions = self.versions()
+        return versions[-1] + 1 if versions else 1
+
+    def current(self):
+        """The active version, or None before one is activated."""
+        try:
+            with open(self.pointer_path) as f:
+                match = VERSION_PATTERN.match(f.read().strip())
+        except FileNotFoundError:
+            return None
+        return int(match.group(1)) if match else None
+
+    def metadata(self, version):
+        with open(os.path.join(self.path(version), 'model.json')) as f:
+            metadata = json.load(f)
+        metadata.pop('encoder', None)
+        return metadata
+
+    def save(self, version, forest, scaler, encoder, **metadata):
+        """Write a version without activating it, and prune old inactive versions."""
+        path = save_model_artifact(self.path(version), forest, scaler, encoder, version=version, **metadata)
+        current = self.current()
+        for old_version in self.versions()[:-self.versions_kept]:
+            if old_version != current:
+                shutil.rmtree(self.path(old_version))
+        return path
+
+    def activate(self, version):
+        if not os.path.isdir(self.path(version)):
+            raise ValueError(f"Model version {version} is not in {self.directory}")
+        tmp_path = f"{self.pointer_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(f"v{version:04d}\n")
+        os.replace(tmp_path, self.pointer_path)
+
+    def rollback(self):
+        """Activate the newest version older than the current one."""
+        current = self.current()
+        older = [version for version in self.versions() if current is None or version < current]
+        if not older:
+            raise ValueError("No older model version to roll back to")
+        self.activate(older[-1])
+        return older[-1]
+
+
+class ModelWatcher:
+    """
+    Watches a registry's CURRENT pointer, checking at most every `interval`
+    seconds. poll() returns the path of the active version when it differs from
+    the one loaded, so a running detector picks up new or rolled-back versions.
+    """
+
+    def __init__(self, registry, interval=5.0):
+        self.registry = registry
+        self.interval = interval
+        self.loaded = None
+        self.pointer_stat = None
+        self.next_check = 0.0
+
+    def poll(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return None
+        self.next_check = now + self.interval
+        try:
+            stat = os.stat(self.registry.pointer_path)
+        except FileNotFoundError:
+            return None
+        # The pointer is replaced, never rewritten, so a new inode or mtime means a switch
+        pointer_stat = (stat.st_ino, stat.st_mtime_ns)
+        if pointer_stat == self.pointer_stat:
+            return None
+        self.pointer_stat = pointer_stat
+        version = self.registry.current()
+        if version is None or version == self.loaded:
+            return None
+        if not os.path.isdir(self.registry.path(version)):
+            print(f"Model version {version} is active but missing from {self.registry.directory}.")
+            return None
+        self.loaded = version
+        return self.registry.path(version)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[2] not in ('list', 'activate', 'rollback') or \
+            (sys.argv[2] == 'activate') != (len(sys.argv) == 4):
+        sys.exit("usage: registry.py REGISTRY_DIRECTORY list | activate VERSION | rollback")
+    registry = ModelRegistry(sys.argv[1])
+    if sys.argv[2] == 'activate':
+        registry.activate(int(sys.argv[3]))
+    elif sys.argv[2] == 'rollback':
+        registry.rollback()
+    current = registry.current()
+    for version in registry.versions():
+        metadata = registry.metadata(version)
+        seconds = metadata.get('training_seconds')
+        print(f"{'*' if version == current else ' '} v{version:04d}  trained {metadata.get('trained_at')}  "
+              f"rows {metadata.get('rows') or '-'}  contamination {metadata.get('contamination')}  "
+              f"took {f'{seconds}s' if seconds is not None else '-'}  {len(metadata.get('columns', []))} features")
@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: appends are still single O_APPEND writes, compaction is unlocked
+    fcntl = None
+
+# FEEDBACK_VALUES, anomaly_id, parse_event and the lock file are mirrored in
+# DetectionApp/review_log.py, which the review page and anomaly_review.py append with: the
+# detector image ships only this directory, so the two cannot share a module. Change both
+# together; DetectionApp/tests.py checks that they agree.
+FEEDBACK_VALUES = ('true_positive', 'false_positive')
+
+
+def anomaly_id(record):
+    """The ID of an anomaly log entry; entries logged before IDs are identified by IP and log time."""
+    return record.get('id') or f"{record.get('ip_address')}/{record.get('timestamp')}"
+
+
+def parse_event(line):
+    """The event on one review log line, or None if it is not a valid event."""
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None  # A line still being written
+    if isinstance(event, dict) and event.get('feedback') in FEEDBACK_VALUES and event.get('anomaly_id'):
+        return event
+    return None
+
+
+class ReviewLog:
+    """
+    Review verdicts as append-only JSON lines next to the anomaly log:
+    {"anomaly_id": ..., "feedback": "true_positive" | "false_positive",
+    "reviewed_at": ...}. The latest event for an anomaly wins. Reviewers (the
+    Django review page, anomaly_review.py) append each verdict with one O_APPEND
+    write under a shared lock, so any number append at once and never rewrite
+    the anomaly log. compact() rewrites the log to one event per anomaly under
+    the exclusive lock and renames it into place.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+
+    @contextmanager
+    def locked(self, exclusive):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read_events(self):
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return 0, {}
+        latest = {}
+        for event in map(parse_event, lines):
+            if event is not None:
+                latest[event['anomaly_id']] = event
+        return len(lines), latest
+
+    def read(self):
+        """The latest verdict per anomaly ID."""
+        return {anomaly: event['feedback'] for anomaly, event in self.read_events()[1].items()}
+
+    def compact(self):
+        """Keep only the latest event per anomaly; returns the events dropped."""
+        with self.locked(exclusive=True):
+            count, latest = self.read_events()
+            if count <= len(latest):
+                return 0
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.writelines(json.dumps(event) + '\n' for event in latest.values())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        return count - len(latest)
+
+
+class ReviewCompactor:
+    """Compacts a review log every `interval` seconds from a daemon thread."""
+
+    def __init__(self, review_log, interval=600.0):
+        self.review_log = review_log
+        self.interval = interval
+        self.thread = threading.Thread(target=self.run, name='review-compactor', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                dropped = self.review_log.compact()
+            except OSError as e:
+                print(f"Error compacting review log {self.review_log.path}: {e}")
+                continue
+            if dropped:
+                print(f"Compacted review log {self.review_log.path}: {dropped} superseded events dropped.")
@@ -0,0 +1,209 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import time
+
+# inotify event masks (see inotify(7)) for the directory holding the log
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+
+class Inotify:
+    """
+    Minimal ctypes binding to Linux inotify watching one directory. Raises OSError
+    where inotify is unavailable so callers can fall back to polling.
+    """
+
+    def __init__(self, directory):
+        libc_path = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(libc_path, use_errno=True) if libc_path else None
+        if libc is None or not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available on this platform")
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout):
+        """Block until something changes in the directory or `timeout` seconds pass."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            # Drain the queued events; the tailer re-checks the file itself
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+        return bool(ready)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LogTailer:
+    """
+    Follows an append-only log file in large buffered chunks, waking on inotify
+    events (or polling where inotify is unavailable). Rotation is detected when the
+    path's inode changes and truncation when the file shrinks below the read offset.
+    The byte offset and inode of the last committed line are checkpointed so that a
+    restart resumes exactly where it stopped, including from the rotated file.
+    """
+
+    def __init__(self, path, checkpoint_path=None, chunk_size=1 << 20, poll_interval=0.25,
+                 checkpoint_interval=5.0):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.file = None
+        self.inode = None
+        self.offset = 0  # File position where the unconsumed partial line starts
+        self.partial = b''
+        self.committed = None
+        self.last_checkpoint = 0.0
+        try:
+            self.inotify = Inotify(os.path.dirname(os.path.abspath(path)))
+        except OSError as e:
+            print(f"Falling back to polling {path} ({e}).")
+            self.inotify = None
+
+    def open(self):
+        """Resume from the checkpoint if it still applies, otherwise start at the end of the log."""
+        checkpoint = self.load_checkpoint()
+        stat = os.stat(self.path)
+        if checkpoint is None:
+            self.open_file(self.path, stat.st_size)
+        elif checkpoint['inode'] == stat.st_ino and checkpoint['offset'] <= stat.st_size:
+            self.open_file(self.path, checkpoint['offset'])
+        else:
+            rotated = self.find_rotated(checkpoint['inode'])
+            if rotated:
+                # Finish the rotated file first; rotation handling then moves on to the new one
+                print(f"Resuming rotated log {rotated} at offset {checkpoint['offset']}.")
+                self.open_file(rotated, checkpoint['offset'])
+            else:
+                print(f"Checkpointed log is gone; reading {self.path} from the start.")
+                self.open_file(self.path, 0)
+        self.commit(force=True)
+        return self
+
+    def open_file(self, path, offset):
+        if self.file is not None:
+            self.file.close()
+        self.file = open(path, 'rb', buffering=0)
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.file.seek(offset)
+        self.offset = offset
+        self.partial = b''
+
+    # Locate a rotated copy of the log (access.log.1, ...) by its inode
+    def find_rotated(self, inode):
+        directory, name = os.path.split(os.path.abspath(self.path))
+        for entry in os.scandir(directory):
+            if entry.name.startswith(name) and entry.name != name and not entry.name.endswith('.gz'):
+                if entry.inode() == inode:
+                    return entry.path
+        return None
+
+    def read_lines(self):
+        """Return the complete lines appended since the last call, without their newlines."""
+        while True:
+            data = self.file.read(self.chunk_size)
+            if not data:
+                self.check_rotation()
+                return []
+
+            buffer = self.partial + data if self.partial else data
+            end = buffer.rfind(b'\n')
+            if end < 0:
+                self.partial = buffer
+                continue
+            self.partial = buffer[end + 1:]
+            self.offset += end + 1
+            return buffer[:end].decode('utf-8', 'replace').split('\n')
+
+    def check_rotation(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return  # Rotated away and not recreated yet; keep draining the old file
+        if stat.st_ino != self.inode:
+            if os.fstat(self.file.fileno()).st_size > self.offset + len(self.partial):
+                return  # The old file still has lines written before the writer reopened
+            if self.partial:
+                print(f"Dropping {len(self.partial)} bytes of unterminated line at rotation.")
+            print(f"Log rotated; following new {self.path}.")
+            self.open_file(self.path, 0)
+        elif stat.st_size < self.offset + len(self.partial):
+            print(f"Log truncated; reading {self.path} from the start.")
+            self.file.seek(0)
+            self.offset = 0
+            self.partial = b''
+
+    def wait(self, timeout):
+        """Block until the log may have new data, or `timeout` seconds pass."""
+        if self.inotify is not None:
+            self.inotify.wait(timeout)
+        else:
+            time.sleep(min(timeout, self.poll_interval))
+
+    def position(self):
+        """The position just past the last line returned, for a later commit()."""
+        return {'path': self.path, 'inode': self.inode, 'offset': self.offset}
+
+    def lag_bytes(self):
+        """Bytes between the last committed line and the end of the log, including all of
+        the new file while a rotated one is still being drained."""
+        committed = self.committed or self.position()
+        try:
+            lag = os.fstat(self.file.fileno()).st_size - committed['offset']
+            stat = os.stat(self.path)
+        except (OSError, ValueError):
+            return None  # The file is being swapped; skip this scrape
+        return lag + (stat.st_size if stat.st_ino != self.inode else 0)
+
+    def commit(self, force=False, position=None):
+        """Mark lines up to `position` (default: every line returned so far) as processed,
+        checkpointing at most every interval."""
+        self.committed = position or self.position()
+        now = time.monotonic()
+        if force or now - self.last_checkpoint >= self.checkpoint_interval:
+            self.save_checkpoint()
+            self.last_checkpoint = now
+
+    def load_checkpoint(self):
+        if not self.checkpoint_path:
+            return None
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path or self.committed is None:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.committed, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self):
+        """Write the last committed position and release the file and inotify handles."""
+        self.save_checkpoint()
+        if self.file is not None:
+            self.file.close()
+        if self.inotify is not None:
+            self.inotify.close()
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from anomaly_sink import AnomalySink
+
+# Run from the Anomaly_Detector directory: python -m unittest discover tests
+
+
+class AnomalySinkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'anomaly_feedback.json')
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def read(self, path=None):
+        with open(path or self.path) as f:
+            return [json.loads(line)['n'] for line in f]
+
+    def test_queued_records_are_written_in_groups(self):
+        sink = AnomalySink(self.path, max_group=1000, fsync_policy='always')
+        # Queued before the thread starts, so it finds full groups waiting
+        for n in range(2500):
+            sink.write({'n': n})
+        with mock.patch('anomaly_sink.os.fsync') as fsync:
+            sink.start().close()
+        self.assertEqual(self.read(), list(range(2500)))
+        self.assertEqual((sink.records, sink.groups), (2500, 3))
+        # One fsync per group, and one on close
+        self.assertEqual(fsync.call_count, 4)
+
+    def test_a_partial_group_is_written_after_the_flush_interval(self):
+        sink = AnomalySink(self.path, max_group=1000, flush_interval=0.05, fsync_policy='never').start()
+        try:
+            sink.write({'n': 0})
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not (os.path.exists(self.path) and self.read()):
+                time.sleep(0.01)
+            self.assertEqual(self.read(), [0])
+        finally:
+            sink.close()
+
+    def test_rotates_by_size_keeping_backup_count_files(self):
+        sink = AnomalySink(self.path, max_group=1, max_bytes=200, backup_count=2, fsync_policy='never')
+        for n in range(100):
+            sink.write({'n': n})
+        sink.start().close()
+
+        self.assertFalse(os.path.exists(f"{self.path}.3"))
+        oldest, older, current = self.read(f"{self.path}.2"), self.read(f"{self.path}.1"), self.read()
+        for backup in (f"{self.path}.2", f"{self.path}.1"):
+            self.assertGreaterEqual(os.path.getsize(backup), 200)
+        # Oldest to newest, the kept files hold the most recent records without gaps
+        kept = oldest + older + current
+        self.assertEqual(kept, list(range(100 - len(kept), 100)))
+
+    def test_drops_records_when_the_queue_is_full(self):
+        sink = AnomalySink(self.path, queue_size=5, fsync_policy='never')
+        for n in range(8):
+            sink.write({'n': n})
+        self.assertEqual(sink.dropped, 3)
+        sink.start().close()
+        self.assertEqual(self.read(), [0, 1, 2, 3, 4])
+
+    def test_rejects_unknown_fsync_policies(self):
+        with self.assertRaises(ValueError):
+            AnomalySink(self.path, fsync_policy='sometimes')
+
+
+if __name__ == '__main__':
+    unittest.main()
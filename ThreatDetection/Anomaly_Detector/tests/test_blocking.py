@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+
+from blocking import FileBackend, IPBlocker, NginxDenyMapBackend
+
+# Run from the Anomaly_Detector directory: python -m unittest discover tests
+
+
+class RecordingBackend(FileBackend):
+    """FileBackend that records every batch it is given and fails while `failing` is set."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.batches = []
+        self.failing = False
+
+    def apply(self, tree, added, removed, refreshed=()):
+        self.batches.append((list(added), list(removed), list(refreshed)))
+        if self.failing:
+            return False
+        return super().apply(tree, added, removed, refreshed)
+
+
+class IPBlockerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'blocklist.txt')
+        self.backend = RecordingBackend(self.path)
+        # Batches are applied directly with explicit times, without the blocker thread
+        self.blocker = IPBlocker(self.backend, ttl=60, density=1.0, min_prefix=32)
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def blocklist(self):
+        with open(self.path) as f:
+            return f.read().split()
+
+    def test_blocks_expire_after_the_ttl(self):
+        self.blocker.apply_batch({'10.0.0.1', '10.0.0.9'}, now=1000)
+        self.assertEqual(self.blocklist(), ['10.0.0.1/32', '10.0.0.9/32'])
+        self.blocker.apply_batch({'10.0.0.9'}, now=1030)
+        self.blocker.apply_batch(set(), now=1059)
+        self.assertEqual(self.blocklist(), ['10.0.0.1/32', '10.0.0.9/32'])
+        self.blocker.apply_batch(set(), now=1060)
+        self.assertEqual(self.blocklist(), ['10.0.0.9/32'])
+        self.blocker.apply_batch(set(), now=1090)
+        self.assertEqual(self.blocklist(), [])
+        self.assertEqual(self.blocker.blocked, {})
+
+    def test_repeat_blocks_only_extend_the_expiry(self):
+        self.blocker.apply_batch({'10.0.0.1'}, now=1000)
+        self.blocker.apply_batch({'10.0.0.1'}, now=1010)
+        self.blocker.apply_batch({'10.0.0.1'}, now=1020)
+        self.blocker.apply_batch(set(), now=1075)
+        # One rule added; later blocks are passed on as refreshes, and nothing expires yet
+        self.assertEqual(self.backend.batches, [(['10.0.0.1/32'], [], []), ([], [], ['10.0.0.1/32']),
+                                                ([], [], ['10.0.0.1/32'])])
+        self.assertEqual(self.blocker.blocked, {'10.0.0.1': 1080})
+        self.blocker.apply_batch(set(), now=1080)
+        self.assertEqual(self.backend.batches[-1], ([], ['10.0.0.1/32'], []))
+
+    def test_failed_changes_are_retried_with_the_next_batch(self):
+        self.backend.failing = True
+        self.blocker.apply_batch({'10.0.0.1', '10.0.0.2'}, now=1000)
+        self.assertFalse(os.path.exists(self.path))
+        # Changes made while failing are folded together: 10.0.0.2 expired before it was ever applied
+        self.blocker.apply_batch({'10.0.0.1', '10.0.0.3'}, now=1030)
+        self.blocker.apply_batch(set(), now=1060)
+        self.backend.failing = False
+        self.blocker.apply_batch(set(), now=1061)
+        self.assertEqual(self.backend.batches[-1], (['10.0.0.1/32', '10.0.0.3/32'], [], []))
+        self.assertEqual(self.blocklist(), ['10.0.0.1/32', '10.0.0.3/32'])
+        # Nothing left to apply
+        self.blocker.apply_batch(set(), now=1062)
+        self.assertEqual(len(self.backend.batches), 4)
+
+    def test_blocked_addresses_are_aggregated(self):
+        blocker = IPBlocker(self.backend, ttl=60, density=0.5, min_prefix=30)
+        blocker.apply_batch({'10.0.0.1', '10.0.0.2', '10.0.0.9'}, now=1000)
+        self.assertEqual(self.blocklist(), ['10.0.0.0/30', '10.0.0.9/32'])
+
+    def test_blocker_thread_applies_queued_blocks_on_close(self):
+        blocker = IPBlocker(self.backend, ttl=60, batch_interval=60).start()
+        blocker.block('10.0.0.1')
+        blocker.block('not an address')
+        blocker.close()
+        self.assertEqual(self.blocklist(), ['10.0.0.1/32'])
+
+
+class NginxDenyMapBackendTests(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'blocked_ips.map')
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_writes_geo_entries_and_retries_failed_reloads(self):
+        backend = NginxDenyMapBackend(self.path, reload_command='false', reload_interval=0)
+        blocker = IPBlocker(backend, ttl=60, density=1.0, min_prefix=32)
+        blocker.apply_batch({'10.0.0.1', '2001:db8::1'}, now=1000)
+        self.assertTrue(backend.pending)
+        backend.reload_command = ['true']
+        blocker.apply_batch(set(), now=1001)
+        self.assertFalse(backend.pending)
+        with open(self.path) as f:
+            entries = [line for line in f.read().splitlines() if not line.startswith('#')]
+        self.assertEqual(entries, ['10.0.0.1/32 1;', '2001:db8::1/128 1;'])
+
+    def test_reloads_are_coalesced(self):
+        backend = NginxDenyMapBackend(self.path, reload_command='true', reload_interval=3600)
+        blocker = IPBlocker(backend, ttl=60, density=1.0, min_prefix=32)
+        blocker.apply_batch({'10.0.0.1'}, now=1000)
+        blocker.apply_batch({'10.0.0.2'}, now=1001)
+        # Held back until the reload interval passes
+        self.assertTrue(backend.pending)
+        with open(self.path) as f:
+            self.assertNotIn('10.0.0.2', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from benchmarks.detector_bench import import_detector
+from incidents import IncidentAggregator
+
+# Run from the Anomaly_Detector directory: python -m unittest discover tests
+
+SEEN_AT = datetime(2026, 10, 18, 10, 0, 0)
+
+
+def anomaly_data(resource='/login'):
+    return {'Resource': resource, 'Status Code': 401}
+
+
+class IncidentAggregatorTests(unittest.TestCase):
+
+    def test_anomalies_within_the_window_merge_into_one_incident(self):
+        incidents = IncidentAggregator(window=60, max_examples=2)
+        for i, score in enumerate((-0.1, -0.3, -0.2)):
+            incidents.add('10.0.0.1', anomaly_data(f"/{i}"), score, SEEN_AT + timedelta(seconds=i), now=100 + i)
+        incidents.add('10.0.0.2', anomaly_data(), -0.1, SEEN_AT, now=110)
+
+        self.assertEqual(incidents.expired(now=159), [])
+        (incident,) = incidents.expired(now=160)
+        self.assertEqual((incident.ip_address, incident.count), ('10.0.0.1', 3))
+        self.assertEqual((incident.first_seen, incident.last_seen), (SEEN_AT, SEEN_AT + timedelta(seconds=2)))
+        self.assertEqual((incident.min_score, incident.max_score), (-0.3, -0.1))
+        self.assertEqual([example['Resource'] for example in incident.examples], ['/0', '/1'])
+
+        record = incident.to_record()
+        self.assertEqual((record['count'], record['anomaly_data'], record['reviewed']), (3, anomaly_data('/0'), False))
+        self.assertNotIn('resource', record)
+        self.assertNotEqual(record['id'], incident.to_record()['id'])
+
+    def test_a_new_incident_opens_after_the_window(self):
+        incidents = IncidentAggregator(window=60)
+        incidents.add('10.0.0.1', anomaly_data(), -0.1, SEEN_AT, now=100)
+        self.assertEqual(len(incidents.expired(now=160)), 1)
+        incident = incidents.add('10.0.0.1', anomaly_data(), -0.1, SEEN_AT, now=161)
+        self.assertEqual(incident.count, 1)
+        self.assertEqual(incidents.drain(), [incident])
+        self.assertEqual(incidents.drain(), [])
+
+    def test_by_resource_keeps_resources_apart(self):
+        incidents = IncidentAggregator(window=60, by_resource=True)
+        for resource in ('/a', '/b', '/a'):
+            incidents.add('10.0.0.1', anomaly_data(resource), -0.1, SEEN_AT, now=100)
+        closed = incidents.drain()
+        self.assertEqual(sorted((incident.resource, incident.count) for incident in closed), [('/a', 2), ('/b', 1)])
+        self.assertEqual(closed[0].to_record()['resource'], '/a')
+
+    def test_the_oldest_incident_closes_early_when_max_open_is_reached(self):
+        incidents = IncidentAggregator(window=60, max_open=2)
+        for ip_address in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            incidents.add(ip_address, anomaly_data(), -0.1, SEEN_AT, now=100)
+        self.assertEqual(list(incidents.open), [('10.0.0.2', None), ('10.0.0.3', None)])
+        self.assertEqual([incident.ip_address for incident in incidents.expired(now=101)], ['10.0.0.1'])
+
+
+class ReportAnomalyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.detector = import_detector(self.workdir.name, batch_size=64)
+        patches = [mock.patch.multiple(self.detector, INCIDENT_WINDOW=60, BLOCK_BACKEND='file', BLOCK_MIN_ANOMALIES=3,
+                                       incidents=IncidentAggregator(60)),
+                   mock.patch.object(self.detector, 'block_ip'),
+                   mock.patch.object(self.detector, 'get_anomaly_sink')]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def report(self, ip_address, count):
+        for _ in range(count):
+            self.detector.report_anomaly(ip_address, anomaly_data(), -0.2, SEEN_AT)
+
+    def test_blocks_once_per_incident_at_the_threshold(self):
+        detector = self.detector
+        self.report('10.0.0.1', 2)
+        detector.block_ip.assert_not_called()
+        self.report('10.0.0.1', 1)
+        detector.block_ip.assert_called_once_with('10.0.0.1')
+        self.report('10.0.0.1', 5)
+        self.report('10.0.0.2', 2)
+        detector.block_ip.assert_called_once_with('10.0.0.1')
+
+        # Once the incidents are logged, a new incident can reach the threshold again
+        detector.flush_incidents(now=time.monotonic() + 61)
+        written = [call.args[0] for call in detector.get_anomaly_sink().write.call_args_list]
+        self.assertEqual(sorted((record['ip_address'], record['count']) for record in written),
+                         [('10.0.0.1', 8), ('10.0.0.2', 2)])
+        self.report('10.0.0.1', 3)
+        self.assertEqual(detector.block_ip.call_count, 2)
+
+    def test_no_blocking_without_a_backend(self):
+        with mock.patch.object(self.detector, 'BLOCK_BACKEND', 'none'):
+            self.report('10.0.0.1', 5)
+        self.detector.block_ip.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
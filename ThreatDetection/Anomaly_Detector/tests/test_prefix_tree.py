@@ -0,0 +1,99 @@
+import ipaddress
+import random
+import unittest
+from collections import Counter
+
+from prefix_tree import PrefixTree
+
+# Run from the Anomaly_Detector directory: python -m unittest discover tests
+
+
+# The rules PrefixTree should hold for `blocked`, computed from scratch: for each address,
+# the shortest prefix over it that is fully blocked, or at least `min_prefix` bits long and
+# holding more than one and at least `density` of its addresses
+def brute_force_rules(blocked, density, min_prefix, min_prefix_v6):
+    addresses = [ipaddress.ip_address(address) for address in blocked]
+    counts = Counter((address.version, depth, int(address) >> (address.max_prefixlen - depth))
+                     for address in addresses for depth in range(address.max_prefixlen + 1))
+    rules = set()
+    for address in addresses:
+        bits = address.max_prefixlen
+        minimum = min_prefix if address.version == 4 else min_prefix_v6
+        for depth in range(bits + 1):
+            count, size = counts[address.version, depth, int(address) >> (bits - depth)], 1 << (bits - depth)
+            if count == size or (depth >= minimum and count > 1 and count >= density * size):
+                rules.add(str(ipaddress.ip_network(f"{address}/{depth}", strict=False)))
+                break
+    return rules
+
+
+class PrefixTreeTests(unittest.TestCase):
+
+    def check(self, tree, blocked, before, added, removed, params):
+        expected = brute_force_rules(blocked, *params)
+        self.assertEqual(set(tree.rules()), expected, params)
+        self.assertEqual(len(tree.rules()), len(expected))
+        # add() and remove() report exactly the rule changes
+        self.assertEqual(set(added), expected - before, params)
+        self.assertEqual(set(removed), before - expected, params)
+        self.assertEqual(len(tree), len(blocked))
+        for address in blocked:
+            self.assertIn(ipaddress.ip_address(address), ipaddress.ip_network(tree.rule_for(address)))
+        return expected
+
+    def test_random_adds_and_removes_match_brute_force(self):
+        # Small address ranges, so whole prefixes fill up and empty again
+        universe = ([f"10.0.0.{i}" for i in range(32)] + [f"10.0.1.{i}" for i in range(16)]
+                    + [f"2001:db8::{i:x}" for i in range(16)])
+        for density, min_prefix, min_prefix_v6 in ((0.5, 29, 126), (0.75, 28, 124), (1.0, 24, 64), (0.3, 30, 127)):
+            params = (density, min_prefix, min_prefix_v6)
+            rng = random.Random(f"{params}")
+            tree, blocked, rules = PrefixTree(*params), set(), set()
+            for _ in range(400):
+                address = rng.choice(universe)
+                # Lean towards adding so ranges fill; repeats and removing unblocked addresses are no-ops
+                if rng.random() < 0.6:
+                    added, removed = tree.add(address)
+                    blocked.add(address)
+                else:
+                    added, removed = tree.remove(address)
+                    blocked.discard(address)
+                rules = self.check(tree, blocked, rules, added, removed, params)
+            # Emptying the tree removes every rule
+            for address in sorted(blocked):
+                added, removed = tree.remove(address)
+                blocked.discard(address)
+                rules = self.check(tree, blocked, rules, added, removed, params)
+            self.assertEqual(tree.rules(), [])
+
+    def test_full_prefixes_merge_below_min_prefix(self):
+        tree = PrefixTree(density=1.0, min_prefix=32)
+        for i in range(7):
+            tree.add(f"10.0.0.{i}")
+        self.assertEqual(tree.rules(), ['10.0.0.0/30', '10.0.0.4/31', '10.0.0.6/32'])
+        # count == size: the last address of the /29 makes it one rule
+        self.assertEqual(tree.add('10.0.0.7'), (['10.0.0.0/29'], ['10.0.0.0/30', '10.0.0.4/31', '10.0.0.6/32']))
+        self.assertEqual(tree.remove('10.0.0.7'), (['10.0.0.0/30', '10.0.0.4/31', '10.0.0.6/32'], ['10.0.0.0/29']))
+
+    def test_density_applies_from_min_prefix(self):
+        tree = PrefixTree(density=0.5, min_prefix=30)
+        tree.add('10.0.0.1')
+        # Two of four at /30, at min_prefix: one rule
+        self.assertEqual(tree.add('10.0.0.2'), (['10.0.0.0/30'], ['10.0.0.1/32']))
+        # Four of eight at /29 is dense enough, but /29 is shorter than min_prefix
+        tree.add('10.0.0.4')
+        self.assertEqual(tree.add('10.0.0.5'), (['10.0.0.4/30'], ['10.0.0.4/32']))
+        self.assertEqual(tree.rules(), ['10.0.0.0/30', '10.0.0.4/30'])
+        # A single address never makes a prefix rule, whatever the density
+        sparse = PrefixTree(density=0.1, min_prefix=30)
+        self.assertEqual(sparse.add('10.0.0.1'), (['10.0.0.1/32'], []))
+
+    def test_ipv6_uses_its_own_min_prefix(self):
+        tree = PrefixTree(density=0.5, min_prefix=32, min_prefix_v6=126)
+        tree.add('2001:db8::1')
+        self.assertEqual(tree.add('2001:db8::2'), (['2001:db8::/126'], ['2001:db8::1/128']))
+        self.assertEqual(tree.rule_for('2001:db8::1'), '2001:db8::/126')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from artifacts import StandardScaling, load_model_artifact
+from encoders import CategoricalEncoder
+from forest import CompiledForest
+from registry import ModelRegistry, ModelWatcher
+
+# Run from the Anomaly_Detector directory: python -m unittest discover tests
+
+
+class ModelRegistryTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from sklearn.ensemble import IsolationForest
+        from sklearn.preprocessing import StandardScaler
+
+        rng = np.random.default_rng(0)
+        data = pd.DataFrame({'Bytes Sent': rng.integers(0, 5000, 500), 'Response Time (seconds)': rng.random(500)})
+        cls.scaler = StandardScaler().fit(data)
+        cls.features = cls.scaler.transform(data)
+        cls.model = IsolationForest(n_estimators=10, random_state=0).fit(cls.features)
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.registry = ModelRegistry(os.path.join(self.workdir.name, 'model_registry'), versions_kept=3)
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def save(self, version, **metadata):
+        return self.registry.save(version, CompiledForest.from_model(self.model), StandardScaling.from_scaler(self.scaler),
+                                  CategoricalEncoder(), **metadata)
+
+    def test_versions_resolve_from_the_version_directories(self):
+        registry = self.registry
+        self.assertEqual((registry.versions(), registry.next_version(), registry.current()), ([], 1, None))
+        for version in (1, 2, 10):
+            self.save(version, rows=version * 100)
+        # Unfinished writes and stray files are not versions
+        os.makedirs(f"{registry.path(11)}.tmp")
+        open(os.path.join(registry.directory, 'v0012'), 'w').close()
+        self.assertEqual(registry.versions(), [1, 2, 10])
+        self.assertEqual(registry.next_version(), 11)
+        self.assertEqual(registry.metadata(10)['rows'], 1000)
+        self.assertNotIn('encoder', registry.metadata(10))
+
+        artifact = load_model_artifact(registry.path(10))
+        self.assertEqual(artifact['version'], 10)
+        np.testing.assert_allclose(artifact['forest'].decision_function(self.features),
+                                   self.model.decision_function(self.features), rtol=1e-9, atol=1e-12)
+
+    def test_activate_switches_the_pointer_atomically(self):
+        registry = self.registry
+        self.save(1)
+        self.save(2)
+        registry.activate(1)
+        inode = os.stat(registry.pointer_path).st_ino
+        registry.activate(2)
+        self.assertEqual(registry.current(), 2)
+        with open(registry.pointer_path) as f:
+            self.assertEqual(f.read(), 'v0002\n')
+        # Replaced, never rewritten in place, so readers see the old pointer or the new one
+        self.assertNotEqual(os.stat(registry.pointer_path).st_ino, inode)
+        with mock.patch('registry.os.replace', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                registry.activate(1)
+        self.assertEqual(registry.current(), 2)
+
+        with self.assertRaises(ValueError):
+            registry.activate(3)
+        self.assertEqual(registry.current(), 2)
+        with open(registry.pointer_path, 'w') as f:
+            f.write('garbage')
+        self.assertIsNone(registry.current())
+
+    def test_rollback_and_pruning_keep_the_active_version(self):
+        registry = self.registry
+        for version in (1, 2, 3):
+            self.save(version)
+        registry.activate(3)
+        self.assertEqual(registry.rollback(), 2)
+        self.assertEqual(registry.rollback(), 1)
+        with self.assertRaises(ValueError):
+            registry.rollback()
+
+        # Only versions_kept are kept, but never the active one
+        self.save(4)
+        self.save(5)
+        self.assertEqual(registry.versions(), [1, 3, 4, 5])
+        self.assertEqual(registry.current(), 1)
+
+    def test_watcher_picks_up_new_and_rolled_back_versions(self):
+        registry = self.registry
+        watcher = ModelWatcher(registry, interval=0)
+        self.assertIsNone(watcher.poll())
+        self.save(1)
+        self.save(2)
+        registry.activate(1)
+        self.assertEqual(watcher.poll(), registry.path(1))
+        self.assertIsNone(watcher.poll())
+        registry.activate(2)
+        self.assertEqual(watcher.poll(), registry.path(2))
+        # Re-activating the loaded version is not a change
+        registry.activate(2)
+        self.assertIsNone(watcher.poll())
+        registry.rollback()
+        self.assertEqual(watcher.poll(), registry.path(1))
+
+    def test_watcher_checks_at_most_every_interval_and_skips_missing_versions(self):
+        registry = self.registry
+        self.save(1)
+        self.save(2)
+        registry.activate(1)
+        watcher = ModelWatcher(registry, interval=3600)
+        self.assertEqual(watcher.poll(), registry.path(1))
+        registry.activate(2)
+        self.assertIsNone(watcher.poll())
+        watcher.next_check = 0.0
+        self.assertEqual(watcher.poll(), registry.path(2))
+
+        # A pointer to a version that is not there is ignored, and the loaded model kept
+        with open(f"{registry.pointer_path}.tmp", 'w') as f:
+            f.write('v0007\n')
+        os.replace(f"{registry.pointer_path}.tmp", registry.pointer_path)
+        watcher.next_check = 0.0
+        self.assertIsNone(watcher.poll())
+        self.assertEqual(watcher.loaded, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
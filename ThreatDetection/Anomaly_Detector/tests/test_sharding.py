@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import queue
+import tempfile
+import unittest
+
+from benchmarks.detector_bench import import_detector, train_detector
+from benchmarks.loggen import generate_lines
+
+# Run from the Anomaly_Detector directory: python -m unittest discover tests
+
+
+class ShardWorkerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.detector = import_detector(self.workdir.name, batch_size=64)
+        self.detector.MODEL_REGISTRY_PATH = os.path.join(self.workdir.name, 'model_registry')
+        self.detector.model_registry = None
+        train_detector(self.detector, list(generate_lines(2000, seed=0)))
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_anomalies_keep_their_line_order_past_unparseable_lines(self):
+        lines = list(generate_lines(400, seed=2, burst_rate=0.01, burst_length=20))
+        # Unparseable lines early in the shard shift every later parsed entry
+        for position in (0, 5, 50):
+            lines.insert(position, 'not an access log line')
+        indexes = [100 + i for i in range(len(lines))]
+        line_at = dict(zip(indexes, lines))
+
+        inbox, results = queue.Queue(), queue.Queue()
+        inbox.put((0, indexes, lines))
+        inbox.put(None)
+        self.detector.shard_worker(inbox, results)
+        _, anomalies, _ = results.get_nowait()
+
+        self.assertTrue(anomalies)
+        for index, ip_address, feature_record, _, timestamp in anomalies:
+            parsed = self.detector.line_parser.parse(line_at[index])
+            self.assertIsNotNone(parsed)
+            self.assertEqual((parsed['IP_Address'], parsed['Timestamp'], parsed['Resource'], float(parsed['Bytes_Sent'])),
+                             (ip_address, timestamp, feature_record['Resource'], feature_record['Bytes Sent']))
+
+    def test_forked_workers_metrics_are_served_by_the_main_process(self):
+        detector = self.detector
+        sample = detector.metrics.registry.get_sample_value
+        version = detector.save_model_version(2, None)
+        lines = list(generate_lines(300, seed=3))
+        parsed_before = sample('anomaly_detector_lines_parsed_total') or 0
+
+        context = multiprocessing.get_context('fork')
+        inbox, results = context.Queue(), context.Queue()
+        inbox.put(detector.get_model_registry().path(version))
+        inbox.put((0, list(range(len(lines))), lines))
+        inbox.put(None)
+        worker = context.Process(target=detector.shard_worker, args=(inbox, results))
+        worker.start()
+        results.get(timeout=60)
+        worker.join(60)
+
+        # The main process never loads the new version itself
+        self.assertEqual(sample('anomaly_detector_model_version'), version)
+        self.assertEqual(sample('anomaly_detector_lines_parsed_total') - parsed_before, len(lines))
+        self.assertGreater(sample('anomaly_detector_stage_seconds_count', {'stage': 'predict'}), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import shutil
+
+from tailer import LogTailer
+
+# Run from the Anomaly_Detector directory: python -m pytest tests
+
+
+def append(path, text):
+    with open(path, 'a') as f:
+        f.write(text)
+
+
+# Every line available now, across a rotation: read_lines returns [] when it reaches the
+# end of a file, including the call that switches to the new one
+def read_all(tailer):
+    lines = []
+    for _ in range(4):
+        lines += tailer.read_lines()
+    return lines
+
+
+def open_tailer(tmp_path, checkpoint=True):
+    return LogTailer(str(tmp_path / 'access.log'), str(tmp_path / 'checkpoint.json') if checkpoint else None).open()
+
+
+def test_starts_at_the_end_and_returns_only_complete_lines(tmp_path):
+    log = tmp_path / 'access.log'
+    append(log, 'old\n')
+    tailer = open_tailer(tmp_path, checkpoint=False)
+    append(log, 'a\nb\nc')
+    assert read_all(tailer) == ['a', 'b']
+    append(log, 'ont\n')
+    assert read_all(tailer) == ['cont']
+    tailer.close()
+
+
+def test_follows_rename_rotation(tmp_path):
+    log = tmp_path / 'access.log'
+    append(log, '')
+    tailer = open_tailer(tmp_path)
+    append(log, 'a\n')
+    os.rename(log, tmp_path / 'access.log.1')
+    # The writer keeps appending to the renamed file until it reopens the log
+    append(tmp_path / 'access.log.1', 'b\n')
+    append(log, 'c\n')
+    assert read_all(tailer) == ['a', 'b', 'c']
+    append(log, 'd\n')
+    assert read_all(tailer) == ['d']
+    tailer.close()
+
+
+def test_follows_copytruncate_rotation(tmp_path):
+    log = tmp_path / 'access.log'
+    append(log, '')
+    tailer = open_tailer(tmp_path)
+    append(log, 'first line\nsecond line\n')
+    assert read_all(tailer) == ['first line', 'second line']
+    shutil.copy(log, tmp_path / 'access.log.1')
+    with open(log, 'r+') as f:
+        f.truncate(0)
+    append(log, 'a\n')
+    assert read_all(tailer) == ['a']
+    assert tailer.position()['offset'] == 2
+    tailer.close()
+
+
+def test_resumes_from_the_checkpoint(tmp_path):
+    log = tmp_path / 'access.log'
+    append(log, 'old\n')
+    tailer = open_tailer(tmp_path)
+    append(log, 'a\nb\n')
+    assert read_all(tailer) == ['a', 'b']
+    position = tailer.position()
+    append(log, 'c\n')
+    assert read_all(tailer) == ['c']
+    # Only lines up to `a`, `b` were processed when the detector stopped
+    tailer.commit(position=position)
+    tailer.close()
+
+    append(log, 'd\n')
+    tailer = open_tailer(tmp_path)
+    assert read_all(tailer) == ['c', 'd']
+    tailer.close()
+
+
+def test_resumes_a_log_rotated_while_stopped(tmp_path):
+    log = tmp_path / 'access.log'
+    append(log, '')
+    tailer = open_tailer(tmp_path)
+    append(log, 'a\n')
+    assert read_all(tailer) == ['a']
+    tailer.commit(force=True)
+    tailer.close()
+
+    append(log, 'b\n')
+    os.rename(log, tmp_path / 'access.log.1')
+    append(log, 'c\n')
+    tailer = open_tailer(tmp_path)
+    assert read_all(tailer) == ['b', 'c']
+    tailer.close()
+
+
+def test_lag_counts_the_new_file_while_draining_the_rotated_one(tmp_path):
+    log = tmp_path / 'access.log'
+    append(log, '')
+    tailer = open_tailer(tmp_path)
+    append(log, 'abc\n')
+    os.rename(log, tmp_path / 'access.log.1')
+    append(log, 'de\n')
+    assert tailer.lag_bytes() == 4 + 3
+    read_all(tailer)
+    tailer.commit()
+    assert tailer.lag_bytes() == 0
+    tailer.close()
@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from benchmarks.detector_bench import import_detector
+from benchmarks.loggen import generate_lines
+
+# Run from the Anomaly_Detector directory: python -m unittest discover tests
+
+
+class BuildTrainingDataTests(unittest.TestCase):
+
+    def setUp(self):
+        from sklearn.preprocessing import StandardScaler
+        from encoders import CategoricalEncoder
+
+        self.workdir = tempfile.TemporaryDirectory()
+        self.detector = import_detector(self.workdir.name, batch_size=64)
+        self.detector.ANOMALY_LOG_PATH = os.path.join(self.workdir.name, 'anomaly_feedback.json')
+        self.detector.REVIEW_LOG_PATH = f"{self.detector.ANOMALY_LOG_PATH}.reviews"
+        self.detector.load_log_format()
+        self.detector.scaler = StandardScaler()
+        self.detector.encoder = CategoricalEncoder()
+        self.lines = list(generate_lines(500, seed=1))
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def log_false_positive(self, anomaly_data):
+        with open(self.detector.ANOMALY_LOG_PATH, 'a') as f:
+            f.write(json.dumps({'id': 'fp', 'ip_address': anomaly_data['IP_Address'], 'anomaly_data': anomaly_data,
+                                'reviewed': True, 'feedback': 'false_positive'}) + '\n')
+
+    def test_false_positive_time_features_are_kept(self):
+        parsed = self.detector.line_parser.parse(self.lines[0])
+        anomaly_data = dict(self.detector.build_feature_record(parsed), Hour=3, Day=1, Weekday=2)
+        self.log_false_positive(anomaly_data)
+
+        data = self.detector.build_training_data(self.lines)
+        features = self.detector.preprocess_data(data)
+        restored = pd.DataFrame(self.detector.scaler.inverse_transform(features), columns=features.columns)
+
+        false_positive = restored.iloc[-1]
+        self.assertEqual(len(restored), len(self.lines) + 1)
+        self.assertEqual([round(false_positive[column]) for column in ('Hour', 'Day', 'Weekday')], [3, 1, 2])
+        # Rows with a timestamp still take their time features from it
+        self.assertEqual(round(restored.iloc[0]['Hour']), parsed['Timestamp'].hour)
+
+
+if __name__ == '__main__':
+    unittest.main()
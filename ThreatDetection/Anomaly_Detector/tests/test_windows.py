@@ -0,0 +1,110 @@
+import math
+import statistics
+import tempfile
+import unittest
+from collections import defaultdict, deque
+from unittest import mock
+
+import numpy as np
+
+from benchmarks.detector_bench import import_detector, train_detector
+from benchmarks.loggen import generate_lines
+from features import FeatureBuffer
+from windows import WINDOW_COLUMNS, IPWindows
+
+# Run from the Anomaly_Detector directory: python -m unittest discover tests
+
+
+# Window features recomputed from scratch over each IP's last `size` requests
+def naive_window_features(requests, size):
+    history = defaultdict(lambda: deque(maxlen=size))
+    for ip, timestamp, bytes_sent, response_time, backend_time in requests:
+        window = history[ip]
+        window.append((timestamp, bytes_sent, response_time, backend_time))
+        n = len(window)
+        span = timestamp - window[0][0]
+        yield (n / max(span, 1.0), timestamp - window[-2][0] if n > 1 else 0.0, span / (n - 1) if n > 1 else 0.0,
+               statistics.fmean(request[1] for request in window),
+               statistics.pstdev(request[2] for request in window),
+               statistics.pstdev(request[3] for request in window))
+
+
+class IPWindowsTests(unittest.TestCase):
+
+    def test_ring_buffer_matches_a_recomputation_over_the_last_requests(self):
+        rng = np.random.default_rng(0)
+        requests, timestamp = [], 1_700_000_000.0
+        for _ in range(3000):
+            timestamp += float(rng.exponential(0.5))
+            requests.append((f"10.0.0.{rng.integers(5)}", timestamp, float(rng.integers(0, 5000)),
+                             float(rng.exponential(0.05)), float(rng.exponential(0.05))))
+        windows = IPWindows(window_size=8, ttl=1e9)
+        for request, expected in zip(requests, naive_window_features(requests, 8)):
+            actual = windows.update(*request)
+            for column, a, b in zip(WINDOW_COLUMNS, actual, expected):
+                self.assertTrue(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9), (column, a, b))
+
+    def test_idle_ips_expire_and_the_memory_cap_evicts_the_least_recent(self):
+        windows = IPWindows(window_size=4, ttl=10)
+        windows.update('10.0.0.1', 0.0, 100, 0.1, 0.1)
+        windows.update('10.0.0.2', 5.0, 100, 0.1, 0.1)
+        windows.update('10.0.0.3', 12.0, 100, 0.1, 0.1)
+        self.assertEqual(list(windows.windows), ['10.0.0.2', '10.0.0.3'])
+        # An expired IP starts over with a one-request window
+        self.assertEqual(windows.update('10.0.0.1', 13.0, 100, 0.1, 0.1)[:3], (1.0, 0.0, 0.0))
+
+        capped = IPWindows(window_size=4, ttl=1e9)
+        capped.capacity = 2
+        for i, ip in enumerate(('10.0.0.1', '10.0.0.2', '10.0.0.1', '10.0.0.3')):
+            capped.update(ip, float(i), 100, 0.1, 0.1)
+        self.assertEqual(list(capped.windows), ['10.0.0.1', '10.0.0.3'])
+        self.assertEqual(capped.evicted, 1)
+
+
+class WindowFeatureParityTests(unittest.TestCase):
+    """Training (add_window_features over a DataFrame) and live scoring (IPWindows.observe
+    per parsed line) must produce the same window features for the same log."""
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.detector = import_detector(self.workdir.name, batch_size=64)
+        self.detector.load_log_format()
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def live_features(self, lines):
+        detector = self.detector
+        windows = IPWindows(detector.WINDOW_SIZE, detector.WINDOW_TTL, detector.WINDOW_MEMORY_MB)
+        parsed_entries = [windows.observe(detector.line_parser.parse(line)) for line in lines]
+        return np.array([[parsed[column] for column in WINDOW_COLUMNS] for parsed in parsed_entries])
+
+    def assert_parity(self, lines):
+        training = self.detector.add_window_features(self.detector.build_training_data(lines))
+        np.testing.assert_allclose(training[WINDOW_COLUMNS].to_numpy(), self.live_features(lines), rtol=1e-9)
+
+    def test_window_features_match(self):
+        self.assert_parity(list(generate_lines(2000, seed=4, burst_rate=0.002, burst_length=50)))
+
+    def test_window_features_match_across_wraps_expiry_and_eviction(self):
+        lines = list(generate_lines(1500, seed=5, lines_per_second=2, ips=40))
+        with mock.patch.multiple(self.detector, WINDOW_SIZE=4, WINDOW_TTL=30, WINDOW_MEMORY_MB=0.005):
+            self.assertLess(IPWindows(4, 30, 0.005).capacity, 40)
+            self.assert_parity(lines)
+
+    def test_scaled_features_match(self):
+        detector = self.detector
+        lines = list(generate_lines(2000, seed=6, burst_rate=0.002, burst_length=50))
+        train_detector(detector, lines)
+        training = detector.preprocess_data(detector.build_training_data(lines))
+
+        buffer = FeatureBuffer(detector.scaler, len(lines), detector.encoder,
+                               IPWindows(detector.WINDOW_SIZE, detector.WINDOW_TTL, detector.WINDOW_MEMORY_MB))
+        live = buffer.transform([detector.line_parser.parse(line) for line in lines])
+        self.assertEqual(list(training.columns), buffer.columns)
+        self.assertTrue(set(WINDOW_COLUMNS) <= set(buffer.columns))
+        np.testing.assert_allclose(training.to_numpy(), live, rtol=1e-9, atol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
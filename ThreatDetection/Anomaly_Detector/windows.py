@@ -0,0 +1,149 @@
+import math
+import sys
+from array import array
+from collections import OrderedDict
+
+# Per-IP behaviour features, named as in the training data (detected_anomalies.csv)
+WINDOW_COLUMNS = ['Average_Request_Frequency', 'Time_Difference', 'Average_Time_Between_Requests',
+                  'Average_Bytes_Sent', 'Response_Time_StdDev', 'Backend_Time_StdDev']
+
+# Ring buffer layout: one record of four values per request
+_TIME, _BYTES, _RESPONSE, _BACKEND = range(4)
+_RECORD = 4
+
+
+class IPWindow:
+    """Ring buffer of an IP's last requests, with running sums of the windowed values."""
+
+    __slots__ = ('ring', 'head', 'count', 'last', 'sum_bytes', 'sum_response', 'sum_backend',
+                 'square_response', 'square_backend')
+
+    def __init__(self, size):
+        self.ring = array('d', bytes(8 * _RECORD * size))
+        self.head = 0  # Slot the next request is written to
+        self.count = 0
+        self.last = 0.0
+        self.sum_bytes = self.sum_response = self.sum_backend = 0.0
+        self.square_response = self.square_backend = 0.0
+
+    # Recompute the running sums from the ring, so that floating point error from
+    # repeated add/subtract does not build up
+    def resum(self):
+        ring = self.ring
+        records = range(0, self.count * _RECORD, _RECORD)
+        self.sum_bytes = math.fsum(ring[i + _BYTES] for i in records)
+        self.sum_response = math.fsum(ring[i + _RESPONSE] for i in records)
+        self.sum_backend = math.fsum(ring[i + _BACKEND] for i in records)
+        self.square_response = math.fsum(ring[i + _RESPONSE] ** 2 for i in records)
+        self.square_backend = math.fsum(ring[i + _BACKEND] ** 2 for i in records)
+
+
+class IPWindows:
+    """
+    Incremental per-IP sliding-window features over each IP's last `window_size`
+    requests. Every update is O(1): the new request replaces the oldest one in the
+    IP's ring buffer and the running sums are adjusted by the difference. IPs idle
+    for longer than `ttl` seconds (of log time) are dropped, and when the tracked IPs
+    would exceed `max_memory_mb` the least recently seen IP is evicted.
+    """
+
+    def __init__(self, window_size=32, ttl=300.0, max_memory_mb=64.0):
+        self.window_size = window_size
+        self.ttl = ttl
+        self.windows = OrderedDict()  # Least recently seen IP first
+        self.capacity = max(1, int(max_memory_mb * (1 << 20) // self.bytes_per_ip(window_size)))
+        self.last_sweep = 0.0
+        self.expired = 0
+        self.evicted = 0
+
+    # Approximate memory held per tracked IP: its window, ring buffer, key and dict entry
+    @staticmethod
+    def bytes_per_ip(window_size):
+        window = IPWindow(window_size)
+        return sys.getsizeof(window) + sys.getsizeof(window.ring) + sys.getsizeof('255.255.255.255') + 100
+
+    def update(self, ip, timestamp, bytes_sent, response_time, backend_time):
+        """Add a request to the IP's window and return its WINDOW_COLUMNS values."""
+        windows = self.windows
+        window = windows.get(ip)
+        if window is None:
+            window = self.admit(ip, timestamp)
+        else:
+            windows.move_to_end(ip)
+
+        size = self.window_size
+        ring = window.ring
+        i = window.head * _RECORD
+        if window.count == size:
+            # Window full: the oldest request is the one being overwritten
+            window.sum_bytes -= ring[i + _BYTES]
+            window.sum_response -= ring[i + _RESPONSE]
+            window.sum_backend -= ring[i + _BACKEND]
+            window.square_response -= ring[i + _RESPONSE] ** 2
+            window.square_backend -= ring[i + _BACKEND] ** 2
+        else:
+            window.count += 1
+        ring[i] = timestamp
+        ring[i + _BYTES] = bytes_sent
+        ring[i + _RESPONSE] = response_time
+        ring[i + _BACKEND] = backend_time
+        window.sum_bytes += bytes_sent
+        window.sum_response += response_time
+        window.sum_backend += backend_time
+        window.square_response += response_time * response_time
+        window.square_backend += backend_time * backend_time
+        window.head = (window.head + 1) % size
+        if window.head == 0:
+            window.resum()
+
+        n = window.count
+        time_difference = timestamp - window.last if n > 1 else 0.0
+        window.last = timestamp
+        oldest = ring[window.head * _RECORD] if n == size else ring[0]
+        span = timestamp - oldest
+        mean_response = window.sum_response / n
+        mean_backend = window.sum_backend / n
+        return (
+            n / max(span, 1.0),
+            time_difference,
+            span / (n - 1) if n > 1 else 0.0,
+            window.sum_bytes / n,
+            math.sqrt(max(window.square_response / n - mean_response * mean_response, 0.0)),
+            math.sqrt(max(window.square_backend / n - mean_backend * mean_backend, 0.0)),
+        )
+
+    def observe(self, parsed):
+        """Update from a parsed log line and store its window features in it."""
+        values = self.update(parsed['IP_Address'], parsed['Timestamp'].timestamp(), parsed['Bytes_Sent'],
+                             parsed['Response_Time'] or 0.0, parsed['Backend_Time'] or 0.0)
+        parsed.update(zip(WINDOW_COLUMNS, values))
+        return parsed
+
+    # Start tracking a new IP, making room for it first
+    def admit(self, ip, timestamp):
+        windows = self.windows
+        if timestamp - self.last_sweep >= 1.0:
+            self.expire(timestamp)
+        if len(windows) >= self.capacity:
+            if not self.evicted:
+                print(f"Tracking {len(windows)} IPs, the window memory cap; evicting the least recently "
+                      f"seen IPs (raise WINDOW_MEMORY_MB to track more).")
+            windows.popitem(last=False)
+            self.evicted += 1
+        window = windows[ip] = IPWindow(self.window_size)
+        return window
+
+    # Drop IPs idle for longer than the TTL; the least recently seen are at the front
+    def expire(self, now):
+        self.last_sweep = now
+        windows = self.windows
+        cutoff = now - self.ttl
+        while windows:
+            ip, window = next(iter(windows.items()))
+            if window.last >= cutoff:
+                break
+            del windows[ip]
+            self.expired += 1
+
+    def __len__(self):
+        return len(self.windows)
@@ -0,0 +1,104 @@
+# detection/access_log_store.py
+
+import csv
+import ipaddress
+from datetime import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .ingest import sync_log
+from .models import AccessLogEntry
+
+# Text columns that the CSV may hold one-hot encoded, as `<Column>_<value>` columns
+CATEGORICAL_COLUMNS = ('ip_address', 'method', 'resource', 'protocol')
+
+
+def sync_access_logs(path):
+    """
+    Ingest the access log CSV rows appended since the last sync into the
+    AccessLogEntry table (see ingest.sync_log). Returns the number of rows added.
+    """
+    return sync_log(path, ingest_access_logs, has_header=True)
+
+
+def ingest_access_logs(lines, header):
+    columns = Columns(next(csv.reader([header.decode('utf-8', 'replace')])))
+    rows = csv.reader(line.decode('utf-8', 'replace') for line in lines)
+    entries = [entry for entry in map(columns.parse, rows) if entry is not None]
+    AccessLogEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def column_key(name):
+    return name.strip().lower().replace(' ', '_')
+
+
+def parse_timestamp(value):
+    try:
+        timestamp = parse_datetime(value)
+    except ValueError:
+        timestamp = None
+    if timestamp is None:
+        # The nginx $time_local format
+        try:
+            timestamp = datetime.strptime(value, '%d/%b/%Y:%H:%M:%S %z')
+        except ValueError:
+            return None
+    return timezone.make_aware(timestamp) if timezone.is_naive(timestamp) else timestamp
+
+
+def parse_number(value, cast=float):
+    try:
+        return cast(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class Columns:
+    """Maps the CSV header to AccessLogEntry fields, including one-hot encoded columns."""
+
+    def __init__(self, header):
+        self.keys = [column_key(name) for name in header]
+        self.one_hot = {}
+        for index, (name, key) in enumerate(zip(header, self.keys)):
+            for column in CATEGORICAL_COLUMNS:
+                if key.startswith(f'{column}_') and key != column:
+                    self.one_hot.setdefault(column, []).append((index, name.strip()[len(column) + 1:]))
+
+    def categorical(self, column, values, row):
+        value = values.get(column)
+        if value and value != '-':
+            return value
+        # One-hot columns may be scaled: the hot one is the largest positive value,
+        # or the only column when there is just one
+        candidates = self.one_hot.get(column, [])
+        scored = [(parse_number(row[index]) or 0.0, category) for index, category in candidates if index < len(row)]
+        best = max(scored, default=None)
+        if best is not None and (best[0] > 0 or len(scored) == 1):
+            return best[1]
+        return ''
+
+    def parse(self, row):
+        values = dict(zip(self.keys, row))
+        timestamp = parse_timestamp(values.get('timestamp', ''))
+        if timestamp is None:
+            return None
+        ip_address = self.categorical('ip_address', values, row) or None
+        try:
+            if ip_address is not None:
+                ipaddress.ip_address(ip_address)
+        except ValueError:
+            ip_address = None
+        return AccessLogEntry(
+            timestamp=timestamp,
+            ip_address=ip_address,
+            method=self.categorical('method', values, row)[:16],
+            resource=self.categorical('resource', values, row)[:2048],
+            protocol=self.categorical('protocol', values, row)[:16],
+            status_code=parse_number(values.get('status_code'), int),
+            response_time=parse_number(values.get('response_time', values.get('response_time_(seconds)'))),
+            backend_time=parse_number(values.get('backend_time', values.get('backend_time_(seconds)'))),
+            anomaly=values.get('anomaly', '').strip().lower() in ('-1', 'true', 'yes'),
+            data=values,
+        )
@@ -1,10 +1,16 @@
 # detection admin
 
 from django.contrib import admin
-from .models import ThreatData
+from .models import Anomaly, ThreatData
 
 @admin.register(ThreatData)
 class ThreatDataAdmin(admin.ModelAdmin):
     list_display = ('id', 'timestamp', 'threat_level', 'description', 'source_ip', 'processed')
     search_fields = ('description', 'source_ip')
     list_filter = ('threat_level', 'processed')
+
+@admin.register(Anomaly)
+class AnomalyAdmin(admin.ModelAdmin):
+    list_display = ('id', 'timestamp', 'ip_address', 'count', 'max_score', 'reviewed', 'feedback')
+    search_fields = ('ip_address',)
+    list_filter = ('reviewed', 'feedback')
@@ -0,0 +1,93 @@
+# detection/anomaly_store.py
+
+import ipaddress
+import json
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .ingest import sync_log
+from .models import Anomaly
+from .review_log import FEEDBACK_VALUES, anomaly_id, append_reviews, parse_event, review_log_path
+
+
+def sync_anomalies(path):
+    """
+    Ingest the anomaly log lines appended since the last sync into the Anomaly
+    table, then apply the new events of its review log (see ingest.sync_log).
+    Returns the number of anomalies added.
+    """
+    added = sync_log(path, ingest_anomalies)
+    sync_log(review_log_path(path), ingest_reviews)
+    return added
+
+
+def ingest_anomalies(lines, header=None):
+    anomalies = [anomaly for anomaly in map(parse_anomaly, lines) if anomaly is not None]
+    Anomaly.objects.bulk_create(anomalies, batch_size=1000)
+    return len(anomalies)
+
+
+def parse_anomaly(line):
+    """Build an Anomaly from one anomaly log line, or None if it is not a valid entry."""
+    try:
+        record = json.loads(line)
+        ipaddress.ip_address(record['ip_address'])
+    except (ValueError, KeyError, TypeError):
+        return None
+    timestamp = parse_datetime(record.get('timestamp') or '') or timezone.now()
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    feedback = record.get('feedback')
+    return Anomaly(
+        anomaly_id=anomaly_id(record),
+        ip_address=record['ip_address'],
+        timestamp=timestamp,
+        anomaly_data=record.get('anomaly_data') or {},
+        reviewed=bool(record.get('reviewed')),
+        feedback=feedback if feedback in FEEDBACK_VALUES else None,
+        count=record.get('count') or 1,
+        max_score=record.get('max_score'),
+        record=record,
+    )
+
+
+def ingest_reviews(lines, header=None):
+    # The latest event per anomaly wins
+    verdicts = {event['anomaly_id']: event['feedback'] for event in map(parse_event, lines) if event is not None}
+    apply_reviews(verdicts)
+    return len(verdicts)
+
+
+def apply_reviews(verdicts):
+    for feedback in FEEDBACK_VALUES:
+        ids = [anomaly for anomaly, verdict in verdicts.items() if verdict == feedback]
+        if ids:
+            Anomaly.objects.filter(anomaly_id__in=ids).update(reviewed=True, feedback=feedback)
+
+
+def record_feedback(path, verdicts):
+    """
+    Record review verdicts, keyed by anomaly ID, as events appended to the
+    review log next to the anomaly log at `path`, and apply them to the store.
+    An IP address as key stands for every unreviewed anomaly of that IP.
+    Returns the number of anomalies reviewed.
+    """
+    sync_anomalies(path)
+    by_id = {}
+    for key, feedback in verdicts.items():
+        if feedback not in FEEDBACK_VALUES:
+            continue
+        try:
+            ipaddress.ip_address(key)
+        except ValueError:
+            by_id[key] = feedback
+            continue
+        for anomaly in Anomaly.objects.filter(ip_address=key, reviewed=False).values_list('anomaly_id', flat=True):
+            by_id.setdefault(anomaly, feedback)
+    if not by_id:
+        return 0
+
+    append_reviews(review_log_path(path), by_id)
+    apply_reviews(by_id)
+    return len(by_id)
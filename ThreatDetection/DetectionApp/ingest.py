@@ -0,0 +1,100 @@
+# detection/ingest.py
+
+import logging
+import os
+
+from django.db import transaction
+
+from .models import LogCursor
+
+CHUNK_SIZE = 8 << 20  # Bytes of log read per insert batch
+
+logger = logging.getLogger(__name__)
+
+
+def sync_log(path, ingest_lines, has_header=False):
+    """
+    Feed the lines appended to the file at `path` since the last sync to
+    `ingest_lines(lines, header)`, which stores them and returns how many rows it
+    added. Progress is saved in LogCursor as a byte offset, so each sync reads
+    only new data, and only complete lines: a line still being written is picked
+    up next time. When the file has been rotated, possibly several times, the
+    rest of the old file and every newer backup are read first (see
+    read_rotated). With `has_header`, the first line of each file is passed as
+    `header` rather than ingested. Returns the number of rows added.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0
+    cursor = LogCursor.objects.filter(path=path).first()
+    if cursor is not None and cursor.inode == stat.st_ino and cursor.offset == stat.st_size:
+        return 0
+
+    added = 0
+    with transaction.atomic():
+        cursor, _ = LogCursor.objects.select_for_update().get_or_create(path=path)
+        if cursor.inode != stat.st_ino or cursor.offset > stat.st_size:
+            if cursor.inode is not None and cursor.inode != stat.st_ino:
+                added += read_rotated(path, cursor, ingest_lines, has_header)
+            elif cursor.inode is not None:
+                logger.warning("%s was truncated; resuming from its start, lines after byte %d of the "
+                               "old contents are not ingested", path, cursor.offset)
+            cursor.inode, cursor.offset, cursor.lines = stat.st_ino, 0, 0
+        count, consumed, lines = read_lines(path, cursor.offset, ingest_lines, has_header)
+        added += count
+        cursor.offset += consumed
+        cursor.lines += lines
+        cursor.save()
+    return added
+
+
+def read_rotated(path, cursor, ingest_lines, has_header):
+    """
+    Ingest what was rotated away from `path` since `cursor`: the rest of the file
+    the cursor points into, found by inode among the backups `path`.1, `path`.2,
+    ... (newest first, as the anomaly sink and logrotate number them), then each
+    newer backup whole, oldest first. Returns the number of rows added.
+    """
+    newer = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        backup = f"{path}.{index}"
+        if os.stat(backup).st_ino == cursor.inode:
+            added = read_lines(backup, cursor.offset, ingest_lines, has_header)[0]
+            for rotated in reversed(newer):
+                added += read_lines(rotated, 0, ingest_lines, has_header)[0]
+            return added
+        newer.append(backup)
+        index += 1
+    logger.warning("%s was rotated, but none of its %d backups is the file last read (inode %d); lines "
+                   "written to it after byte %d are not ingested", path, len(newer), cursor.inode, cursor.offset)
+    return 0
+
+
+def read_lines(path, start, ingest_lines, has_header):
+    """Ingest the complete lines of `path` after byte `start`; returns (rows added, bytes, lines) read."""
+    added = consumed = lines = 0
+    with open(path, 'rb') as f:
+        header = None
+        if has_header:
+            header = f.readline()
+            if not header.endswith(b'\n'):
+                return 0, 0, 0
+            if start == 0:
+                start = consumed = len(header)
+                lines = 1
+        f.seek(start)
+        pending = b''
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            data = pending + chunk
+            end = data.rfind(b'\n') + 1
+            pending = data[end:]
+            complete = data[:end].splitlines()
+            added += ingest_lines(complete, header)
+            consumed += end
+            lines += len(complete)
+    return added, consumed, lines
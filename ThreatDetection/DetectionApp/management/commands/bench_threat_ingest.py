@@ -0,0 +1,78 @@
+# detection/management/commands/bench_threat_ingest.py
+
+import json
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from DetectionApp.models import ThreatData
+
+# Measures threat ingest throughput through the API: one POST per record (ThreatDataSerializer
+# and one INSERT each) against the bulk action with a JSON array and with NDJSON. Runs against
+# the configured database, in a transaction that is rolled back.
+# Run: python manage.py bench_threat_ingest --records 20000
+
+
+class Rollback(Exception):
+    pass
+
+
+def generate_records(count, seed=0, invalid_every=50):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        record = {'threat_level': round(rng.uniform(0, 10), 2), 'description': f"anomalous traffic {i}",
+                  'source_ip': f"172.18.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+                  'processed': rng.random() < 0.1}
+        if invalid_every and i % invalid_every == invalid_every - 1:
+            record['threat_level'] = 42
+        records.append(record)
+    return records
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-record and bulk ThreatData ingest through the API."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=20000, help="Records per bulk request")
+        parser.add_argument('--single', type=int, default=1000, help="Records posted one at a time")
+
+    def handle(self, *args, **options):
+        client = APIClient()
+        client.force_authenticate(get_user_model()(username='bench'))
+        records = generate_records(options['records'])
+        try:
+            with transaction.atomic():
+                self.report('per-record POST', options['single'], lambda: self.post_each(client, records[:options['single']]))
+                self.report('bulk JSON', len(records), lambda: self.post_bulk(
+                    client, json.dumps(records), 'application/json'))
+                self.report('bulk NDJSON', len(records), lambda: self.post_bulk(
+                    client, '\n'.join(map(json.dumps, records)), 'application/x-ndjson'))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def post_each(self, client, records):
+        url = reverse('threatdata-list')
+        accepted = 0
+        for record in records:
+            accepted += client.post(url, record, format='json').status_code == 201
+        return accepted
+
+    def post_bulk(self, client, body, content_type):
+        response = client.post(reverse('threatdata-bulk-ingest'), body, content_type=content_type)
+        return response.json()['accepted']
+
+    def report(self, name, count, run):
+        before = ThreatData.objects.count()
+        started = time.perf_counter()
+        accepted = run()
+        seconds = time.perf_counter() - started
+        assert ThreatData.objects.count() - before == accepted
+        self.stdout.write(f"{name:16} {count:7d} records, {accepted:7d} accepted in {seconds:7.3f}s "
+                          f"({count / seconds:9.0f} records/s)")
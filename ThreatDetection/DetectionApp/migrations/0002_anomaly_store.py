@@ -0,0 +1,41 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DetectionApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyLogCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('inode', models.BigIntegerField(null=True)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('lines', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Anomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ip_address', models.GenericIPAddressField()),
+                ('timestamp', models.DateTimeField(db_index=True)),
+                ('anomaly_data', models.JSONField()),
+                ('reviewed', models.BooleanField(default=False)),
+                ('feedback', models.CharField(blank=True, choices=[('true_positive', 'True positive'), ('false_positive', 'False positive')], max_length=20, null=True)),
+                ('count', models.PositiveIntegerField(default=1)),
+                ('max_score', models.FloatField(blank=True, null=True)),
+                ('record', models.JSONField()),
+            ],
+            options={
+                'ordering': ['-timestamp', '-id'],
+                'indexes': [models.Index(fields=['ip_address', 'timestamp'], name='DetectionAp_ip_addr_6e19e7_idx'), models.Index(fields=['reviewed', 'timestamp'], name='DetectionAp_reviewe_a2fda5_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DetectionApp', '0002_anomaly_store'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='AnomalyLogCursor',
+            new_name='LogCursor',
+        ),
+        migrations.CreateModel(
+            name='AccessLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('method', models.CharField(blank=True, max_length=16)),
+                ('resource', models.CharField(blank=True, max_length=2048)),
+                ('protocol', models.CharField(blank=True, max_length=16)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('response_time', models.FloatField(blank=True, null=True)),
+                ('backend_time', models.FloatField(blank=True, null=True)),
+                ('anomaly', models.BooleanField(default=False)),
+                ('data', models.JSONField()),
+            ],
+            options={
+                'ordering': ['-timestamp', '-id'],
+                'indexes': [models.Index(fields=['timestamp', 'id'], name='DetectionAp_timesta_7a31ef_idx'), models.Index(fields=['ip_address', 'timestamp', 'id'], name='DetectionAp_ip_addr_4d58a3_idx'), models.Index(fields=['status_code', 'timestamp', 'id'], name='DetectionAp_status__accbc7_idx'), models.Index(fields=['anomaly', 'timestamp', 'id'], name='DetectionAp_anomaly_42f59f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+def set_anomaly_ids(apps, schema_editor):
+    # Same rule as review_log.anomaly_id, for the anomalies already ingested
+    Anomaly = apps.get_model('DetectionApp', 'Anomaly')
+    anomalies = list(Anomaly.objects.only('id', 'record'))
+    for anomaly in anomalies:
+        record = anomaly.record or {}
+        anomaly.anomaly_id = record.get('id') or f"{record.get('ip_address')}/{record.get('timestamp')}"
+    Anomaly.objects.bulk_update(anomalies, ['anomaly_id'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DetectionApp', '0003_access_log_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anomaly',
+            name='anomaly_id',
+            field=models.CharField(db_index=True, default='', max_length=128),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_anomaly_ids, migrations.RunPython.noop),
+    ]
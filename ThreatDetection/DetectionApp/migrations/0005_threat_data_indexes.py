@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DetectionApp', '0004_anomaly_review_ids'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='threatdata',
+            options={'ordering': ['-timestamp', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='threatdata',
+            index=models.Index(fields=['timestamp', 'id'], name='DetectionAp_timesta_026045_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='threatdata',
+            index=models.Index(fields=['processed', 'timestamp', 'id'], name='DetectionAp_process_aa8508_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='threatdata',
+            index=models.Index(fields=['source_ip', 'timestamp', 'id'], name='DetectionAp_source__55f7e2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='threatdata',
+            index=models.Index(fields=['threat_level'], name='DetectionAp_threat__67ee86_idx'),
+        ),
+    ]
@@ -9,5 +9,86 @@ class ThreatData(models.Model):
     source_ip = models.GenericIPAddressField()  # Source IP of the threat
     processed = models.BooleanField(default=False)  # Whether the threat has been processed
 
+    class Meta:
+        ordering = ['-timestamp', '-id']
+        # The API pages by (timestamp, id) and filters by processed state, IP and level
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),
+            models.Index(fields=['processed', 'timestamp', 'id']),
+            models.Index(fields=['source_ip', 'timestamp', 'id']),
+            models.Index(fields=['threat_level']),
+        ]
+
     def __str__(self):
         return f"{self.description} ({self.threat_level}) - {self.source_ip}"
+
+
+class Anomaly(models.Model):
+    """
+    An anomaly (or incident) from the detector's anomaly log, ingested by
+    anomaly_store.sync_anomalies. Indexed for the review pages: by IP, by time,
+    and by review state.
+    """
+    FEEDBACK_CHOICES = [('true_positive', 'True positive'), ('false_positive', 'False positive')]
+
+    anomaly_id = models.CharField(max_length=128, db_index=True)  # Review events refer to it (see review_log)
+    ip_address = models.GenericIPAddressField()
+    timestamp = models.DateTimeField(db_index=True)  # When the detector logged it
+    anomaly_data = models.JSONField()  # Feature record of the (first) anomalous request
+    reviewed = models.BooleanField(default=False)
+    feedback = models.CharField(max_length=20, choices=FEEDBACK_CHOICES, null=True, blank=True)
+    count = models.PositiveIntegerField(default=1)  # Anomalies in the incident
+    max_score = models.FloatField(null=True, blank=True)
+    record = models.JSONField()  # The full log entry, including incident examples
+
+    class Meta:
+        ordering = ['-timestamp', '-id']
+        indexes = [
+            models.Index(fields=['ip_address', 'timestamp']),
+            models.Index(fields=['reviewed', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.ip_address} at {self.timestamp} ({self.feedback or 'not reviewed'})"
+
+
+class LogCursor(models.Model):
+    """How far into the log file at `path` has been ingested (see ingest.sync_log)."""
+    path = models.CharField(max_length=255, unique=True)
+    inode = models.BigIntegerField(null=True)  # Identifies the file across rotations
+    offset = models.BigIntegerField(default=0)  # Bytes ingested, always at a line boundary
+    lines = models.BigIntegerField(default=0)  # Lines ingested
+
+    def __str__(self):
+        return f"{self.path} at byte {self.offset}"
+
+
+class AccessLogEntry(models.Model):
+    """
+    A row of the access log CSV, ingested by access_log_store.sync_access_logs.
+    The columns the pages filter on are fields; the whole row is kept in `data`.
+    """
+    timestamp = models.DateTimeField()
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    method = models.CharField(max_length=16, blank=True)
+    resource = models.CharField(max_length=2048, blank=True)
+    protocol = models.CharField(max_length=16, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_time = models.FloatField(null=True, blank=True)
+    backend_time = models.FloatField(null=True, blank=True)
+    anomaly = models.BooleanField(default=False)  # Flagged by the model in the CSV
+    data = models.JSONField()  # All columns, keyed by snake_case name
+
+    class Meta:
+        ordering = ['-timestamp', '-id']
+        # Each filter is an equality on one field plus the timestamp order, so pages
+        # read straight off an index
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),
+            models.Index(fields=['ip_address', 'timestamp', 'id']),
+            models.Index(fields=['status_code', 'timestamp', 'id']),
+            models.Index(fields=['anomaly', 'timestamp', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.ip_address} {self.method} {self.resource} at {self.timestamp}"
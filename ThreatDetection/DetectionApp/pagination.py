@@ -0,0 +1,86 @@
+# detection/pagination.py
+
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over (`field`, id), newest first. The cursor holds the
+    last row's position, and the next page is the rows strictly after it, so a
+    page is one index range scan however deep it is, and rows inserted while
+    paging are neither skipped nor repeated.
+    """
+    field = 'timestamp'
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request.GET.get(self.cursor_query_param))
+        if position is not None:
+            value, pk = position
+            # The redundant `<= value` bound lets the database seek the (field, id) index to
+            # the cursor; the OR alone is not sargable and scans from the start
+            queryset = queryset.filter(Q(**{f'{self.field}__lte': value}),
+                                       Q(**{f'{self.field}__lt': value}) | Q(**{self.field: value, 'pk__lt': pk}))
+        rows = list(queryset.order_by(f'-{self.field}', '-pk')[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = (getattr(rows[-1], self.field), rows[-1].pk) if self.has_next else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, position):
+        value, pk = position
+        return base64.urlsafe_b64encode(json.dumps([value.isoformat(), pk]).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            value = parse_datetime(value)
+        except (ValueError, TypeError):
+            raise NotFound("Invalid cursor")
+        if value is None or not isinstance(pk, int):
+            raise NotFound("Invalid cursor")
+        return value, pk
+
+    def get_next_cursor(self):
+        return self.encode_cursor(self.next_position) if self.next_position is not None else None
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,85 @@
+# detection/review_log.py
+# Review verdicts as append-only events, in the format the anomaly detector merges and
+# compacts (Anomaly_Detector/reviews.py). Plain Python, so anomaly_review.py can use it too.
+# FEEDBACK_VALUES, anomaly_id, parse_event and the lock file mirror Anomaly_Detector/reviews.py:
+# the detector image ships only its own directory, so the two cannot share a module. Change
+# both together; DetectionApp/tests.py checks that they agree.
+
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: appends are still single O_APPEND writes
+    fcntl = None
+
+FEEDBACK_VALUES = ('true_positive', 'false_positive')
+
+
+def review_log_path(anomaly_log_path):
+    return f"{anomaly_log_path}.reviews"
+
+
+def anomaly_id(record):
+    """The ID of an anomaly log entry; entries logged before IDs are identified by IP and log time."""
+    return record.get('id') or f"{record.get('ip_address')}/{record.get('timestamp')}"
+
+
+def parse_event(line):
+    """The event on one review log line, or None if it is not a valid event."""
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None  # A line still being written
+    if isinstance(event, dict) and event.get('feedback') in FEEDBACK_VALUES and event.get('anomaly_id'):
+        return event
+    return None
+
+
+@contextmanager
+def shared_lock(path):
+    """Held while appending, so the detector's compaction never swaps the file mid-write."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def append_reviews(path, verdicts):
+    """
+    Append one event per (anomaly ID, feedback) in `verdicts`, in a single
+    O_APPEND write: the cost does not depend on the size of either log, and
+    concurrent reviewers and the detector never overwrite each other.
+    """
+    reviewed_at = datetime.now().isoformat()
+    events = ''.join(json.dumps({'anomaly_id': anomaly, 'feedback': feedback, 'reviewed_at': reviewed_at}) + '\n'
+                     for anomaly, feedback in verdicts.items() if feedback in FEEDBACK_VALUES)
+    if not events:
+        return
+    with shared_lock(path):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, events.encode())
+        finally:
+            os.close(fd)
+
+
+def read_reviews(path):
+    """The latest verdict per anomaly ID."""
+    verdicts = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                event = parse_event(line)
+                if event is not None:
+                    verdicts[event['anomaly_id']] = event['feedback']
+    except FileNotFoundError:
+        pass
+    return verdicts
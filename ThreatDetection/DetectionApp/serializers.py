@@ -1,7 +1,7 @@
 # detection/serializers.py
 
 from rest_framework import serializers
-from .models import ThreatData
+from .models import AccessLogEntry, ThreatData
 
 class ThreatDataSerializer(serializers.ModelSerializer):
 
@@ -14,3 +14,11 @@ class ThreatDataSerializer(serializers.ModelSerializer):
         if value < 0 or value > 10:
             raise serializers.ValidationError("Threat level must be between 0 and 10.")
         return value
+
+
+class AccessLogEntrySerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = AccessLogEntry
+        fields = ['id', 'timestamp', 'ip_address', 'method', 'resource', 'protocol', 'status_code',
+                  'response_time', 'backend_time', 'anomaly', 'data']
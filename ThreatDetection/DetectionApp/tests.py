@@ -1,3 +1,585 @@
-from django.test import TestCase
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import fakeredis
+import redis
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from ThreatDetection.blocklist import Blocklist
+from ThreatDetection.middleware import BlocklistMiddleware
+
+from . import review_log
+from .access_log_store import sync_access_logs
+from .anomaly_store import record_feedback, sync_anomalies
+from .models import AccessLogEntry, Anomaly, LogCursor, ThreatData
+from .pagination import KeysetPagination
+from .views import filter_access_logs, filter_threats
+
+
+def create_threats(count, start=0):
+    threats = ThreatData.objects.bulk_create(
+        ThreatData(threat_level=(i % 100) / 10, description=f"threat {i}", source_ip=f"10.0.{i % 4}.1",
+                   processed=i % 2 == 0)
+        for i in range(start, start + count))
+    # timestamp is auto_now_add: spread the rows over time, with ties, after the insert
+    base = timezone.now()
+    for threat in threats:
+        threat.timestamp = base - timedelta(seconds=threat.pk // 3)
+    ThreatData.objects.bulk_update(threats, ['timestamp'], batch_size=1000)
+
+
+class ThreatDataViewSetTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('analyst'))
+        self.url = reverse('threatdata-list')
+
+    def fetch_all(self, params=None, page_size=7):
+        ids, url, params = [], self.url, dict(params or {}, page_size=page_size)
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [threat['id'] for threat in response.json()['results']]
+            url, params = response.json()['next'], None
+        return ids
+
+    def test_pages_cover_every_row_once_newest_first(self):
+        create_threats(50)
+        expected = list(ThreatData.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(self.fetch_all(), expected)
+
+    def test_rows_added_while_paging_are_not_repeated(self):
+        create_threats(20)
+        first = self.client.get(self.url, {'page_size': 10}).json()
+        create_threats(5, start=20)
+        second = self.client.get(first['next']).json()
+        seen = [threat['id'] for threat in first['results'] + second['results']]
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_filters(self):
+        create_threats(40)
+        ids = self.fetch_all({'processed': 'false', 'source_ip': '10.0.1.1', 'min_level': '0.5', 'max_level': '3'})
+        expected = ThreatData.objects.filter(processed=False, source_ip='10.0.1.1',
+                                             threat_level__gte=0.5, threat_level__lte=3)
+        self.assertEqual(sorted(ids), sorted(expected.values_list('id', flat=True)))
+
+    def test_invalid_filters_are_rejected(self):
+        for params in ({'processed': 'maybe'}, {'min_level': 'high'}, {'since': 'yesterday'}, {'cursor': 'bogus'}):
+            response = self.client.get(self.url, params)
+            self.assertIn(response.status_code, (400, 404), params)
+
+    def test_mark_processed(self):
+        create_threats(1, start=1)
+        threat = ThreatData.objects.get()
+        response = self.client.post(reverse('threatdata-mark-processed', args=[threat.pk]))
+        self.assertEqual(response.status_code, 200)
+        threat.refresh_from_db()
+        self.assertTrue(threat.processed)
+
+    def test_bulk_ingest_json_and_ndjson(self):
+        url = reverse('threatdata-bulk-ingest')
+        records = [{'threat_level': 7.5, 'description': 'scan', 'source_ip': '10.0.0.1'},
+                   {'threat_level': 11, 'description': 'too high', 'source_ip': '10.0.0.2'},
+                   {'threat_level': 1, 'description': 'bad ip', 'source_ip': 'nowhere'},
+                   {'threat_level': 2, 'description': 'done', 'source_ip': '::1', 'processed': True}]
+        response = self.client.post(url, json.dumps(records), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['accepted'], 2)
+        self.assertEqual(response.json()['rejected'], 2)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2])
+
+        ndjson = '\n'.join(json.dumps(record) for record in records[:1] * 3)
+        response = self.client.post(url, ndjson, content_type='application/x-ndjson')
+        self.assertEqual(response.json()['accepted'], 3)
+        self.assertEqual(ThreatData.objects.count(), 5)
+        self.assertTrue(ThreatData.objects.get(source_ip='::1').processed)
+
+    def test_bulk_ingest_rejects_malformed_bodies(self):
+        url = reverse('threatdata-bulk-ingest')
+        for body in ('{"threat_level": 1}', '[{"threat_level": 1,'):
+            response = self.client.post(url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(ThreatData.objects.count(), 0)
+
+    def page_seconds(self, params, depth):
+        # Time the page query after the row `depth` rows into the filtered listing, without the
+        # request overhead, which is larger than the page query itself
+        rows = filter_threats(ThreatData.objects.all(), params).order_by('-timestamp', '-id')
+        row, following = rows[depth], rows[depth + 1]
+        cursor = KeysetPagination().encode_cursor((row.timestamp, row.pk))
+        request = Request(APIRequestFactory().get(self.url, dict(params, cursor=cursor)))
+        timings = []
+        for _ in range(7):
+            started = time.perf_counter()
+            page = KeysetPagination().paginate_queryset(filter_threats(ThreatData.objects.all(), params), request)
+            timings.append(time.perf_counter() - started)
+            self.assertEqual(page[0].pk, following.pk)
+        return sorted(timings)[len(timings) // 2]
+
+    def test_page_latency_stays_flat_as_table_grows(self):
+        # A page near the end of the table costs what a page near the start does; an OFFSET
+        # page, or a cursor filter the index cannot seek to, would scan every row before it
+        create_threats(50000)
+        for params in ({}, {'processed': 'false'}):
+            count = filter_threats(ThreatData.objects.all(), params).count()
+            shallow, deep = self.page_seconds(params, 100), self.page_seconds(params, count - 100)
+            self.assertLess(deep, shallow * 2 + 0.001, params)
+
+    @skipUnless(connection.vendor == 'sqlite', "Reads SQLite query plans")
+    def test_cursor_pages_seek_the_composite_indexes(self):
+        create_threats(100)
+        cursor = self.client.get(self.url, {'page_size': 10}).json()['next']
+        for params, fields in (({}, ['timestamp', 'id']), ({'processed': 'false'}, ['processed', 'timestamp', 'id']),
+                               ({'processed': 'true'}, ['processed', 'timestamp', 'id']),
+                               ({'source_ip': '10.0.1.1'}, ['source_ip', 'timestamp', 'id'])):
+            index = next(index.name for index in ThreatData._meta.indexes if index.fields == fields)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(cursor, params)
+            with connection.cursor() as db:
+                db.execute(f"EXPLAIN QUERY PLAN {queries.captured_queries[-1]['sql']}")
+                plan = ' '.join(str(row[-1]) for row in db.fetchall())
+            self.assertIn('SEARCH', plan, params)
+            self.assertIn(index, plan, params)
+            self.assertNotIn('SCAN', plan, params)
+
+
+def anomaly_line(anomaly, ip_address='10.0.0.1', second=0):
+    return json.dumps({'id': anomaly, 'ip_address': ip_address, 'timestamp': f"2026-10-18T10:00:{second:02d}",
+                       'anomaly_data': {'Resource': f"/{anomaly}"}, 'reviewed': False, 'feedback': None}) + '\n'
+
+
+def rotate(path, backups=5):
+    # As the detector's AnomalySink rotates: shift path.N up, then move path to path.1
+    for i in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+
+class AnomalyStoreTests(TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'anomaly_feedback.json')
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def write(self, *lines):
+        with open(self.path, 'a') as f:
+            f.write(''.join(lines))
+
+    def ingested(self):
+        return sorted(Anomaly.objects.values_list('anomaly_id', flat=True))
+
+    def test_each_sync_reads_only_the_complete_lines_appended_since_the_last(self):
+        self.write(anomaly_line('a'), anomaly_line('b'))
+        self.assertEqual(sync_anomalies(self.path), 2)
+        self.assertEqual(sync_anomalies(self.path), 0)
+
+        line = anomaly_line('d')
+        self.write(anomaly_line('c'), line[:10])  # d still being written
+        self.assertEqual(sync_anomalies(self.path), 1)
+        self.write(line[10:])
+        self.assertEqual(sync_anomalies(self.path), 1)
+        self.assertEqual(self.ingested(), ['a', 'b', 'c', 'd'])
+        cursor = LogCursor.objects.get(path=self.path)
+        self.assertEqual((cursor.offset, cursor.lines), (os.path.getsize(self.path), 4))
+
+    def test_sync_resumes_across_several_rotations(self):
+        self.write(anomaly_line('a'))
+        sync_anomalies(self.path)
+        # Rotated three times between syncs: the rest of the file last read is now path.3
+        self.write(anomaly_line('b'))
+        rotate(self.path)
+        for anomaly in ('c', 'd'):
+            self.write(anomaly_line(anomaly))
+            rotate(self.path)
+        self.write(anomaly_line('e'))
+
+        self.assertEqual(sync_anomalies(self.path), 4)
+        self.assertEqual(self.ingested(), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(list(Anomaly.objects.order_by('timestamp', 'id').values_list('anomaly_id', flat=True)),
+                         ['a', 'b', 'c', 'd', 'e'])
+
+    def test_rotation_past_every_backup_is_logged(self):
+        self.write(anomaly_line('a'))
+        sync_anomalies(self.path)
+        os.rename(self.path, os.path.join(self.workdir.name, 'archived.json'))
+        self.write(anomaly_line('b'))
+        with self.assertLogs('DetectionApp.ingest', 'WARNING'):
+            self.assertEqual(sync_anomalies(self.path), 1)
+        self.assertEqual(self.ingested(), ['a', 'b'])
+
+    def test_every_anomaly_of_an_ip_is_kept(self):
+        self.write(*(anomaly_line(anomaly, second=i) for i, anomaly in enumerate('abc')),
+                   anomaly_line('d', ip_address='10.0.0.2'))
+        sync_anomalies(self.path)
+        self.assertEqual(Anomaly.objects.filter(ip_address='10.0.0.1').count(), 3)
+
+    def test_record_feedback_by_id_and_by_ip(self):
+        self.write(anomaly_line('a'), anomaly_line('b', second=1), anomaly_line('c', ip_address='10.0.0.2'))
+        self.assertEqual(record_feedback(self.path, {'a': 'true_positive', 'c': 'maybe'}), 1)
+        # An IP stands for its anomalies still unreviewed: b, not a
+        self.assertEqual(record_feedback(self.path, {'10.0.0.1': 'false_positive'}), 1)
+
+        verdicts = {'a': 'true_positive', 'b': 'false_positive'}
+        reviewed = Anomaly.objects.filter(reviewed=True)
+        self.assertEqual(dict(reviewed.values_list('anomaly_id', 'feedback')), verdicts)
+        self.assertEqual(review_log.read_reviews(review_log.review_log_path(self.path)), verdicts)
+        # The anomaly log itself is left as the detector wrote it
+        with open(self.path) as f:
+            self.assertFalse(any(json.loads(line)['reviewed'] for line in f))
+
+        # A store rebuilt from the logs gets the verdicts back from the review log
+        Anomaly.objects.all().delete()
+        LogCursor.objects.all().delete()
+        sync_anomalies(self.path)
+        self.assertEqual(dict(Anomaly.objects.filter(reviewed=True).values_list('anomaly_id', 'feedback')), verdicts)
+
+
+ACCESS_LOG_HEADER = 'Timestamp,IP Address,Method,Resource,Status Code,Response Time (seconds),Anomaly\n'
+
+
+class AccessLogStoreTests(TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'detected_anomalies.csv')
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def write(self, *lines):
+        with open(self.path, 'a') as f:
+            f.write(''.join(lines))
+
+    def test_rows_map_to_fields_and_unparseable_rows_are_skipped(self):
+        self.write(ACCESS_LOG_HEADER,
+                   '2026-10-18 10:00:00+00:00,10.0.0.1,GET,/login,200,0.25,1\n',
+                   '18/Oct/2026:12:00:01 +0200,not an ip,POST,-,abc,-,-1\n',
+                   'yesterday,10.0.0.1,GET,/,200,0.1,1\n',
+                   '2026-10-18T10:00:02,::1,GET,"/search?q=a,b",404,1e-3,0\n')
+        self.assertEqual(sync_access_logs(self.path), 3)
+        first, second, third = AccessLogEntry.objects.order_by('timestamp', 'id')
+        self.assertEqual((first.ip_address, first.method, first.resource, first.status_code, first.response_time,
+                          first.anomaly), ('10.0.0.1', 'GET', '/login', 200, 0.25, False))
+        self.assertEqual(first.data['ip_address'], '10.0.0.1')
+        # nginx's $time_local, with its offset
+        self.assertEqual(second.timestamp, first.timestamp + timedelta(seconds=1))
+        self.assertEqual((second.ip_address, second.resource, second.status_code, second.response_time,
+                          second.anomaly), (None, '', None, None, True))
+        # Naive timestamps are in the current time zone
+        self.assertEqual(third.timestamp, timezone.make_aware(datetime(2026, 10, 18, 10, 0, 2)))
+        self.assertEqual((third.ip_address, third.resource, third.status_code), ('::1', '/search?q=a,b', 404))
+
+    def test_one_hot_columns_are_decoded(self):
+        # As the detector's CSV writes them: one-hot encoded, then scaled
+        self.write('Timestamp,Status Code,Method_GET,Method_POST,IP_Address_172.18.0.1,Anomaly\n',
+                   '2026-10-18 10:00:00+00:00,204,-0.47,2.13,0.0,-1\n',
+                   '2026-10-18 10:00:01+00:00,200,1.8,-0.3,0.0,1\n',
+                   '2026-10-18 10:00:02+00:00,200,-0.47,-0.3,0.0,1\n')
+        sync_access_logs(self.path)
+        entries = AccessLogEntry.objects.order_by('timestamp')
+        self.assertEqual([(entry.method, entry.ip_address, entry.anomaly) for entry in entries],
+                         [('POST', '172.18.0.1', True), ('GET', '172.18.0.1', False), ('', '172.18.0.1', False)])
+
+    def test_sync_reads_appended_rows_once_and_rereads_the_header_after_rotation(self):
+        self.write(ACCESS_LOG_HEADER, '2026-10-18 10:00:00+00:00,10.0.0.1,GET,/,200,0.1,1\n')
+        self.assertEqual(sync_access_logs(self.path), 1)
+        line = '2026-10-18 10:00:02+00:00,10.0.0.3,GET,/,200,0.1,1\n'
+        self.write('2026-10-18 10:00:01+00:00,10.0.0.2,GET,/,200,0.1,1\n', line[:20])
+        self.assertEqual(sync_access_logs(self.path), 1)
+        self.write(line[20:])
+        self.assertEqual(sync_access_logs(self.path), 1)
+        self.assertEqual(sync_access_logs(self.path), 0)
+
+        # The new file's header names the columns in another order
+        rotate(self.path)
+        self.write('Status Code,Timestamp,IP Address\n', '503,2026-10-18 10:00:03+00:00,10.0.0.4\n')
+        self.assertEqual(sync_access_logs(self.path), 1)
+        self.assertEqual(list(AccessLogEntry.objects.values_list('ip_address', 'status_code')),
+                         [('10.0.0.4', 503), ('10.0.0.3', 200), ('10.0.0.2', 200), ('10.0.0.1', 200)])
+
+
+class AccessLogFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.base = timezone.now().replace(microsecond=0)
+        AccessLogEntry.objects.bulk_create(
+            AccessLogEntry(timestamp=cls.base - timedelta(minutes=i), ip_address=f"10.0.0.{i % 3}",
+                           status_code=(200, 404)[i % 2], anomaly=i % 4 == 0, data={})
+            for i in range(12))
+
+    # Entries matching `params`, as their minutes before base
+    def filtered(self, **params):
+        return sorted(int((self.base - entry.timestamp).total_seconds()) // 60
+                      for entry in filter_access_logs(AccessLogEntry.objects.all(), params))
+
+    def test_filters_combine(self):
+        self.assertEqual(self.filtered(ip='10.0.0.1'), [1, 4, 7, 10])
+        self.assertEqual(self.filtered(status='404', ip='10.0.0.1'), [1, 7])
+        self.assertEqual(self.filtered(anomaly='true'), [0, 4, 8])
+        self.assertEqual(self.filtered(anomaly='false', status='200'), [2, 6, 10])
+        since, until = (self.base - timedelta(minutes=5)).isoformat(), (self.base - timedelta(minutes=2)).isoformat()
+        self.assertEqual(self.filtered(since=since, until=until), [3, 4, 5])
+        # Empty values are ignored
+        self.assertEqual(self.filtered(ip='', status='', anomaly=''), list(range(12)))
+
+    def test_invalid_values_are_rejected(self):
+        for params in ({'status': 'abc'}, {'status': '-1'}, {'anomaly': 'yes'}, {'since': 'yesterday'},
+                       {'until': '2026-13-01T00:00:00'}):
+            with self.assertRaises(ValidationError, msg=params):
+                filter_access_logs(AccessLogEntry.objects.all(), params)
+
+    def test_the_api_and_the_page_answer_400_for_invalid_filters(self):
+        missing = os.path.join(tempfile.gettempdir(), 'missing')
+        with mock.patch('DetectionApp.views.CSV_FILE_PATH', f"{missing}.csv"), \
+                mock.patch('DetectionApp.views.FEEDBACK_FILE_PATH', f"{missing}.json"):
+            response = self.client.get(reverse('access_log_entries'), {'status': '404', 'ip': '10.0.0.1'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), 2)
+            for params in ({'anomaly': 'yes'}, {'since': '2026-13-01T00:00:00'}):
+                self.assertEqual(self.client.get(reverse('access_log_entries'), params).status_code, 400, params)
+
+    @skipUnless(connection.vendor == 'sqlite', "Reads SQLite query plans")
+    def test_filters_seek_their_indexes(self):
+        for params, fields in (({'ip': '10.0.0.1'}, ['ip_address', 'timestamp', 'id']),
+                               ({'status': '404'}, ['status_code', 'timestamp', 'id']),
+                               ({'anomaly': 'false'}, ['anomaly', 'timestamp', 'id'])):
+            index = next(index.name for index in AccessLogEntry._meta.indexes if index.fields == fields)
+            sql, sql_params = filter_access_logs(AccessLogEntry.objects.all(), params).query.sql_with_params()
+            with connection.cursor() as db:
+                db.execute(f"EXPLAIN QUERY PLAN {sql}", sql_params)
+                plan = ' '.join(str(row[-1]) for row in db.fetchall())
+            self.assertIn(index, plan, params)
+            self.assertNotIn('SCAN', plan, params)
+
+
+class ReviewAnomaliesViewTests(TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'anomaly_feedback.json')
+        patcher = mock.patch('DetectionApp.views.FEEDBACK_FILE_PATH', self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('review_anomalies')
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_lists_only_anomalies_awaiting_review(self):
+        with open(self.path, 'w') as f:
+            f.write(''.join(anomaly_line(anomaly, second=i) for i, anomaly in enumerate('abc')))
+        record_feedback(self.path, {'b': 'true_positive'})
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([anomaly.anomaly_id for anomaly in response.context['anomalies']], ['c', 'a'])
+
+    def test_posted_verdicts_mark_anomalies_reviewed_and_are_logged(self):
+        with open(self.path, 'w') as f:
+            f.write(anomaly_line('a') + anomaly_line('b', second=1) + anomaly_line('c', ip_address='10.0.0.2'))
+        verdicts = {'a': 'true_positive', '10.0.0.2': 'false_positive', 'b': 'maybe'}
+        response = self.client.post(self.url, json.dumps(verdicts), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'message': 'All anomalies reviewed successfully.'})
+
+        expected = {'a': 'true_positive', 'c': 'false_positive'}
+        self.assertEqual(dict(Anomaly.objects.values_list('anomaly_id', 'feedback')), {**expected, 'b': None})
+        self.assertEqual(set(Anomaly.objects.filter(reviewed=True).values_list('anomaly_id', flat=True)), {'a', 'c'})
+        self.assertEqual(review_log.read_reviews(review_log.review_log_path(self.path)), expected)
+        response = self.client.get(self.url)
+        self.assertEqual([anomaly.anomaly_id for anomaly in response.context['anomalies']], ['b'])
+
+
+def load_detector_module(name):
+    # The detector's modules are not importable as a package; they import each other
+    # from their own directory
+    directory = Path(__file__).resolve().parent.parent / 'Anomaly_Detector'
+    spec = importlib.util.spec_from_file_location(f"detector_{name}", directory / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.object(sys, 'path', [str(directory)] + sys.path):
+        spec.loader.exec_module(module)
+    return module
+
+
+class ReviewLogFormatTests(SimpleTestCase):
+    """review_log.py mirrors Anomaly_Detector/reviews.py; both sides must read the same log."""
+
+    def setUp(self):
+        self.reviews = load_detector_module('reviews')
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'anomaly_feedback.json.reviews')
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_feedback_values_and_anomaly_ids_match(self):
+        self.assertEqual(review_log.FEEDBACK_VALUES, self.reviews.FEEDBACK_VALUES)
+        for record in ({'id': 'abc', 'ip_address': '10.0.0.1', 'timestamp': '2026-10-18T10:00:00'},
+                       {'ip_address': '10.0.0.1', 'timestamp': '2026-10-18T10:00:00'},
+                       {'id': '', 'ip_address': '::1'},
+                       {}):
+            self.assertEqual(review_log.anomaly_id(record), self.reviews.anomaly_id(record), record)
+
+    def test_both_sides_read_the_same_verdicts(self):
+        review_log.append_reviews(self.path, {'a': 'true_positive', 'b': 'false_positive'})
+        with open(self.path, 'a') as f:
+            f.write('{"anomaly_id": "", "feedback": "true_positive"}\n')
+            f.write('{"anomaly_id": "c", "feedback": "maybe"}\n')
+        review_log.append_reviews(self.path, {'a': 'false_positive'})
+        with open(self.path, 'a') as f:
+            f.write('{"anomaly_id": "b", "feed')  # Still being written
+        with open(self.path) as f:
+            for line in f:
+                self.assertEqual(review_log.parse_event(line), self.reviews.parse_event(line), line)
+        self.assertEqual(review_log.read_reviews(self.path), self.reviews.ReviewLog(self.path).read())
+
+        self.reviews.ReviewLog(self.path).compact()
+        self.assertEqual(review_log.read_reviews(self.path), {'a': 'false_positive', 'b': 'false_positive'})
+
+    def test_appends_wait_for_the_detector_compaction_lock(self):
+        detector_log = self.reviews.ReviewLog(self.path)
+        appender = threading.Thread(target=review_log.append_reviews, args=(self.path, {'a': 'true_positive'}))
+        with detector_log.locked(exclusive=True):
+            appender.start()
+            appender.join(0.2)
+            self.assertTrue(appender.is_alive())
+            self.assertFalse(os.path.exists(self.path))
+        appender.join(5)
+        self.assertEqual(detector_log.read(), {'a': 'true_positive'})
+
+
+class BlocklistTests(SimpleTestCase):
+    """Blocklist reads what the detector's RedisBackend publishes."""
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        patcher = mock.patch('redis.Redis.from_url', lambda url: fakeredis.FakeRedis(server=self.server))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.blocking = load_detector_module('blocking')
+        self.backend = self.blocking.RedisBackend('redis://redis:6379/1', changes_kept=3)
+        self.blocklist = Blocklist('redis://redis:6379/1')
+
+    def publish(self, added=(), removed=()):
+        self.assertTrue(self.backend.apply(None, list(added), list(removed)))
+
+    def test_applies_only_the_rules_changed_since_its_version(self):
+        blocklist = self.blocklist
+        self.publish(added=['10.0.0.1', '192.168.0.0/16'])
+        blocklist.refresh()
+        self.assertEqual(blocklist.version, self.backend.version)
+        self.assertIn('10.0.0.1', blocklist)
+        self.assertIn('192.168.4.5', blocklist)
+        self.assertNotIn('10.0.0.2', blocklist)
+
+        self.publish(added=['10.0.0.2', '2001:db8::/32'])
+        self.publish(removed=['192.168.0.0/16'])
+        # One pipeline for the version and the changes, no reload of the whole set
+        with mock.patch.object(blocklist.client, 'pipeline', wraps=blocklist.client.pipeline) as pipeline:
+            blocklist.refresh()
+        self.assertEqual(pipeline.call_count, 1)
+        self.assertEqual(blocklist.rules, {'10.0.0.1', '10.0.0.2', '2001:db8::/32'})
+        self.assertIn('2001:db8::1', blocklist)
+        self.assertNotIn('192.168.4.5', blocklist)
+        self.assertNotIn('not an address', blocklist)
+
+        # An unchanged version costs one round trip and changes nothing
+        version = blocklist.version
+        blocklist.refresh()
+        self.assertEqual((blocklist.version, blocklist.prefix_lengths), (version, ((6, 32),)))
+
+    def test_reloads_everything_when_behind_the_trimmed_change_log(self):
+        blocklist = self.blocklist
+        self.publish(added=['10.0.0.1', '10.0.0.2'])
+        blocklist.refresh()
+        for i in range(3, 8):
+            self.publish(added=[f"10.0.0.{i}"])
+        self.publish(removed=['10.0.0.1'])
+        self.assertGreater(self.backend.floor, blocklist.version)
+        with mock.patch.object(blocklist.client, 'smismember', side_effect=AssertionError) as smismember:
+            blocklist.refresh()
+        smismember.assert_not_called()
+        self.assertEqual(blocklist.rules, {f"10.0.0.{i}" for i in range(2, 8)})
+
+        # A restarted detector starts empty, above every reader's version
+        self.backend = self.blocking.RedisBackend('redis://redis:6379/1')
+        blocklist.refresh()
+        self.assertEqual((blocklist.rules, blocklist.addresses), (set(), set()))
+
+    def test_keeps_the_last_blocklist_while_redis_is_unavailable(self):
+        blocklist = self.blocklist
+        self.publish(added=['10.0.0.1', '10.1.0.0/16'])
+        blocklist.refresh()
+        self.server.connected = False
+        with self.assertRaises(redis.ConnectionError):
+            blocklist.refresh()
+        self.assertIn('10.0.0.1', blocklist)
+        self.assertIn('10.1.2.3', blocklist)
+
+        # The refresh thread logs the error and tries again after the interval
+        with mock.patch('ThreatDetection.blocklist.time.sleep', side_effect=[None, SystemExit]), \
+                mock.patch('builtins.print') as printed:
+            with self.assertRaises(SystemExit):
+                blocklist.run()
+        self.assertEqual(printed.call_count, 2)
+
+        self.server.connected = True
+        self.publish(removed=['10.0.0.1'])
+        blocklist.refresh()
+        self.assertNotIn('10.0.0.1', blocklist)
+        self.assertIn('10.1.2.3', blocklist)
+
+
+@override_settings(BLOCKLIST_REDIS_URL='redis://redis:6379/1', BLOCKLIST_REDIS_PREFIX='blocklist',
+                   BLOCKLIST_REFRESH_INTERVAL=1.0, BLOCKLIST_CLIENT_IP_HEADER='HTTP_X_REAL_IP')
+class BlocklistMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(Blocklist, 'start', lambda blocklist: blocklist)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def request(self, ip_address):
+        return self.factory.get('/', HTTP_X_REAL_IP=ip_address, REMOTE_ADDR='127.0.0.1')
+
+    def test_blocked_clients_get_403(self):
+        middleware = BlocklistMiddleware(lambda request: HttpResponse('ok'))
+        middleware.blocklist.add_rule('10.0.0.1')
+        middleware.blocklist.add_rule('172.16.0.0/12')
+        for ip_address, status_code in (('10.0.0.1', 403), ('172.20.1.1', 403), ('10.0.0.2', 200)):
+            self.assertEqual(middleware(self.request(ip_address)).status_code, status_code, ip_address)
+        # Without the proxy's header, the peer address is checked
+        self.assertEqual(middleware(self.factory.get('/', REMOTE_ADDR='10.0.0.1')).status_code, 403)
+
+    async def test_blocked_clients_get_403_under_asgi(self):
+        async def get_response(request):
+            return HttpResponse('ok')
+
+        middleware = BlocklistMiddleware(get_response)
+        middleware.blocklist.add_rule('10.0.0.1')
+        self.assertEqual((await middleware(self.request('10.0.0.1'))).status_code, 403)
+        self.assertEqual((await middleware(self.request('10.0.0.2'))).status_code, 200)
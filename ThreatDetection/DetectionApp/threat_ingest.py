@@ -0,0 +1,99 @@
+# detection/threat_ingest.py
+
+import ipaddress
+import json
+import math
+
+from django.db import transaction
+
+from .models import ThreatData
+
+CHUNK_SIZE = 1000  # Rows per INSERT
+MAX_RECORDS = 100000  # Records accepted in one request
+MAX_BODY_BYTES = 64 << 20  # Request body size accepted
+ERRORS_REPORTED = 20  # Rejected records described in the response
+DESCRIPTION_MAX_LENGTH = ThreatData._meta.get_field('description').max_length
+
+
+class IngestError(ValueError):
+    """The request body is not a JSON array or NDJSON of threat records."""
+
+
+def read_records(stream, length, ndjson):
+    """
+    The records in a request body of `length` bytes read from `stream`: a JSON
+    array, or with `ndjson`, one JSON object per line, parsed as it is read.
+    The body is read directly rather than through request.body, whose
+    DATA_UPLOAD_MAX_MEMORY_SIZE limit is meant for forms, not batches.
+    """
+    if length > MAX_BODY_BYTES:
+        raise IngestError(f"Request body too large: at most {MAX_BODY_BYTES} bytes.")
+    try:
+        if ndjson:
+            records = []
+            for line in iter(stream.readline, b''):
+                if line.strip():
+                    records.append(json.loads(line))
+                    if len(records) > MAX_RECORDS:
+                        break
+        else:
+            records = json.loads(stream.read(length))
+    except ValueError as e:
+        raise IngestError(f"Invalid JSON: {e}")
+    if not isinstance(records, list):
+        raise IngestError("Expected a JSON array of threat records.")
+    if len(records) > MAX_RECORDS:
+        raise IngestError(f"Too many records: at most {MAX_RECORDS} per request.")
+    return records
+
+
+def check_threat(record):
+    """
+    The ThreatData row for one record, or the reason it is rejected. Applies
+    the model and ThreatDataSerializer rules with plain type checks, without
+    building a serializer per record.
+    """
+    if not isinstance(record, dict):
+        return None, "expected an object"
+    threat_level = record.get('threat_level')
+    if isinstance(threat_level, bool) or not isinstance(threat_level, (int, float)) or not math.isfinite(threat_level):
+        return None, "threat_level: expected a number"
+    if not 0 <= threat_level <= 10:
+        return None, "threat_level: must be between 0 and 10"
+    description = record.get('description')
+    if not isinstance(description, str) or not description:
+        return None, "description: expected a non-empty string"
+    if len(description) > DESCRIPTION_MAX_LENGTH:
+        return None, f"description: at most {DESCRIPTION_MAX_LENGTH} characters"
+    source_ip = record.get('source_ip')
+    try:
+        if not isinstance(source_ip, str):
+            raise ValueError
+        source_ip = str(ipaddress.ip_address(source_ip))
+    except ValueError:
+        return None, "source_ip: expected an IP address"
+    processed = record.get('processed', False)
+    if not isinstance(processed, bool):
+        return None, "processed: expected true or false"
+    return ThreatData(threat_level=threat_level, description=description, source_ip=source_ip,
+                      processed=processed), None
+
+
+def ingest_threats(records):
+    """
+    Insert the valid records in chunks, all in one transaction. Returns the
+    accepted and rejected counts, with the reasons for the first rejections.
+    """
+    threats, errors = [], []
+    rejected = 0
+    for index, record in enumerate(records):
+        threat, error = check_threat(record)
+        if threat is not None:
+            threats.append(threat)
+            continue
+        rejected += 1
+        if len(errors) < ERRORS_REPORTED:
+            errors.append({'index': index, 'error': error})
+    with transaction.atomic():
+        ThreatData.objects.bulk_create(threats, batch_size=CHUNK_SIZE)
+    return {'accepted': len(threats), 'rejected': rejected, 'errors': errors}
@@ -1,15 +1,16 @@
 # detection/urls.py
 from django.urls import path
-from .views import access_logs_view, ReviewAnomaliesView
+from .views import access_logs_view, AccessLogListView, ReviewAnomaliesView
 from rest_framework.routers import DefaultRouter
 from .views import ThreatDataViewSet
 
 router = DefaultRouter()
 router.register(r'threats', ThreatDataViewSet)
 
-urlpatterns = router.urls
-
 urlpatterns = [
     path('access-logs/', access_logs_view, name='access_logs'),
+    path('access-logs/entries/', AccessLogListView.as_view(), name='access_log_entries'),
     path('review-anomalies/', ReviewAnomaliesView.as_view(), name='review_anomalies'),
 ]
+
+urlpatterns += router.urls
@@ -1,25 +1,34 @@
 from django.shortcuts import render
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, generics
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from django.http import JsonResponse, HttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
 from django.views import View
-import csv
 import json
 import os
-from .models import ThreatData
-from .serializers import ThreatDataSerializer
+from .access_log_store import sync_access_logs
+from .anomaly_store import record_feedback, sync_anomalies
+from .models import AccessLogEntry, Anomaly, ThreatData
+from .pagination import KeysetPagination
+from .serializers import AccessLogEntrySerializer, ThreatDataSerializer
+from .threat_ingest import IngestError, ingest_threats, read_records
 # Define paths
 CSV_FILE_PATH = r'C:\Users\karan\OneDrive\Documents\GitHub\AIThreatDetection\ThreatDetection\detected_anomalies.csv'
 FEEDBACK_FILE_PATH = r'C:\Users\karan\OneDrive\Documents\GitHub\AIThreatDetection\ThreatDetection\anomaly_feedback.json'
+ANOMALIES_SHOWN = 100  # Most recent anomalies listed on a page
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl')
 
 
 class ThreatDataViewSet(viewsets.ModelViewSet):
+    """Threats, newest first, filtered server-side and paged by cursor."""
     queryset = ThreatData.objects.all()
     serializer_class = ThreatDataSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [filters.SearchFilter]
     search_fields = ['description', 'source_ip']
-    ordering_fields = ['timestamp', 'threat_level']
 
     @action(detail=True, methods=['post'])
     def mark_processed(self, request, pk=None):
@@ -28,74 +37,145 @@ class ThreatDataViewSet(viewsets.ModelViewSet):
         threat.save()
         return Response({'status': 'threat marked as processed'})
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_ingest(self, request):
+        """
+        Insert a batch of threats, sent as a JSON array or as NDJSON
+        (Content-Type: application/x-ndjson). Invalid records are skipped and
+        counted; the valid ones are inserted together.
+        """
+        ndjson = request.content_type.split(';')[0].strip() in NDJSON_CONTENT_TYPES
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        try:
+            records = read_records(request, length, ndjson)
+        except IngestError as e:
+            raise ValidationError(str(e))
+        result = ingest_threats(records)
+        return Response(result, status=400 if result['rejected'] and not result['accepted'] else 201)
+
     def get_queryset(self):
-        processed = self.request.query_params.get('processed')
-        queryset = ThreatData.objects.filter(processed=processed) if processed is not None else ThreatData.objects.all()
-        return queryset
+        queryset = ThreatData.objects.all()
+        if self.action != 'list':
+            return queryset
+        return filter_threats(queryset, self.request.query_params)
 
 
-def load_anomalies(feedback_file):
-    """Load anomalies from JSON feedback file."""
+def parse_level_filter(value, name):
     try:
-        with open(feedback_file, "r") as f:
-            anomalies = [json.loads(line) for line in f]
-        # Use dictionary comprehension for faster lookups
-        return {anomaly['ip_address']: anomaly for anomaly in anomalies if 'ip_address' in anomaly}
-    except FileNotFoundError:
-        return {}
+        return float(value)
+    except ValueError:
+        raise ValidationError(f"Invalid {name}: expected a number.")
+
+
+def filter_threats(queryset, params):
+    """Apply the processed, source_ip, min_level, max_level, since and until query parameters."""
+    if params.get('processed'):
+        if params['processed'] not in ('true', 'false'):
+            raise ValidationError("Invalid processed: expected true or false.")
+        # `processed=False` compiles to `NOT processed`, which SQLite cannot seek the
+        # (processed, timestamp, id) index with; a one-value IN compiles to an equality
+        queryset = queryset.filter(processed__in=[params['processed'] == 'true'])
+    if params.get('source_ip'):
+        queryset = queryset.filter(source_ip=params['source_ip'])
+    if params.get('min_level'):
+        queryset = queryset.filter(threat_level__gte=parse_level_filter(params['min_level'], 'min_level'))
+    if params.get('max_level'):
+        queryset = queryset.filter(threat_level__lte=parse_level_filter(params['max_level'], 'max_level'))
+    if params.get('since'):
+        queryset = queryset.filter(timestamp__gte=parse_time_filter(params['since'], 'since'))
+    if params.get('until'):
+        queryset = queryset.filter(timestamp__lt=parse_time_filter(params['until'], 'until'))
+    return queryset
+
 
+def load_anomalies(feedback_file):
+    """All anomalies from the feedback file, newest first, after ingesting its new lines and review events."""
+    sync_anomalies(feedback_file)
+    return Anomaly.objects.all()
 
-def check_for_anomaly(log_entry, anomalies):
-    """Check if a log entry has an anomaly."""
-    ip_address = log_entry.get('ip_address')
-    return ip_address in anomalies if ip_address else False
+
+def parse_time_filter(value, name):
+    try:
+        timestamp = parse_datetime(value)
+    except ValueError:  # Well formed but out of range, like month 13
+        timestamp = None
+    if timestamp is None:
+        raise ValidationError(f"Invalid {name}: expected an ISO 8601 date and time.")
+    return timezone.make_aware(timestamp) if timezone.is_naive(timestamp) else timestamp
+
+
+def filter_access_logs(queryset, params):
+    """Apply the ip, status, since, until and anomaly query parameters."""
+    if params.get('ip'):
+        queryset = queryset.filter(ip_address=params['ip'])
+    if params.get('status'):
+        if not params['status'].isdigit():
+            raise ValidationError("Invalid status: expected an HTTP status code.")
+        queryset = queryset.filter(status_code=int(params['status']))
+    if params.get('since'):
+        queryset = queryset.filter(timestamp__gte=parse_time_filter(params['since'], 'since'))
+    if params.get('until'):
+        queryset = queryset.filter(timestamp__lt=parse_time_filter(params['until'], 'until'))
+    if params.get('anomaly'):
+        if params['anomaly'] not in ('true', 'false'):
+            raise ValidationError("Invalid anomaly: expected true or false.")
+        # As with processed in filter_threats, a one-value IN so the anomaly index is used for false too
+        queryset = queryset.filter(anomaly__in=[params['anomaly'] == 'true'])
+    return queryset
+
+
+class AccessLogListView(generics.ListAPIView):
+    """Access log rows, newest first, filtered server-side and paged by cursor."""
+    serializer_class = AccessLogEntrySerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        sync_access_logs(CSV_FILE_PATH)
+        return filter_access_logs(AccessLogEntry.objects.all(), self.request.query_params)
 
 
 def access_logs_view(request):
-    """Display access logs with anomalies marked."""
-    access_logs = []
+    """Display a page of access logs with anomalies marked."""
     anomalies = load_anomalies(FEEDBACK_FILE_PATH)
-
+    sync_access_logs(CSV_FILE_PATH)
+    paginator = KeysetPagination()
     try:
-        with open(CSV_FILE_PATH, 'r') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                # Flag anomaly if IP matches
-                row['anomaly'] = check_for_anomaly(row, anomalies)
-                access_logs.append(row)
-    except FileNotFoundError:
-        return HttpResponse("Access logs file not found.", status=404)
-
-    return render(request, 'access_logs.html', {'access_logs': access_logs, 'anomalies': anomalies})
+        access_logs = paginator.paginate_queryset(filter_access_logs(AccessLogEntry.objects.all(), request.GET),
+                                                  request)
+    except (NotFound, ValidationError) as e:
+        return HttpResponse(e.detail[0] if isinstance(e.detail, list) else e.detail, status=400)
+
+    # Flag rows the model marked, and rows from IPs with logged anomalies: one indexed query per page
+    ips = {entry.ip_address for entry in access_logs if entry.ip_address}
+    anomalous_ips = set(anomalies.filter(ip_address__in=ips).values_list('ip_address', flat=True).distinct())
+    for entry in access_logs:
+        entry.flagged = entry.anomaly or entry.ip_address in anomalous_ips
+
+    next_query = request.GET.copy()
+    next_query['cursor'] = paginator.get_next_cursor()
+    return render(request, 'access_logs.html', {
+        'access_logs': access_logs,
+        'anomalies': anomalies[:ANOMALIES_SHOWN],
+        'filters': request.GET,
+        'next_query': next_query.urlencode() if paginator.has_next else None,
+    })
 
 
 class ReviewAnomaliesView(View):
     template_name = 'review_anomalies.html'
 
     def get(self, request):
-        """Display anomalies for review."""
-        anomalies = load_anomalies(FEEDBACK_FILE_PATH)
-        return render(request, self.template_name, {'anomalies': anomalies.values()})
+        """Display the newest anomalies still awaiting review."""
+        # A one-value IN seeks the (reviewed, timestamp) index; see filter_threats
+        anomalies = load_anomalies(FEEDBACK_FILE_PATH).filter(reviewed__in=[False])
+        return render(request, self.template_name, {'anomalies': anomalies[:ANOMALIES_SHOWN]})
 
     def post(self, request):
         """Post feedback for anomalies, updating them as reviewed."""
         feedback_data = json.loads(request.body)
-        anomalies = load_anomalies(FEEDBACK_FILE_PATH)
-        updated_entries = []
-
-        for ip, anomaly in anomalies.items():
-            # Only update if anomaly has not been reviewed
-            if not anomaly.get("reviewed", False):
-                feedback = feedback_data.get(ip)
-                if feedback in ["true_positive", "false_positive"]:
-                    anomaly["feedback"] = feedback
-                    anomaly["reviewed"] = True
-            updated_entries.append(anomaly)
-
-        # Write back updated anomalies
-        with open(FEEDBACK_FILE_PATH, "w") as f:
-            for entry in updated_entries:
-                json.dump(entry, f)
-                f.write("\n")
-
+        # Keyed by anomaly ID; appended to the review log, the anomaly log itself is never rewritten
+        record_feedback(FEEDBACK_FILE_PATH, feedback_data)
         return JsonResponse({'message': 'All anomalies reviewed successfully.'})
@@ -0,0 +1,118 @@
+# blocklist.py
+
+import ipaddress
+import socket
+import threading
+import time
+
+import redis
+
+
+class Blocklist:
+    """
+    In-process copy of the blocklist the anomaly detector publishes to Redis
+    (see RedisBackend in Anomaly_Detector/blocking.py). Single addresses live in a
+    set of strings, so the common check is one set lookup; CIDR rules are kept
+    per prefix length, so a check costs one lookup per distinct length. A
+    background thread polls the version counter and applies only the rules
+    changed since the version held, keeping Redis off the request path.
+    """
+
+    def __init__(self, url, prefix='blocklist', refresh_interval=1.0):
+        self.client = redis.Redis.from_url(url)
+        self.rules_key, self.changes_key = f"{prefix}:rules", f"{prefix}:changes"
+        self.version_key, self.floor_key = f"{prefix}:version", f"{prefix}:floor"
+        self.refresh_interval = refresh_interval
+        self.version = None
+        self.rules = set()
+        self.addresses = set()  # Single-address rules, as plain IP strings
+        self.networks = {}  # (IP version, prefix length) -> set of network numbers
+        self.prefix_lengths = ()  # The keys of self.networks, replaced rather than mutated
+        self.thread = threading.Thread(target=self.run, name='blocklist-refresh', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def __contains__(self, ip_address):
+        if ip_address in self.addresses:
+            return True
+        if not self.prefix_lengths:
+            return False
+        # inet_pton is several times faster than ipaddress on this path
+        version, family, bits = (6, socket.AF_INET6, 128) if ':' in ip_address else (4, socket.AF_INET, 32)
+        try:
+            value = int.from_bytes(socket.inet_pton(family, ip_address))
+        except OSError:
+            return False
+        for rule_version, length in self.prefix_lengths:
+            if rule_version == version and value >> (bits - length) in self.networks.get((version, length), ()):
+                return True
+        return False
+
+    def run(self):
+        while True:
+            try:
+                self.refresh()
+            except redis.RedisError as e:
+                # Keep enforcing the last known blocklist until Redis is back
+                print(f"Error refreshing blocklist from Redis: {e}")
+            time.sleep(self.refresh_interval)
+
+    def refresh(self):
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.get(self.version_key)
+        pipeline.get(self.floor_key)
+        pipeline.zrangebyscore(self.changes_key, f"({self.version or 0}", '+inf')
+        version, floor, changed = pipeline.execute()
+        version, floor = int(version or 0), int(floor or 0)
+        if version == self.version:
+            return
+
+        if self.version is None or self.version < floor:
+            # Too far behind the change log: reload every rule
+            pipeline = self.client.pipeline(transaction=True)
+            pipeline.get(self.version_key)
+            pipeline.smembers(self.rules_key)
+            version, rules = pipeline.execute()
+            version = int(version or 0)
+            rules = {rule.decode() for rule in rules}
+            for rule in self.rules - rules:
+                self.remove_rule(rule)
+            for rule in rules - self.rules:
+                self.add_rule(rule)
+        elif changed:
+            # Rules changed again after `version` are fetched on the next refresh
+            for rule, present in zip(changed, self.client.smismember(self.rules_key, changed)):
+                if present:
+                    self.add_rule(rule.decode())
+                else:
+                    self.remove_rule(rule.decode())
+        self.version = version
+
+    def add_rule(self, rule):
+        if rule in self.rules:
+            return
+        self.rules.add(rule)
+        network = ipaddress.ip_network(rule)
+        if network.prefixlen == network.max_prefixlen:
+            self.addresses.add(str(network.network_address))
+            return
+        key = (network.version, network.prefixlen)
+        self.networks.setdefault(key, set()).add(int(network.network_address) >> (network.max_prefixlen - network.prefixlen))
+        self.prefix_lengths = tuple(sorted(self.networks))
+
+    def remove_rule(self, rule):
+        if rule not in self.rules:
+            return
+        self.rules.discard(rule)
+        network = ipaddress.ip_network(rule)
+        if network.prefixlen == network.max_prefixlen:
+            self.addresses.discard(str(network.network_address))
+            return
+        key = (network.version, network.prefixlen)
+        networks = self.networks.get(key, set())
+        networks.discard(int(network.network_address) >> (network.max_prefixlen - network.prefixlen))
+        if not networks:
+            self.networks.pop(key, None)
+            self.prefix_lengths = tuple(sorted(self.networks))
@@ -69,6 +69,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'ThreatDetection.middleware.BlocklistMiddleware',  # Must stay first: rejects blocked IPs before any other work
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -145,6 +146,14 @@ CACHES = {
         }
     }
 }
+
+# Blocklist published to Redis by the anomaly detector (BLOCK_BACKEND=redis)
+BLOCKLIST_REDIS_URL = config('BLOCKLIST_REDIS_URL', default=CACHES['default']['LOCATION'])
+BLOCKLIST_REDIS_PREFIX = config('BLOCKLIST_REDIS_PREFIX', default='blocklist')
+BLOCKLIST_REFRESH_INTERVAL = config('BLOCKLIST_REFRESH_INTERVAL', default=1.0, cast=float)  # Seconds
+# Set by nginx from $remote_addr (see nginx/nginx.conf)
+BLOCKLIST_CLIENT_IP_HEADER = config('BLOCKLIST_CLIENT_IP_HEADER', default='HTTP_X_REAL_IP')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
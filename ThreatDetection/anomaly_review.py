@@ -1,41 +1,39 @@
 import json
 
+from DetectionApp.review_log import anomaly_id, append_reviews, read_reviews, review_log_path
+
 def review_anomalies(feedback_file="anomaly_feedback.json"):
-    updated_entries = []
-    
-    # Load existing feedback entries
-    with open(feedback_file, "r") as f:
-        entries = f.readlines()
+    # Verdicts are appended to the review log, the anomaly log itself is never rewritten
+    review_file = review_log_path(feedback_file)
+    verdicts = read_reviews(review_file)
+    reviewed = 0
 
     # Review each entry
-    for entry in entries:
-        anomaly = json.loads(entry)
-        
-        # Skip already reviewed entries
-        if anomaly["reviewed"]:
-            updated_entries.append(anomaly)
-            continue
-
-        print(f"\nAnomaly detected for IP: {anomaly['ip_address']}")
-        print("Anomaly details:", json.dumps(anomaly["anomaly_data"], indent=4))
-        
-        feedback = input("Is this a true positive? (yes/no): ").strip().lower()
-        
-        if feedback in ["yes", "y"]:
-            anomaly["feedback"] = "true_positive"
-        elif feedback in ["no", "n"]:
-            anomaly["feedback"] = "false_positive"
-        
-        anomaly["reviewed"] = True
-        updated_entries.append(anomaly)
-    
-    # Write updated entries back to the file
-    with open(feedback_file, "w") as f:
-        for entry in updated_entries:
-            json.dump(entry, f)
-            f.write("\n")
-
-    print("\nAll anomalies reviewed.")
+    with open(feedback_file, "r") as f:
+        for entry in f:
+            try:
+                anomaly = json.loads(entry)
+            except ValueError:
+                continue
+
+            # Skip already reviewed entries
+            if anomaly.get("reviewed") or anomaly_id(anomaly) in verdicts:
+                continue
+
+            print(f"\nAnomaly detected for IP: {anomaly['ip_address']}")
+            print("Anomaly details:", json.dumps(anomaly["anomaly_data"], indent=4))
+
+            feedback = input("Is this a true positive? (yes/no): ").strip().lower()
+
+            if feedback in ["yes", "y"]:
+                append_reviews(review_file, {anomaly_id(anomaly): "true_positive"})
+            elif feedback in ["no", "n"]:
+                append_reviews(review_file, {anomaly_id(anomaly): "false_positive"})
+            else:
+                continue
+            reviewed += 1
+
+    print(f"\nAll anomalies reviewed ({reviewed} new verdicts).")
 
 # Run the function if this script is executed directly
 if __name__ == "__main__":